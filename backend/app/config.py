@@ -1,4 +1,103 @@
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./modern_art.db")
+
+# The app talks to the database through an async driver. Unless
+# ASYNC_DATABASE_URL is set, it is DATABASE_URL with its scheme mapped here;
+# URLs already naming an async driver are used as they are.
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqldb": "mysql+aiomysql",
+}
+ASYNC_SCHEMES = {"sqlite+aiosqlite", "postgresql+asyncpg", "postgresql+psycopg", "mysql+aiomysql", "mysql+asyncmy"}
+
+
+def _async_url(url: str) -> str:
+    scheme, separator, rest = url.partition("://")
+    if scheme in ASYNC_SCHEMES:
+        return url
+    if not separator or scheme not in ASYNC_DRIVERS:
+        raise RuntimeError(
+            f"No async driver is known for DATABASE_URL scheme {scheme!r}; "
+            "set ASYNC_DATABASE_URL to the same database with an async driver "
+            "(e.g. postgresql+asyncpg://...)"
+        )
+    return f"{ASYNC_DRIVERS[scheme]}://{rest}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
+
+# Connection pool (ignored for in-memory SQLite, which uses a single connection)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# SQLite pragmas applied to every new connection. WAL lets readers proceed
+# while a write is in progress; synchronous=NORMAL is durable across app
+# crashes under WAL (only an OS crash can lose the last transactions).
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB, so 64 MiB
+
+# Game runtime: seconds between write-behind flushes (0 writes through on every
+# action), whether round/status changes flush immediately, and how long an
+# untouched game stays in memory.
+RUNTIME_FLUSH_INTERVAL = float(os.getenv("RUNTIME_FLUSH_INTERVAL", "2.0"))
+RUNTIME_FLUSH_ON_ROUND_END = os.getenv("RUNTIME_FLUSH_ON_ROUND_END", "true").lower() in ("1", "true", "yes")
+RUNTIME_IDLE_TIMEOUT = float(os.getenv("RUNTIME_IDLE_TIMEOUT", "1800"))
+
+# Event log: flushes append a game's new events, and its rows (plus a snapshot)
+# are rewritten only every this many events, at round ends and on eviction.
+# Loading a game replays at most this many events on top of its rows.
+EVENT_SNAPSHOT_INTERVAL = int(os.getenv("EVENT_SNAPSHOT_INTERVAL", "25"))
+
+# SQL profiling (see profiling.py), off by default: records every statement per
+# request and WebSocket handshake, flags a statement shape repeated this many
+# times in one request, and writes the per-route summary to this file on shutdown.
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").lower() in ("1", "true", "yes")
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "3"))
+SQL_PROFILE_OUTPUT = os.getenv("SQL_PROFILE_OUTPUT", "sql_profile.json")
+
+# WebSocket fan-out: seconds a single send may take, and how many messages may
+# queue for one connection, before that connection is evicted.
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "5.0"))
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# State patches kept per game, so a reconnecting client that missed no more
+# than this many is sent those instead of a full snapshot.
+WS_REPLAY_BUFFER = int(os.getenv("WS_REPLAY_BUFFER", "64"))
+# Server heartbeats: a socket silent for WS_HEARTBEAT_INTERVAL seconds is sent
+# "ping", and one still silent WS_HEARTBEAT_TIMEOUT seconds later is closed and
+# its player marked disconnected (0 turns heartbeats off). Clients ping every
+# 30 s, so live ones are never pinged. Deadlines are checked every
+# WS_HEARTBEAT_TICK seconds.
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "45"))
+WS_HEARTBEAT_TIMEOUT = float(os.getenv("WS_HEARTBEAT_TIMEOUT", "15"))
+WS_HEARTBEAT_TICK = float(os.getenv("WS_HEARTBEAT_TICK", "1.0"))
+
+# Pub/sub bus carrying broadcasts between worker processes: memory:// for a
+# single process, unix:///path/to/bus.sock for several workers on one host.
+# Without the dispatcher, workers on a unix:// bus may each load the same game,
+# so they must write through (RUNTIME_FLUSH_INTERVAL=0); see runtime.py.
+PUBSUB_URL = os.getenv("PUBSUB_URL", "memory://")
+
+# Dispatcher (app.dispatcher): how many worker processes to run, and where to
+# put their Unix sockets (a new temporary directory when empty). Workers it
+# starts set WORKER_INTERNAL_API, which enables the /internal routes it uses
+# to move games between workers, and WORKER_INTERNAL_TOKEN, a secret those
+# routes require in the X-Internal-Token header. The admin routes under
+# /dispatcher need "Authorization: Bearer <DISPATCHER_ADMIN_TOKEN>" and are
+# off while it is empty.
+DISPATCHER_WORKERS = int(os.getenv("DISPATCHER_WORKERS", str(os.cpu_count() or 1)))
+DISPATCHER_SOCKET_DIR = os.getenv("DISPATCHER_SOCKET_DIR", "")
+DISPATCHER_ADMIN_TOKEN = os.getenv("DISPATCHER_ADMIN_TOKEN", "")
+WORKER_INTERNAL_API = os.getenv("WORKER_INTERNAL_API", "false").lower() in ("1", "true", "yes")
+WORKER_INTERNAL_TOKEN = os.getenv("WORKER_INTERNAL_TOKEN", "")
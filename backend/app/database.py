@@ -1,22 +1,123 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import event, inspect, text
+from sqlalchemy.exc import DatabaseError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
-from .config import DATABASE_URL
+from .config import (
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE,
+)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_url = make_url(ASYNC_DATABASE_URL)
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+_IN_MEMORY = IS_SQLITE and _url.database in (None, "", ":memory:")
+
+# In-memory SQLite gets a single static connection; everything else is pooled
+_pool_args = {} if _IN_MEMORY else {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+}
+
+engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_args)
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+}
+
+
+if IS_SQLITE:
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        """Tune every new SQLite connection."""
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
-def get_db():
-    """Dependency to get database session."""
-    db = SessionLocal()
-    try:
+
+async def get_db():
+    """Dependency to get an async database session."""
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
-    """Create all tables."""
-    Base.metadata.create_all(bind=engine)
+def ensure_columns(connection) -> None:
+    """
+    Add any model columns missing from existing tables.
+
+    create_all() leaves existing tables alone, so databases from before a
+    column was added get it here. Such columns need a server default when
+    they are NOT NULL.
+    """
+    inspector = inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            connection.execute(text(ddl))
+
+
+def ensure_indexes(connection) -> None:
+    """
+    Create any model indexes missing from existing tables.
+
+    create_all() only creates indexes together with new tables, so databases
+    from before an index was added get it here.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+
+async def init_db(attempts: int = 3):
+    """Create all tables and any missing columns and indexes."""
+    for attempt in range(attempts):
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.run_sync(ensure_columns)
+                await conn.run_sync(ensure_indexes)
+            return
+        except DatabaseError:
+            # Workers starting together race between checking for a table and
+            # creating it; the next attempt sees what the winner created
+            if attempt == attempts - 1:
+                raise
+
+
+async def describe_settings() -> str:
+    """Effective storage settings, read back from the database, for the startup log."""
+    parts = [f"url={_url.render_as_string(hide_password=True)}"]
+    if _pool_args:
+        parts.append(
+            f"pool_size={DB_POOL_SIZE} max_overflow={DB_MAX_OVERFLOW} pool_timeout={DB_POOL_TIMEOUT}"
+        )
+    if IS_SQLITE:
+        async with engine.connect() as conn:
+            for name in SQLITE_PRAGMAS:
+                value = (await conn.execute(text(f"PRAGMA {name}"))).scalar()
+                parts.append(f"{name}={value}")
+    return " ".join(parts)
@@ -0,0 +1,387 @@
+"""
+Front dispatcher: routes each game to one worker process.
+
+Runs a pool of app workers on Unix sockets and proxies HTTP and WebSocket
+traffic to them. Requests under /api/games/{code} and sockets on
+/ws/{game_code}/... are routed by a consistent hash of the game code, so each
+game's in-memory state lives in exactly one worker. Creating a game and the
+other routes go to any worker.
+
+When workers are added or removed the ring changes and some games move.
+Routing pauses, requests in flight finish, each worker writes out and drops
+the games it no longer owns, and their sockets are closed with 1012. Clients
+reconnect through the dispatcher and reach the new owner, which loads the
+game from the database.
+
+Run it instead of app.main:
+    DISPATCHER_WORKERS=4 uvicorn app.dispatcher:app --port 8000
+
+Workers can be listed, added and removed with DISPATCHER_ADMIN_TOKEN as a
+bearer token (the admin routes are off without one):
+    GET /dispatcher/workers, POST /dispatcher/workers,
+    DELETE /dispatcher/workers/{name}
+
+GET /metrics scrapes every worker and merges their metrics, each sample
+labelled worker="<name>". A worker that does not answer is left out.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import re
+import secrets
+import signal
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket
+from websockets.asyncio.client import ClientConnection, unix_connect
+from websockets.exceptions import ConnectionClosed, InvalidStatus
+
+from .config import DISPATCHER_ADMIN_TOKEN, DISPATCHER_SOCKET_DIR, DISPATCHER_WORKERS
+from .hashring import HashRing
+from .metrics import CONTENT_TYPE, merge_expositions
+
+logger = logging.getLogger("uvicorn.error")
+
+GAME_PATH = re.compile(r"^/api/games/([^/]+)")
+# Not forwarded between client and worker
+HOP_BY_HOP = {
+    "connection", "keep-alive", "transfer-encoding", "upgrade", "te", "trailer",
+    "proxy-authorization", "proxy-authenticate", "host", "content-length", "content-encoding",
+}
+# Seconds to wait for a new worker to answer
+WORKER_START_TIMEOUT = 30.0
+
+
+def _forward_headers(headers) -> dict[str, str]:
+    return {k: v for k, v in headers.items() if k.lower() not in HOP_BY_HOP}
+
+
+@dataclass
+class Worker:
+    """An app process serving on a Unix socket."""
+    name: str
+    socket_path: str
+    process: asyncio.subprocess.Process
+    client: httpx.AsyncClient
+    # Sent on the worker's /internal routes, which refuse requests without it
+    internal_headers: dict[str, str]
+
+    @classmethod
+    async def spawn(cls, name: str, socket_dir: str, internal_token: str) -> "Worker":
+        socket_path = os.path.join(socket_dir, f"{name}.sock")
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--uds", socket_path, "--log-level", "warning",
+            env={**os.environ, "WORKER_INTERNAL_API": "true", "WORKER_INTERNAL_TOKEN": internal_token},
+        )
+        client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=socket_path),
+            base_url="http://worker",
+            timeout=None,
+        )
+        worker = cls(name, socket_path, process, client, {"X-Internal-Token": internal_token})
+        await worker.wait_ready()
+        logger.info("Started worker %s (pid %d)", name, process.pid)
+        return worker
+
+    async def wait_ready(self) -> None:
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while True:
+            if self.process.returncode is not None:
+                raise RuntimeError(f"Worker {self.name} exited with {self.process.returncode}")
+            try:
+                (await self.client.get("/")).raise_for_status()
+                return
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+    async def active_games(self) -> list[str]:
+        response = await self.client.get("/internal/games", headers=self.internal_headers)
+        response.raise_for_status()
+        return response.json()["games"]
+
+    async def release(self, code: str) -> None:
+        response = await self.client.post(f"/internal/games/{code}/release", headers=self.internal_headers)
+        response.raise_for_status()
+
+    async def stop(self) -> None:
+        """Shut the worker down gracefully; it flushes its games on the way out."""
+        if self.process.returncode is None:
+            self.process.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(self.process.wait(), WORKER_START_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        await self.client.aclose()
+
+
+class Dispatcher:
+    """Owns the worker pool and the hash ring that assigns games to workers."""
+
+    def __init__(self):
+        self.socket_dir = DISPATCHER_SOCKET_DIR or tempfile.mkdtemp(prefix="modernart-")
+        # Shared with the workers this dispatcher starts, for their /internal routes
+        self.internal_token = secrets.token_urlsafe(32)
+        self.workers: dict[str, Worker] = {}
+        self.ring = HashRing()
+        self._names = (f"worker-{i}" for i in itertools.count())
+        self._any = itertools.count()
+        # Cleared while the ring changes; requests wait for it before routing
+        self._routing = asyncio.Event()
+        self._routing.set()
+        # Requests being proxied, so a ring change can wait for them to finish
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._changing = asyncio.Lock()
+
+    async def start(self, count: int) -> None:
+        workers = await asyncio.gather(
+            *(Worker.spawn(next(self._names), self.socket_dir, self.internal_token) for _ in range(count))
+        )
+        for worker in workers:
+            self.workers[worker.name] = worker
+            self.ring.add(worker.name)
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(worker.stop() for worker in self.workers.values()))
+        self.workers.clear()
+        self.ring = HashRing()
+
+    def worker_for(self, code: Optional[str]) -> Worker:
+        """The worker owning a game, or any worker for requests about no game."""
+        if code is None:
+            names = sorted(self.ring.nodes)
+            return self.workers[names[next(self._any) % len(names)]]
+        return self.workers[self.ring.node_for(code.upper())]
+
+    @asynccontextmanager
+    async def route(self, code: Optional[str]) -> AsyncIterator[Worker]:
+        """Pick the worker for a request and count the request as in flight."""
+        while not self._routing.is_set():
+            await self._routing.wait()
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            yield self.worker_for(code)
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    async def add_worker(self) -> Worker:
+        async with self._changing:
+            worker = await Worker.spawn(next(self._names), self.socket_dir, self.internal_token)
+            self.workers[worker.name] = worker
+            ring = self.ring.copy()
+            ring.add(worker.name)
+            await self._rebalance(ring)
+            return worker
+
+    async def remove_worker(self, name: str) -> None:
+        async with self._changing:
+            if name not in self.workers:
+                raise KeyError(name)
+            if len(self.workers) == 1:
+                raise ValueError("Cannot remove the last worker")
+            ring = self.ring.copy()
+            ring.remove(name)
+            await self._rebalance(ring)
+            await self.workers.pop(name).stop()
+
+    async def _rebalance(self, ring: HashRing) -> None:
+        """Switch to a new ring, moving games whose owner changes."""
+        started = time.perf_counter()
+        self._routing.clear()
+        try:
+            await self._idle.wait()
+            moved = 0
+            for name in sorted(self.ring.nodes):
+                worker = self.workers[name]
+                codes = [c for c in await worker.active_games() if ring.node_for(c) != name]
+                await asyncio.gather(*(worker.release(code) for code in codes))
+                moved += len(codes)
+            self.ring = ring
+        finally:
+            self._routing.set()
+        logger.info(
+            "Rebalanced onto %d workers: moved %d active games in %.0f ms",
+            len(ring.nodes), moved, (time.perf_counter() - started) * 1000
+        )
+
+
+dispatcher = Dispatcher()
+
+app = FastAPI(title="Art Auction Game dispatcher")
+
+
+@app.on_event("startup")
+async def startup():
+    """Start the worker pool."""
+    await dispatcher.start(DISPATCHER_WORKERS)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the workers; each flushes its games to the database."""
+    await dispatcher.stop()
+
+
+def _require_admin(request: Request) -> None:
+    # Not the client address: behind a reverse proxy every client looks local
+    supplied = request.headers.get("authorization", "")
+    if not DISPATCHER_ADMIN_TOKEN or not secrets.compare_digest(supplied, f"Bearer {DISPATCHER_ADMIN_TOKEN}"):
+        raise HTTPException(status_code=403, detail="Dispatcher admin needs DISPATCHER_ADMIN_TOKEN")
+
+
+@app.get("/dispatcher/workers")
+async def list_workers(request: Request):
+    """Workers, their processes and how many games each holds in memory."""
+    _require_admin(request)
+    return {
+        "workers": [
+            {"name": w.name, "pid": w.process.pid, "active_games": len(await w.active_games())}
+            for w in dispatcher.workers.values()
+        ]
+    }
+
+
+@app.post("/dispatcher/workers")
+async def add_worker(request: Request):
+    """Start another worker and move its share of the games to it."""
+    _require_admin(request)
+    worker = await dispatcher.add_worker()
+    return {"name": worker.name, "pid": worker.process.pid}
+
+
+@app.delete("/dispatcher/workers/{name}")
+async def remove_worker(name: str, request: Request):
+    """Move a worker's games to the others and stop it."""
+    _require_admin(request)
+    try:
+        await dispatcher.remove_worker(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Worker not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "removed"}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Every worker's metrics in one Prometheus exposition, labelled by worker."""
+    workers = list(dispatcher.workers.values())
+    responses = await asyncio.gather(*(w.client.get("/metrics") for w in workers), return_exceptions=True)
+    texts = {}
+    for worker, response in zip(workers, responses):
+        if isinstance(response, httpx.Response) and response.status_code == 200:
+            texts[worker.name] = response.text
+        else:
+            logger.warning("Could not scrape metrics from worker %s", worker.name)
+    return Response(merge_expositions(texts, "worker"), media_type=CONTENT_TYPE)
+
+
+@app.websocket("/ws/{game_code}/{player_id}")
+async def proxy_websocket(websocket: WebSocket, game_code: str, player_id: str):
+    """Relay a game socket to the worker owning the game."""
+    async with dispatcher.route(game_code) as worker:
+        try:
+            upstream = await unix_connect(
+                worker.socket_path,
+                f"ws://worker{websocket.url.path}" + (f"?{websocket.url.query}" if websocket.url.query else ""),
+                subprotocols=websocket.scope.get("subprotocols") or None,
+                compression=None,
+                ping_interval=None,
+                max_size=None,
+            )
+        except InvalidStatus as refused:
+            # Unknown game or player: close with the code the worker refused with
+            # (see main.refuse_socket), as a single server would
+            headers = refused.response.headers
+            code = headers.get("X-Close-Code", "")
+            await websocket.close(
+                code=int(code) if code.isdigit() else 1011,
+                reason=headers.get("X-Close-Reason", ""),
+            )
+            return
+        except OSError:
+            # The worker could not be reached: a failure on our side, not the client's
+            await websocket.close(code=1011)
+            return
+
+    # The client gets the wire format the worker chose; compression is
+    # negotiated here, between the client and the dispatcher
+    await websocket.accept(subprotocol=upstream.subprotocol)
+    relays = [
+        asyncio.create_task(_client_to_worker(websocket, upstream)),
+        asyncio.create_task(_worker_to_client(upstream, websocket)),
+    ]
+    try:
+        await asyncio.wait(relays, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for relay in relays:
+            relay.cancel()
+        await upstream.close()
+
+
+async def _client_to_worker(websocket: WebSocket, upstream: ClientConnection) -> None:
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        data = message.get("text")
+        if data is None:
+            data = message.get("bytes")
+        try:
+            await upstream.send(data)
+        except ConnectionClosed:
+            return
+
+
+async def _worker_to_client(upstream: ClientConnection, websocket: WebSocket) -> None:
+    try:
+        async for data in upstream:
+            if isinstance(data, str):
+                await websocket.send_text(data)
+            else:
+                await websocket.send_bytes(data)
+    except ConnectionClosed:
+        pass
+    # Pass the worker's close code on (1012 when the game moved workers); codes
+    # that only describe a broken connection cannot be sent
+    code = upstream.close_code
+    try:
+        await websocket.close(code=1011 if code in (None, 1005, 1006, 1015) else code)
+    except RuntimeError:
+        # The client already closed
+        pass
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"])
+async def proxy_http(request: Request, path: str):
+    """Forward a request to the worker owning its game (or any worker)."""
+    if path.startswith("internal"):
+        raise HTTPException(status_code=404, detail="Not Found")
+    match = GAME_PATH.match(request.url.path)
+    url = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    body = await request.body()
+    async with dispatcher.route(match.group(1) if match else None) as worker:
+        upstream = await worker.client.request(
+            request.method, url, headers=_forward_headers(request.headers), content=body
+        )
+    return Response(
+        content=upstream.content,
+        status_code=upstream.status_code,
+        headers=_forward_headers(upstream.headers),
+    )
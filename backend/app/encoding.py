@@ -0,0 +1,113 @@
+"""
+Wire encoding for WebSocket frames.
+
+Broadcasts encode the part of a message shared by every recipient once, then
+splice each recipient's private fields onto the encoded text instead of
+re-encoding the whole message per recipient. orjson is used when installed.
+
+JSON text is the default wire format. A client may instead negotiate
+MessagePack by offering the "msgpack" WebSocket subprotocol (when the msgpack
+package is installed); its frames are binary, transcoded from the JSON text
+so the encode-once path stays the same; such a client may send its own
+frames as MessagePack too. Artist names and auction types are
+dictionary-encoded as extension types holding their index in cards.ARTISTS
+and cards.AUCTION_TYPES, whether they appear as values or as keys; decoding
+restores the strings, so the decoded message equals the JSON one.
+Compression is separate: permessage-deflate is negotiated by the server
+(uvicorn) with any client that offers it, over either format.
+"""
+
+import json
+from typing import Optional
+
+from .cards import ARTISTS, AUCTION_TYPES
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# WebSocket subprotocols naming the wire formats, in order of preference
+SUBPROTOCOLS = ("msgpack", "json") if msgpack is not None else ("json",)
+
+# MessagePack extension types for dictionary-encoded strings; the data is
+# one byte, the string's index in its list
+EXT_ARTIST = 1
+EXT_AUCTION_TYPE = 2
+_DICTIONARIES = {EXT_ARTIST: ARTISTS, EXT_AUCTION_TYPE: AUCTION_TYPES}
+_CODES = {
+    name: msgpack.ExtType(ext, bytes([index]))
+    for ext, names in _DICTIONARIES.items()
+    for index, name in enumerate(names)
+} if msgpack is not None else {}
+
+
+def encode_json(obj) -> str:
+    """Encode an object as compact JSON text."""
+    if orjson is not None:
+        # Non-str keys: artist values are keyed by round number
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def decode_json(data):
+    """Decode JSON text or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_envelope(message: dict) -> str:
+    """
+    Encode a message that will have more `data` fields spliced on.
+
+    `data` must be the last key of the message and hold a non-empty dict.
+    Returns the encoded text with the closing braces of `data` and the message
+    left off; finish it with splice_fields().
+    """
+    return encode_json(message)[:-2]
+
+
+def splice_fields(envelope: str, fields: dict) -> str:
+    """Append fields to an encoded envelope's `data` object and close it."""
+    if not fields:
+        return envelope + "}}"
+    # encode_json(fields) is '{...}': keep the members and closing brace of data
+    return envelope + "," + encode_json(fields)[1:] + "}"
+
+
+def choose_subprotocol(offered: list[str]) -> Optional[str]:
+    """The wire format to use from the subprotocols a client offered, or None for the JSON default."""
+    return next((name for name in SUBPROTOCOLS if name in offered), None)
+
+
+def _dictionary_encode(obj):
+    """A copy of a decoded JSON value with artist names and auction types replaced by their codes."""
+    if type(obj) is dict:
+        return {_CODES.get(k, k): _dictionary_encode(v) for k, v in obj.items()}
+    if type(obj) is list:
+        return [_dictionary_encode(v) for v in obj]
+    return _CODES.get(obj, obj) if type(obj) is str else obj
+
+
+def json_to_msgpack(text: str) -> bytes:
+    """Transcode an encoded JSON message to dictionary-encoded MessagePack."""
+    obj = orjson.loads(text) if orjson is not None else json.loads(text)
+    return msgpack.packb(_dictionary_encode(obj))
+
+
+def _decode_ext(code: int, data: bytes):
+    names = _DICTIONARIES.get(code)
+    if names is None:
+        return msgpack.ExtType(code, data)
+    return names[data[0]]
+
+
+def decode_msgpack(data: bytes):
+    """Decode a MessagePack frame, restoring dictionary-encoded strings."""
+    return msgpack.unpackb(data, ext_hook=_decode_ext, strict_map_key=False)
@@ -0,0 +1,143 @@
+"""
+Append-only event log for games.
+
+Every change to a game's rules state is recorded as an event holding the
+action and its inputs, including the shuffled deck and turn order, so
+replaying the events (replay.py) reproduces the game exactly. game_logic
+records them as it applies them; they queue on the game in memory until the
+runtime appends them to game_events.
+
+A game's rows are a projection of its events up to Game.event_seq. The
+runtime rewrites them, together with a compact snapshot, only every
+EVENT_SNAPSHOT_INTERVAL events; the writes in between are small inserts.
+
+Player.is_connected is presence, not game state, so it is not logged; it is
+written with the rows.
+"""
+
+import json
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator
+from weakref import WeakKeyDictionary, WeakSet
+
+from .cards import DECK
+from .models import ArtistValue, CardInPlay, Game, Player
+
+# Event types, in the order a game produces them
+GAME_CREATED = "game_created"
+PLAYER_JOINED = "player_joined"
+TURN_ORDER_SET = "turn_order_set"
+GAME_STARTED = "game_started"
+CARD_PLAYED = "card_played"
+DOUBLE_CARD_ADDED = "double_card_added"
+DOUBLE_DECLINED = "double_declined"
+AUCTION_RECORDED = "auction_recorded"
+
+# Cards are logged by their position in DECK
+_CARD_INDEX = {(card["artist"], card["artwork_id"]): i for i, card in enumerate(DECK)}
+
+# Game -> event rows not yet written, keyed like scoring's scoreboards
+_pending: "WeakKeyDictionary[Game, list[dict]]" = WeakKeyDictionary()
+# Games whose events are being replayed, which must not be logged again
+_replaying: "WeakSet[Game]" = WeakSet()
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def encode_cards(cards: list[dict]) -> list[int]:
+    return [_CARD_INDEX[(card["artist"], card["artwork_id"])] for card in cards]
+
+
+def decode_cards(indexes: list[int]) -> list[dict]:
+    return [DECK[i].copy() for i in indexes]
+
+
+def record_event(game: Game, event_type: str, **data) -> None:
+    """Log a change that was just applied to a game."""
+    game.event_seq = (game.event_seq or 0) + 1
+    if game in _replaying:
+        return
+    _pending.setdefault(game, []).append({
+        "game_id": game.id,
+        "seq": game.event_seq,
+        "type": event_type,
+        "data": _dumps(data),
+        "created_at": datetime.utcnow(),
+    })
+
+
+def has_pending_events(game: Game) -> bool:
+    return bool(_pending.get(game))
+
+
+def take_pending_events(game: Game) -> list[dict]:
+    """Remove and return a game's unwritten event rows, oldest first."""
+    return _pending.pop(game, [])
+
+
+def restore_pending_events(game: Game, rows: list[dict]) -> None:
+    """Put back rows taken by take_pending_events that could not be written, ahead of any logged since."""
+    if rows:
+        _pending[game] = rows + _pending.get(game, [])
+
+
+@contextmanager
+def replaying(game: Game) -> Iterator[None]:
+    """Apply already-logged events to a game without logging them again."""
+    _replaying.add(game)
+    try:
+        yield
+    finally:
+        _replaying.discard(game)
+
+
+def snapshot_state(game: Game) -> str:
+    """A game's whole state as compact JSON, for GameSnapshot."""
+    return _dumps({
+        "status": game.status,
+        "current_round": game.current_round,
+        "host_player_id": game.host_player_id,
+        "deck": encode_cards(json.loads(game.deck)) if game.deck else None,
+        "double_auction_state": json.loads(game.double_auction_state) if game.double_auction_state else None,
+        "current_turn_player_id": game.current_turn_player_id,
+        "awaiting_auction_result": bool(game.awaiting_auction_result),
+        "players": [
+            [p.id, p.name, p.money, encode_cards(json.loads(p.hand)) if p.hand else None, p.turn_order, p.is_connected]
+            for p in game.players
+        ],
+        "cards": [
+            [c.id, c.round, c.artist, c.auction_type, c.owner_id, c.price_paid, c.played_by_id]
+            for c in game.cards_in_play
+        ],
+        "values": [[v.artist, v.round, v.value] for v in game.artist_values],
+    })
+
+
+def restore_snapshot(game: Game, state: str, seq: int) -> None:
+    """Fill a new, empty Game (id, code and created_at set) from a snapshot."""
+    state = json.loads(state)
+    game.status = state["status"]
+    game.current_round = state["current_round"]
+    game.host_player_id = state["host_player_id"]
+    game.deck = _dumps(decode_cards(state["deck"])) if state["deck"] is not None else None
+    double = state["double_auction_state"]
+    game.double_auction_state = _dumps(double) if double else None
+    game.current_turn_player_id = state["current_turn_player_id"]
+    game.awaiting_auction_result = state["awaiting_auction_result"]
+    game.event_seq = seq
+    for player_id, name, money, hand, turn_order, is_connected in state["players"]:
+        game.players.append(Player(
+            id=player_id, game_id=game.id, name=name, money=money,
+            hand=_dumps(decode_cards(hand)) if hand is not None else None,
+            turn_order=turn_order, is_connected=is_connected
+        ))
+    for card_id, round_num, artist, auction_type, owner_id, price_paid, played_by_id in state["cards"]:
+        game.cards_in_play.append(CardInPlay(
+            id=card_id, game_id=game.id, round=round_num, artist=artist, auction_type=auction_type,
+            owner_id=owner_id, price_paid=price_paid, played_by_id=played_by_id
+        ))
+    for artist, round_num, value in state["values"]:
+        game.artist_values.append(ArtistValue(game_id=game.id, artist=artist, round=round_num, value=value))
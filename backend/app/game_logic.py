@@ -7,6 +7,10 @@ Handles:
 - Round-end detection
 - Artist ranking and value assignment
 - Payout calculations
+
+Every function that changes a game logs the change with record_event (see
+events.py) once it can no longer fail, so the game can be rebuilt by replaying
+its events through these same functions.
 """
 
 import json
@@ -14,9 +18,24 @@ import random
 from typing import Optional
 from sqlalchemy.orm import Session
 
-from .models import Game, Player, CardInPlay, ArtistValue
+from .models import Game, Player, CardInPlay, ArtistValue, STARTING_MONEY, generate_uuid
 from .cards import DECK, CARDS_PER_ROUND, ARTISTS, get_deck_copy
+from .events import (
+    GAME_CREATED,
+    PLAYER_JOINED,
+    TURN_ORDER_SET,
+    GAME_STARTED,
+    CARD_PLAYED,
+    DOUBLE_CARD_ADDED,
+    DOUBLE_DECLINED,
+    AUCTION_RECORDED,
+    encode_cards,
+    record_event,
+)
+from .metrics import END_ROUND_SECONDS
 from .schemas import Card, DoubleAuctionState
+from .scoring import get_scoreboard
+from .state_cache import state_cache
 
 
 def shuffle_deck() -> list[dict]:
@@ -45,22 +64,64 @@ def get_cards_to_deal(player_count: int, round_num: int) -> int:
     return CARDS_PER_ROUND[player_count][round_num - 1]
 
 
-def start_game(db: Session, game: Game) -> None:
+def add_player(game: Game, player_id: str, name: str) -> Player:
+    """
+    Seat a new player in the lobby, last in turn order. The first player
+    creates the game and becomes its host. The caller commits.
+    """
+    state_cache.invalidate(game.id)
+
+    # Column defaults only apply on flush, so set them here
+    player = Player(
+        id=player_id,
+        game_id=game.id,
+        name=name,
+        money=STARTING_MONEY,
+        turn_order=len(game.players),
+        is_connected=True
+    )
+    game.players.append(player)
+    if game.host_player_id is None:
+        game.host_player_id = player.id
+        record_event(game, GAME_CREATED, player_id=player_id, name=name)
+    else:
+        record_event(game, PLAYER_JOINED, player_id=player_id, name=name)
+    return player
+
+
+def set_turn_order(db: Session, game: Game, player_ids: list[str]) -> None:
+    """Seat the players in the given order."""
+    state_cache.invalidate(game.id)
+
+    order = {player_id: i for i, player_id in enumerate(player_ids)}
+    if set(order) != {p.id for p in game.players}:
+        raise ValueError("Turn order must list every player once")
+    for player in game.players:
+        player.turn_order = order[player.id]
+
+    record_event(game, TURN_ORDER_SET, player_ids=player_ids)
+    db.commit()
+
+
+def start_game(db: Session, game: Game, deck: Optional[list[dict]] = None) -> None:
     """
     Initialize game state when starting:
-    - Shuffle deck
+    - Shuffle deck (unless given one, as when replaying)
     - Deal initial cards to players
     - Set current round to 1
     - Set first player's turn
     """
+    state_cache.invalidate(game.id)
+
     players = sorted(game.players, key=lambda p: p.turn_order or 0)
     player_count = len(players)
 
     if player_count < 3 or player_count > 5:
         raise ValueError(f"Need 3-5 players, got {player_count}")
 
-    # Shuffle deck
-    deck = shuffle_deck()
+    if deck is None:
+        deck = shuffle_deck()
+    record_event(game, GAME_STARTED, deck=encode_cards(deck))
 
     # Deal initial cards
     cards_per_player = get_cards_to_deal(player_count, 1)
@@ -96,17 +157,36 @@ def get_game_deck(game: Game) -> list[dict]:
     return json.loads(game.deck)
 
 
+def add_card_in_play(
+    game: Game,
+    card: dict,
+    played_by_id: str,
+    owner_id: Optional[str] = None,
+    price_paid: Optional[int] = None
+) -> CardInPlay:
+    """
+    Put a card into play for the current round.
+
+    The card is appended to game.cards_in_play rather than added to the session,
+    so the in-memory aggregate stays complete without a flush or a re-query.
+    """
+    card_in_play = CardInPlay(
+        id=generate_uuid(),
+        game_id=game.id,
+        round=game.current_round,
+        artist=card["artist"],
+        auction_type=card["auction_type"],
+        owner_id=owner_id,
+        price_paid=price_paid,
+        played_by_id=played_by_id
+    )
+    game.cards_in_play.append(card_in_play)
+    return card_in_play
+
+
 def get_artist_count_this_round(db: Session, game: Game) -> dict[str, int]:
     """Count paintings played per artist in the current round."""
-    cards = db.query(CardInPlay).filter(
-        CardInPlay.game_id == game.id,
-        CardInPlay.round == game.current_round
-    ).all()
-
-    counts = {artist: 0 for artist in ARTISTS}
-    for card in cards:
-        counts[card.artist] += 1
-    return counts
+    return get_scoreboard(game).round_counts(game.current_round)
 
 
 def check_round_end(db: Session, game: Game, artist: str, cards_being_added: int = 1) -> bool:
@@ -118,8 +198,8 @@ def check_round_end(db: Session, game: Game, artist: str, cards_being_added: int
 
     Returns True if adding these cards would reach or exceed 5 for this artist.
     """
-    counts = get_artist_count_this_round(db, game)
-    current_count = counts.get(artist, 0)
+    counts = get_scoreboard(game).counts.get(game.current_round)
+    current_count = counts.get(artist, 0) if counts else 0
     return current_count + cards_being_added >= 5
 
 
@@ -134,10 +214,13 @@ def play_card(
 
     Returns: (card_played, is_round_ending, is_double_auction)
     """
+    state_cache.invalidate(game.id)
+
     hand = get_player_hand(player)
     if card_index < 0 or card_index >= len(hand):
         raise ValueError("Invalid card index")
 
+    record_event(game, CARD_PLAYED, player_id=player.id, card_index=card_index)
     card = hand.pop(card_index)
     set_player_hand(player, hand)
 
@@ -148,17 +231,8 @@ def play_card(
     is_double = card["auction_type"] == "double"
 
     if is_round_ending:
-        # Card ends the round - not auctioned, no owner
-        card_in_play = CardInPlay(
-            game_id=game.id,
-            round=game.current_round,
-            artist=card["artist"],
-            auction_type=card["auction_type"],
-            owner_id=None,  # Unsold
-            price_paid=None,
-            played_by_id=player.id
-        )
-        db.add(card_in_play)
+        # Card ends the round - not auctioned, no owner (unsold)
+        add_card_in_play(game, card, played_by_id=player.id)
         db.commit()
         return card, True, False
 
@@ -177,17 +251,8 @@ def play_card(
         db.commit()
         return card, False, True
 
-    # Regular auction - add card to play, await auction result
-    card_in_play = CardInPlay(
-        game_id=game.id,
-        round=game.current_round,
-        artist=card["artist"],
-        auction_type=card["auction_type"],
-        owner_id=None,  # Will be set after auction
-        price_paid=None,
-        played_by_id=player.id
-    )
-    db.add(card_in_play)
+    # Regular auction - add card to play (owner set after auction), await auction result
+    add_card_in_play(game, card, played_by_id=player.id)
     game.awaiting_auction_result = True
     db.commit()
 
@@ -220,6 +285,8 @@ def add_double_card(
 
     Returns: (card_added, is_round_ending)
     """
+    state_cache.invalidate(game.id)
+
     if not game.double_auction_state:
         raise ValueError("No double auction in progress")
 
@@ -238,6 +305,8 @@ def add_double_card(
     if second_card["auction_type"] == "double":
         raise ValueError("Cannot use another double card")
 
+    record_event(game, DOUBLE_CARD_ADDED, player_id=player.id, card_index=card_index)
+
     # Remove from hand
     hand.pop(card_index)
     set_player_hand(player, hand)
@@ -248,16 +317,11 @@ def add_double_card(
     if is_round_ending:
         # Both cards are unsold
         for card_data in [first_card, second_card]:
-            card_in_play = CardInPlay(
-                game_id=game.id,
-                round=game.current_round,
-                artist=card_data["artist"],
-                auction_type=card_data["auction_type"],
-                owner_id=None,
-                price_paid=None,
+            add_card_in_play(
+                game,
+                card_data,
                 played_by_id=player.id if card_data == second_card else state["played_by_id"]
             )
-            db.add(card_in_play)
 
         game.double_auction_state = None
         db.commit()
@@ -265,16 +329,7 @@ def add_double_card(
 
     # Add both cards to play (auction will happen)
     for card_data, played_by in [(first_card, state["played_by_id"]), (second_card, player.id)]:
-        card_in_play = CardInPlay(
-            game_id=game.id,
-            round=game.current_round,
-            artist=card_data["artist"],
-            auction_type=card_data["auction_type"],
-            owner_id=None,
-            price_paid=None,
-            played_by_id=played_by
-        )
-        db.add(card_in_play)
+        add_card_in_play(game, card_data, played_by_id=played_by)
 
     # Clear double state, set awaiting auction
     # The player who added the second card becomes the "auctioneer" for payment purposes
@@ -292,9 +347,12 @@ def decline_double(db: Session, game: Game, player: Player, players: list[Player
     Player declines to add a second card to double auction.
     Returns True if all players declined (original player gets card free).
     """
+    state_cache.invalidate(game.id)
+
     if not game.double_auction_state:
         raise ValueError("No double auction in progress")
 
+    record_event(game, DOUBLE_DECLINED, player_id=player.id)
     state = json.loads(game.double_auction_state)
     declined = state.get("declined_player_ids", [])
     declined.append(player.id)
@@ -325,17 +383,13 @@ def decline_double(db: Session, game: Game, player: Player, players: list[Player
                 return False
 
     # All declined or no valid cards - original player gets their card free
-    first_card = state["first_card"]
-    card_in_play = CardInPlay(
-        game_id=game.id,
-        round=game.current_round,
-        artist=first_card["artist"],
-        auction_type=first_card["auction_type"],
+    add_card_in_play(
+        game,
+        state["first_card"],
+        played_by_id=state["played_by_id"],
         owner_id=state["played_by_id"],  # Original player gets it
-        price_paid=0,
-        played_by_id=state["played_by_id"]
+        price_paid=0
     )
-    db.add(card_in_play)
     game.double_auction_state = None
 
     # Move to next turn
@@ -359,12 +413,13 @@ def record_auction_result(
     - Assign card ownership
     - Advance turn
     """
+    state_cache.invalidate(game.id)
+
     # Get the most recent unowned card(s) - could be 2 for double auction
-    cards = db.query(CardInPlay).filter(
-        CardInPlay.game_id == game.id,
-        CardInPlay.round == game.current_round,
-        CardInPlay.owner_id.is_(None)
-    ).order_by(CardInPlay.id.desc()).all()
+    cards = [
+        c for c in reversed(game.cards_in_play)
+        if c.round == game.current_round and c.owner_id is None
+    ]
 
     if not cards:
         raise ValueError("No pending auction")
@@ -416,6 +471,8 @@ def record_auction_result(
             card.owner_id = auctioneer_id
             card.price_paid = 0
 
+    record_event(game, AUCTION_RECORDED, winner_id=winner_id, price=price)
+
     # Clear auction state
     game.awaiting_auction_result = False
     game.double_auction_state = None
@@ -437,6 +494,7 @@ def advance_turn(db: Session, game: Game, players: list[Player]) -> None:
     game.current_turn_player_id = sorted_players[next_idx].id
 
 
+@END_ROUND_SECONDS.timed
 def end_round(db: Session, game: Game, round_ending_player_id: str = None) -> dict:
     """
     Process end of round:
@@ -451,6 +509,8 @@ def end_round(db: Session, game: Game, round_ending_player_id: str = None) -> di
 
     Returns info about the round end.
     """
+    state_cache.invalidate(game.id)
+
     players = list(game.players)
     player_count = len(players)
 
@@ -470,28 +530,24 @@ def end_round(db: Session, game: Game, round_ending_player_id: str = None) -> di
 
     for i, (artist, count) in enumerate(ranked[:3]):
         value = values[i]
-        av = ArtistValue(
+        game.artist_values.append(ArtistValue(
             game_id=game.id,
             artist=artist,
             round=game.current_round,
             value=value
-        )
-        db.add(av)
+        ))
         rankings.append({"artist": artist, "count": count, "value": value})
         new_values[artist] = value
 
-    db.flush()
-
     # Calculate cumulative values for each artist
     cumulative = get_cumulative_artist_values(db, game)
 
     # Calculate payouts
     payouts = []
-    cards_this_round = db.query(CardInPlay).filter(
-        CardInPlay.game_id == game.id,
-        CardInPlay.round == game.current_round,
-        CardInPlay.owner_id.isnot(None)
-    ).all()
+    cards_this_round = [
+        c for c in game.cards_in_play
+        if c.round == game.current_round and c.owner_id is not None
+    ]
 
     for player in players:
         player_cards = [c for c in cards_this_round if c.owner_id == player.id]
@@ -552,17 +608,9 @@ def end_round(db: Session, game: Game, round_ending_player_id: str = None) -> di
 
 def get_cumulative_artist_values(db: Session, game: Game) -> dict[str, int]:
     """Get total value for each artist across all rounds."""
-    values = db.query(ArtistValue).filter(ArtistValue.game_id == game.id).all()
-    cumulative = {artist: 0 for artist in ARTISTS}
-    for av in values:
-        cumulative[av.artist] += av.value
-    return cumulative
+    return dict(get_scoreboard(game).cumulative)
 
 
 def get_artist_values_by_round(db: Session, game: Game) -> dict[str, dict[int, int]]:
     """Get artist values organized by round."""
-    values = db.query(ArtistValue).filter(ArtistValue.game_id == game.id).all()
-    result = {artist: {} for artist in ARTISTS}
-    for av in values:
-        result[av.artist][av.round] = av.value
-    return result
+    return {artist: dict(rounds) for artist, rounds in get_scoreboard(game).values_by_round.items()}
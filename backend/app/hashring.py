@@ -0,0 +1,60 @@
+"""
+Consistent-hash ring mapping game codes to worker processes.
+
+Each worker is placed on the ring at many points (virtual nodes), so games
+spread evenly over workers, and adding or removing a worker only moves the
+games whose points it takes over or gives up: about 1/N of them.
+"""
+
+import bisect
+import hashlib
+from typing import Iterable
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Maps keys to nodes; a key keeps its node unless that part of the ring changes."""
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 128):
+        self.replicas = replicas
+        self.nodes: set[str] = set()
+        # Sorted ring positions and the node owning each
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        keep = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in keep]
+        self._owners = [o for _, o in keep]
+
+    def node_for(self, key: str) -> str:
+        """The node owning a key: the first point at or after the key's hash."""
+        if not self._points:
+            raise LookupError("Hash ring is empty")
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def copy(self) -> "HashRing":
+        ring = HashRing(replicas=self.replicas)
+        ring.nodes = set(self.nodes)
+        ring._points = list(self._points)
+        ring._owners = list(self._owners)
+        return ring
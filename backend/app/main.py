@@ -2,18 +2,33 @@
 Art Auction Game - FastAPI Application
 """
 
-import json
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends
+import logging
+from typing import Optional
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import Response
 
-from .config import FRONTEND_URL
-from .database import get_db, init_db
-from .models import Game, Player
-from .routes import games, actions
+from .config import (
+    FRONTEND_URL,
+    PUBSUB_URL,
+    SQL_PROFILE,
+    SQL_PROFILE_OUTPUT,
+    SQL_PROFILE_REPEAT_THRESHOLD,
+    WORKER_INTERNAL_API,
+)
+from .database import engine, init_db, describe_settings
+from . import metrics, profiling
+from .routes import games, actions, internal
+from .routes.actions import run_socket_command
 from .routes.games import build_game_state_response, get_private_data
+from .runtime import runtime
+from .state_cache import state_cache
 from .websocket import manager
 
+# uvicorn configures its own loggers only, so log startup info through one of them
+logger = logging.getLogger("uvicorn.error")
+
 app = FastAPI(title="Art Auction Game", version="1.0.0")
 
 # CORS middleware - allow FRONTEND_URL and localhost for development
@@ -29,16 +44,54 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if SQL_PROFILE:
+    profiling.enable(engine.sync_engine, SQL_PROFILE_REPEAT_THRESHOLD)
+    app.add_middleware(profiling.ProfilingMiddleware)
+# Added last so it is outermost and times the whole request, CORS included
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.instrument_engine(engine.sync_engine)
+metrics.ACTIVE_GAMES.set_function(lambda: len(runtime.games))
+metrics.WS_CONNECTIONS.set_function(lambda: sum(len(c) for c in manager.active_connections.values()))
+metrics.WS_SPECTATORS.set_function(lambda: sum(len(c) for c in manager.spectators.values()))
+metrics.STATE_CACHE_HITS.set_function(lambda: state_cache.hits)
+metrics.STATE_CACHE_MISSES.set_function(lambda: state_cache.misses)
 
 # Include routers
 app.include_router(games.router)
 app.include_router(actions.router)
+if WORKER_INTERNAL_API:
+    app.include_router(internal.router)
 
 
 @app.on_event("startup")
 async def startup():
-    """Initialize database on startup."""
-    init_db()
+    """Initialize database, join the pub/sub bus and start the game runtime on startup."""
+    await init_db()
+    logger.info("Storage: %s", await describe_settings())
+    manager.reap_handler = mark_disconnected
+    runtime.discard_handler = resync_game
+    if PUBSUB_URL.startswith("unix://") and not WORKER_INTERNAL_API:
+        # Not behind the dispatcher, so any worker may load any game
+        if runtime.flush_interval > 0:
+            raise RuntimeError(
+                "PUBSUB_URL=unix:// without the dispatcher needs RUNTIME_FLUSH_INTERVAL=0; "
+                "run app.dispatcher to route each game to one worker instead"
+            )
+        runtime.shared = True
+        manager.bus.subscribe_remote(drop_remote_copy)
+    await manager.start()
+    runtime.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush all in-memory games to the database and leave the pub/sub bus."""
+    await runtime.stop()
+    await manager.stop()
+    if profiling.profiler is not None:
+        profiling.profiler.write(SQL_PROFILE_OUTPUT)
+        logger.info("SQL profile written to %s", SQL_PROFILE_OUTPUT)
 
 
 @app.get("/")
@@ -47,6 +100,241 @@ async def root():
     return {"status": "ok", "app": "Art Auction Game"}
 
 
+@app.get("/stats")
+async def stats():
+    """Runtime statistics: in-memory games and state cache hit/miss counters."""
+    return {
+        "active_games": len(runtime.games),
+        "state_cache": state_cache.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Request latency, SQL, broadcast and runtime metrics in the Prometheus text format."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+if SQL_PROFILE:
+    @app.get("/debug/sql-profile")
+    async def sql_profile():
+        """Per-route SQL profile: statement shapes, counts, timings and repeated shapes."""
+        return profiling.profiler.summary()
+
+
+def _resume_point(websocket: WebSocket) -> tuple[Optional[int], Optional[str]]:
+    """The state version and stream a reconnecting client last applied, from ?since=&stream=."""
+    since = websocket.query_params.get("since", "")
+    return (int(since) if since.isdigit() else None), websocket.query_params.get("stream")
+
+
+async def refuse_socket(websocket: WebSocket, code: int, reason: str):
+    """
+    Refuse a WebSocket handshake with a close code (4004 no such game, 4003 no
+    such player).
+
+    A refused handshake reaches a WebSocket client over HTTP as a bare 403,
+    which loses the code. Behind the dispatcher the worker sends the 403
+    itself, with the code and reason in X-Close-Code and X-Close-Reason, and
+    the dispatcher closes the client's socket with them.
+    """
+    if WORKER_INTERNAL_API and "websocket.http.response" in websocket.scope.get("extensions", {}):
+        await websocket.send_denial_response(
+            Response(status_code=403, headers={"X-Close-Code": str(code), "X-Close-Reason": reason})
+        )
+    else:
+        await websocket.close(code=code, reason=reason)
+
+
+async def open_game_socket(websocket: WebSocket, game_code: str, player_id: str) -> Optional[str]:
+    """
+    WebSocket handshake: check the player, register the socket, mark the player
+    connected and bring them up to date: with the patches they missed if they
+    are reconnecting and the gap is still buffered, otherwise a snapshot.
+
+    Returns the game's code, or None if the socket was refused. The game is
+    only held for the handshake itself; nothing from it outlives this call.
+    """
+    since, stream = _resume_point(websocket)
+    with profiling.profile("WS /ws/{game_code}/{player_id}"):
+        # The handshake changes the game, so it holds the game's action lock like
+        # any other action
+        async with runtime.acquire(game_code) as active:
+            if not active:
+                await refuse_socket(websocket, 4004, "Game not found")
+                return None
+            db, game = active.db, active.game
+
+            player = next((p for p in game.players if p.id == player_id), None)
+            if not player:
+                await refuse_socket(websocket, 4003, "Player not found")
+                return None
+
+            await manager.connect(websocket, game.code, player_id)
+            # A reconnect that beats the old socket's close changes nothing
+            reconnected = not player.is_connected
+            if reconnected:
+                player.is_connected = True
+                state_cache.invalidate(game.id)
+                db.commit()
+                await runtime.settle(active)
+
+            # Bring everyone else to the current version, with the reconnection
+            # in the same frame, then this player
+            state = build_game_state_response(db, game)
+            private = get_private_data(game)
+            async with manager.batch(game.code):
+                await manager.broadcast_game_state(state, game.code, private, exclude_player_id=player_id)
+                if reconnected:
+                    await manager.broadcast(
+                        {
+                            "type": "player_reconnected",
+                            "data": {"player_id": player_id, "player_name": player.name}
+                        },
+                        game.code,
+                        exclude_player_id=player_id
+                    )
+            if not manager.send_missed_states(game.code, player_id, private, since, stream):
+                await manager.send_game_state(state, game.code, player_id, private)
+            return game.code
+
+
+async def close_game_socket(websocket: WebSocket, code: str, player_id: str) -> None:
+    """Unregister a closed socket and, unless the player reconnected, mark them disconnected."""
+    if websocket in manager.handed_off:
+        # The game moved to another worker; the client reconnects there
+        manager.handed_off.discard(websocket)
+        return
+    if websocket in manager.reaped:
+        # Closed for missing heartbeats; the player was marked disconnected then
+        manager.reaped.discard(websocket)
+        return
+    manager.disconnect(code, player_id, websocket)
+    await mark_disconnected(code, [player_id])
+
+
+async def mark_disconnected(code: str, player_ids: list[str]) -> None:
+    """
+    Mark players whose sockets closed as disconnected, in one commit, and tell
+    the rest of the game in one frame. Players who reconnected meanwhile are
+    left alone.
+    """
+    # Replaced by a newer connection for the same player
+    connected = manager.get_connected_players(code)
+    player_ids = [player_id for player_id in player_ids if player_id not in connected]
+    if not player_ids:
+        return
+
+    # The game may have been evicted and reloaded while the sockets were open
+    async with runtime.acquire(code) as active:
+        players = [p for p in active.game.players if p.id in player_ids] if active else []
+        for player in players:
+            player.is_connected = False
+        if players:
+            state_cache.invalidate(active.game.id)
+            active.db.commit()
+            await runtime.settle(active)
+
+        async with manager.batch(code):
+            for player_id in player_ids:
+                await manager.broadcast(
+                    {
+                        "type": "player_disconnected",
+                        "data": {"player_id": player_id}
+                    },
+                    code
+                )
+
+
+async def resync_game(code: str) -> None:
+    """
+    Bring a game's sockets in line with its state in the database, after the
+    runtime dropped a copy it could not write. The broadcast is a patch from
+    what they were last sent, so it undoes any moves that were lost.
+    """
+    async with runtime.acquire(code) as active:
+        if not active:
+            return
+        async with manager.batch(code):
+            await manager.broadcast_game_state(
+                build_game_state_response(active.db, active.game),
+                code,
+                get_private_data(active.game)
+            )
+
+
+async def drop_remote_copy(message: dict) -> None:
+    """Another worker published for a game: forget this worker's copy, which is now behind."""
+    await runtime.drop_copy(message["game_code"])
+
+
+async def open_spectator_socket(websocket: WebSocket, game_code: str) -> Optional[tuple[str, str]]:
+    """
+    Spectator handshake: register the socket and send the public state.
+
+    Spectators never change the game, so this only takes the game's lock when
+    nothing has been broadcast yet to send them. Returns the game's code and
+    the spectator's id, or None if the game does not exist.
+    """
+    active = await runtime.get(game_code)
+    if not active:
+        await refuse_socket(websocket, 4004, "Game not found")
+        return None
+    code = active.game.code
+    spectator_id = await manager.connect_spectator(websocket, code)
+
+    since, stream = _resume_point(websocket)
+    if manager.send_missed_states(code, spectator_id, {}, since, stream):
+        return code, spectator_id
+    if not await manager.send_spectator_state(code, spectator_id):
+        async with runtime.acquire(code) as active:
+            if active:
+                await manager.send_game_state(build_game_state_response(active.db, active.game), code, spectator_id, {})
+    return code, spectator_id
+
+
+# Declared before the player endpoint, which would otherwise take "spectate" as a player id
+@app.websocket("/ws/{game_code}/spectate")
+async def spectator_endpoint(websocket: WebSocket, game_code: str):
+    """
+    Read-only WebSocket for watching a game: the public state and events,
+    with no hand or money, and no seat (spectators do not count toward the
+    player limit). Answers "ping" and {"type": "resync"}; commands are refused.
+    Supports ?since=&stream= on reconnect like the player endpoint.
+    """
+    opened = await open_spectator_socket(websocket, game_code)
+    if opened is None:
+        return
+    code, spectator_id = opened
+
+    try:
+        while True:
+            message = await manager.receive(websocket)
+            if message == "ping":
+                await manager.send_personal_message("pong", code, spectator_id)
+                continue
+
+            if not isinstance(message, dict):
+                continue
+
+            if message.get("type") == "command":
+                await manager.send_personal_message(
+                    {"type": "ack", "id": message.get("id"), "ok": False, "status": 403, "error": "Spectators cannot act"},
+                    code,
+                    spectator_id
+                )
+            elif message.get("type") == "resync":
+                await manager.send_spectator_state(code, spectator_id)
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if websocket in manager.handed_off:
+            manager.handed_off.discard(websocket)
+        else:
+            manager.disconnect(code, spectator_id, websocket)
+
+
 @app.websocket("/ws/{game_code}/{player_id}")
 async def websocket_endpoint(
     websocket: WebSocket,
@@ -56,83 +344,53 @@ async def websocket_endpoint(
     """
     WebSocket endpoint for real-time game updates.
 
-    On connect: sends current game state
-    On message: handles ping/pong
-    Broadcasts: game state changes from API calls
+    On connect: sends current game state, or only the patches missed since
+    ?since=<version>&stream=<stream> when reconnecting
+    On message: handles ping/pong (either side may ping; any message counts
+    as a heartbeat), {"type": "resync"} (client saw a version gap)
+    and {"type": "command"} game actions (see run_socket_command), which run
+    one at a time in the order the connection sent them, each answered by an ack
+    Broadcasts: game state changes from API calls and commands
+    Client frames are JSON text, or MessagePack binary on a socket that
+    negotiated the "msgpack" subprotocol (see ConnectionManager.receive)
+
+    An open socket holds only the game code. The game and its session are
+    used briefly at connect, resync and disconnect, and each flush returns its
+    pooled database connection, so idle sockets never pin one.
     """
-    # Get database session
-    db = next(get_db())
+    code = await open_game_socket(websocket, game_code, player_id)
+    if code is None:
+        return
 
     try:
-        # Verify game and player exist
-        game = db.query(Game).filter(Game.code == game_code.upper()).first()
-        if not game:
-            await websocket.close(code=4004, reason="Game not found")
-            return
-
-        player = next((p for p in game.players if p.id == player_id), None)
-        if not player:
-            await websocket.close(code=4003, reason="Player not found")
-            return
-
-        # Accept connection
-        await manager.connect(websocket, game.code, player_id)
-
-        # Mark player as connected
-        player.is_connected = True
-        db.commit()
-
-        # Send current game state
-        state = build_game_state_response(db, game)
-        private = get_private_data(game)
-
-        await websocket.send_json({
-            "type": "game_state",
-            "data": {
-                **state,
-                "your_hand": private.get(player_id, {}).get("hand", []),
-                "your_money": private.get(player_id, {}).get("money", 0),
-                "your_player_id": player_id
-            }
-        })
-
-        # Notify others of reconnection
-        await manager.broadcast(
-            {
-                "type": "player_reconnected",
-                "data": {"player_id": player_id, "player_name": player.name}
-            },
-            game.code,
-            exclude_player_id=player_id
-        )
-
-        # Keep connection alive
         while True:
-            data = await websocket.receive_text()
+            message = await manager.receive(websocket)
             # Handle ping/pong
-            if data == "ping":
-                await websocket.send_text("pong")
+            if message == "ping":
+                await manager.send_personal_message("pong", code, player_id)
+                continue
 
-    except WebSocketDisconnect:
-        manager.disconnect(game.code, player_id)
+            if not isinstance(message, dict):
+                continue
 
-        # Mark player as disconnected
-        player = db.query(Player).filter(Player.id == player_id).first()
-        if player:
-            player.is_connected = False
-            db.commit()
-
-        # Notify others
-        await manager.broadcast(
-            {
-                "type": "player_disconnected",
-                "data": {"player_id": player_id}
-            },
-            game.code
-        )
+            if message.get("type") == "command":
+                ack = await run_socket_command(code, player_id, message)
+                await manager.send_personal_message(ack, code, player_id)
+            elif message.get("type") == "resync":
+                active = await runtime.get(code)
+                if active:
+                    await manager.send_game_state(
+                        build_game_state_response(active.db, active.game),
+                        code,
+                        player_id,
+                        get_private_data(active.game)
+                    )
 
+    except WebSocketDisconnect:
+        pass
     finally:
-        db.close()
+        # Also after an unexpected error, so the player is not left connected
+        await close_game_socket(websocket, code, player_id)
 
 
 if __name__ == "__main__":
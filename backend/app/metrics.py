@@ -0,0 +1,309 @@
+"""
+In-process metrics in the Prometheus text format, served at /metrics.
+
+A small stand-in for prometheus_client: counters, gauges and histograms with
+labels, held in one registry and rendered on scrape. Nothing is sent anywhere;
+a Prometheus server (or curl) reads the endpoint.
+
+MetricsMiddleware times every HTTP request by its route template (so
+/api/games/{code} is one series, not one per game) and counts the SQL
+statements the request ran. Other modules observe their own metrics:
+websocket.py for broadcast fan-out, reconnect catch-up and heartbeats,
+game_logic.py for end_round. Gauges read live values (active games, open
+sockets) through callbacks when scraped.
+
+With the dispatcher, each worker keeps its own metrics; the dispatcher's
+/metrics scrapes them all and merges them with merge_expositions(), each
+sample labelled with its worker.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds: from a cached GET to a slow round end or a flush-bound write
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+# Sockets per broadcast: a table of players, up to an audience of spectators
+RECIPIENT_BUCKETS = (0, 1, 2, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+BYTES_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Gauge(Metric):
+    """A value read from a callback when scraped."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.function = function
+
+    def samples(self) -> Iterator[str]:
+        if self.function is not None:
+            yield f"{self.name} {_number(self.function())}"
+
+
+class CounterFunction(Gauge):
+    """A counter kept elsewhere, read from a callback when scraped."""
+
+    type = "counter"
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # label values -> [per-bucket counts, sum, count]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe how long the block takes, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, fn: Callable) -> Callable:
+        """Decorator form of time(), for metrics without labels."""
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.time():
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self.metrics.values())
+
+
+def merge_expositions(texts: dict[str, str], label: str) -> str:
+    """
+    Merge expositions scraped from several processes into one, adding
+    label="<key>" to each sample. Every family keeps one HELP and TYPE, with
+    all the processes' samples under it.
+    """
+    # family name -> ({"HELP"/"TYPE": line}, samples)
+    families: dict[str, tuple[dict[str, str], list[str]]] = {}
+    for source, text in texts.items():
+        extra = f'{label}="{_escape(source)}"'
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# "):
+                _, kind, name = line.split(" ", 3)[:3]
+                family = families.setdefault(name, ({}, []))
+                family[0].setdefault(kind, line)
+            elif line and family is not None:
+                name, brace, rest = line.partition("{")
+                if brace:
+                    separator = "" if rest.startswith("}") else ","
+                    family[1].append(f"{name}{{{extra}{separator}{rest}")
+                else:
+                    name, _, value = line.partition(" ")
+                    family[1].append(f"{name}{{{extra}}} {value}")
+    return "".join(
+        "".join(line + "\n" for line in headers.values()) + "".join(line + "\n" for line in samples)
+        for headers, samples in families.values()
+    )
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")
+))
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status")
+))
+SQL_QUERIES_PER_REQUEST = registry.register(Histogram(
+    "sql_queries_per_request", "SQL statements run while handling an HTTP request.", ("method", "route"),
+    buckets=COUNT_BUCKETS
+))
+SQL_QUERIES = registry.register(Counter(
+    "sql_queries_total", "SQL statements run, inside requests or not (flushes, loads, sockets)."
+))
+BROADCAST_SECONDS = registry.register(Histogram(
+    "broadcast_fanout_duration_seconds",
+    "Time to encode a broadcast and queue it for every local socket of its game.", ("type",)
+))
+BROADCAST_RECIPIENTS = registry.register(Histogram(
+    "broadcast_recipients", "Local sockets a broadcast was queued for.", ("type",), buckets=RECIPIENT_BUCKETS
+))
+WS_MESSAGE_BYTES = registry.register(Histogram(
+    "websocket_message_bytes",
+    "Size as JSON of each frame queued for a player socket, and of the one frame shared by a game's spectators.",
+    ("type",), buckets=BYTES_BUCKETS
+))
+END_ROUND_SECONDS = registry.register(Histogram(
+    "end_round_duration_seconds", "Time spent in game_logic.end_round (scoring, payouts, dealing)."
+))
+ACTIVE_GAMES = registry.register(Gauge("active_games", "Games held in memory by the runtime."))
+WS_CONNECTIONS = registry.register(Gauge("websocket_connections", "Open player WebSockets on this worker."))
+WS_SPECTATORS = registry.register(Gauge("websocket_spectators", "Open spectator WebSockets on this worker."))
+WS_CONNECT_SYNC = registry.register(Counter(
+    "websocket_connect_sync_total",
+    "WebSocket connects by how the client was brought up to date: snapshot, replay of missed patches, or already current.",
+    ("method",)
+))
+WS_HEARTBEAT_EVICTIONS = registry.register(Counter(
+    "websocket_heartbeat_evictions_total", "WebSockets closed for not answering a server heartbeat."
+))
+STATE_CACHE_HITS = registry.register(CounterFunction("state_cache_hits_total", "Public game state cache hits."))
+STATE_CACHE_MISSES = registry.register(CounterFunction("state_cache_misses_total", "Public game state cache misses."))
+
+# SQL statements run by the current request, or None outside a request
+_request_queries: ContextVar[Optional[list[int]]] = ContextVar("request_queries", default=None)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    SQL_QUERIES.inc()
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count the SQL statements an engine runs (pass an AsyncEngine's sync_engine)."""
+    event.listen(engine, "before_cursor_execute", _count_query)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests and counting their SQL statements."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        queries = [0]
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_queries.reset(token)
+            # The matched route's template; unmatched paths share one series
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status[0])
+            SQL_QUERIES_PER_REQUEST.observe(queries[0], method=method, route=route)
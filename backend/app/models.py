@@ -1,10 +1,12 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 
 from .database import Base
 
+STARTING_MONEY = 100  # In thousands (k€)
+
 
 def generate_uuid():
     return str(uuid.uuid4())
@@ -28,6 +30,8 @@ class Game(Base):
     current_turn_player_id = Column(String, nullable=True)  # Who's turn to play a card
     awaiting_auction_result = Column(Boolean, default=False)  # Waiting for auction result input
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Last event (see GameEvent) reflected in this game's rows
+    event_seq = Column(Integer, nullable=False, default=0, server_default="0")
 
     players = relationship("Player", back_populates="game", cascade="all, delete-orphan")
     cards_in_play = relationship("CardInPlay", back_populates="game", cascade="all, delete-orphan")
@@ -38,9 +42,9 @@ class Player(Base):
     __tablename__ = "players"
 
     id = Column(String, primary_key=True, default=generate_uuid)
-    game_id = Column(String, ForeignKey("games.id"), nullable=False)
+    game_id = Column(String, ForeignKey("games.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
-    money = Column(Integer, default=100)  # In thousands (k€)
+    money = Column(Integer, default=STARTING_MONEY)
     hand = Column(Text, nullable=True)  # JSON array of cards
     turn_order = Column(Integer, nullable=True)
     is_connected = Column(Boolean, default=True)
@@ -51,6 +55,10 @@ class Player(Base):
 
 class CardInPlay(Base):
     __tablename__ = "cards_in_play"
+    __table_args__ = (
+        # Serves loads by game and the (game, round[, unsold]) filters
+        Index("ix_cards_in_play_game_round_owner", "game_id", "round", "owner_id"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     game_id = Column(String, ForeignKey("games.id"), nullable=False)
@@ -74,3 +82,27 @@ class ArtistValue(Base):
     value = Column(Integer, nullable=False)
 
     game = relationship("Game", back_populates="artist_values")
+
+
+class GameEvent(Base):
+    """
+    One change to a game, in the order it happened (see events.py).
+
+    Replaying a game's events from its creation, or from a snapshot, rebuilds it.
+    """
+    __tablename__ = "game_events"
+
+    game_id = Column(String, ForeignKey("games.id"), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    type = Column(String, nullable=False)
+    data = Column(Text, nullable=False)  # JSON object of the event's inputs
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GameSnapshot(Base):
+    """A game's whole state after event seq, written every EVENT_SNAPSHOT_INTERVAL events."""
+    __tablename__ = "game_snapshots"
+
+    game_id = Column(String, ForeignKey("games.id"), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    state = Column(Text, nullable=False)  # Compact JSON, see events.snapshot_state()
@@ -0,0 +1,239 @@
+"""
+Opt-in SQL profiling per request (SQL_PROFILE=true).
+
+Every statement the engine runs is recorded against the request or WebSocket
+handshake it ran in: its shape (the SQL with literals and IN/VALUES lists
+folded, so one N+1 loop gives one shape), its duration and the app code that
+issued it. A shape that repeats SQL_PROFILE_REPEAT_THRESHOLD or more times in
+one request is flagged and logged with its call sites; that is the signature
+of a per-row lazy load or a query inside a loop.
+
+Results are summarised per route (the route template, or the socket
+handshake) and served at /debug/sql-profile, and written to
+SQL_PROFILE_OUTPUT on shutdown.
+
+Statements run while a request is open are attributed to it. Flushes the
+runtime schedules run after the response and are not; bench_query_counts.py
+counts those. When profiling is off, nothing is hooked and profile() costs one
+global lookup.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+import sysconfig
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+import greenlet
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames from these are never the call site: libraries, and the middleware
+# that wraps every request
+_SKIP = tuple({sysconfig.get_paths()[name] for name in ("stdlib", "platstdlib", "purelib", "platlib")})
+_SKIP_FILES = {os.path.abspath(__file__), os.path.join(_ROOT, "app", "metrics.py")}
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_ROWS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """A statement with literals, IN lists and multi-row VALUES folded to placeholders."""
+    shape = _SPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("(?)", shape)
+    return _VALUES_ROWS.sub("(?)", shape)
+
+
+def call_site() -> str:
+    """
+    The innermost frame of project code, as "file:line function".
+
+    Async sessions run statements in a greenlet whose stack ends inside
+    SQLAlchemy; the walk continues into the parent greenlet that awaited it.
+    """
+    frame = sys._getframe(2)
+    current = greenlet.getcurrent()
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_SKIP) and filename not in _SKIP_FILES and not filename.startswith("<"):
+            if filename.startswith(_ROOT):
+                filename = os.path.relpath(filename, _ROOT)
+            return f"{filename}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+        if frame is None and current.parent is not None:
+            current = current.parent
+            frame = current.gr_frame
+    return "unknown"
+
+
+@dataclass
+class Statement:
+    shape: str
+    seconds: float
+    site: str
+
+
+@dataclass
+class RequestProfile:
+    """The statements one request or handshake ran."""
+    label: str
+    statements: list[Statement] = field(default_factory=list)
+    closed: bool = False
+
+    def repeated(self, threshold: int) -> dict[str, list[Statement]]:
+        """Shapes run at least threshold times, with their statements."""
+        counts = Counter(s.shape for s in self.statements)
+        return {
+            shape: [s for s in self.statements if s.shape == shape]
+            for shape, count in counts.items() if count >= threshold
+        }
+
+
+@dataclass
+class RouteSummary:
+    requests: int = 0
+    statements: int = 0
+    max_statements: int = 0
+    seconds: float = 0.0
+    # shape -> times run, across all requests
+    shapes: Counter = field(default_factory=Counter)
+    # repeated shape -> {"requests": flagged requests, "max": most in one request, "sites": {site: count}}
+    repeated: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "statements_mean": round(self.statements / self.requests, 2) if self.requests else 0,
+            "statements_max": self.max_statements,
+            "sql_ms_mean": round(self.seconds / self.requests * 1000, 3) if self.requests else 0,
+            "shapes": [{"shape": shape, "count": count} for shape, count in self.shapes.most_common()],
+            "repeated": [{"shape": shape, **info} for shape, info in self.repeated.items()],
+        }
+
+
+class SQLProfiler:
+    """Records statements per request and keeps the per-route summaries."""
+
+    def __init__(self, repeat_threshold: int):
+        self.repeat_threshold = repeat_threshold
+        self.routes: dict[str, RouteSummary] = {}
+        self._current: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+    def install(self, engine: Engine) -> None:
+        """Hook an engine (an AsyncEngine's sync_engine)."""
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        profile = self._current.get()
+        if profile is not None and not profile.closed and context is not None:
+            # On the statement's own context, not the pooled connection, so a
+            # statement that outlives its profile leaves nothing behind
+            context._sql_profile = (profile, time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, "_sql_profile", None)
+        if started is None:
+            return
+        context._sql_profile = None
+        profile, start = started
+        if not profile.closed:
+            seconds = time.perf_counter() - start
+            profile.statements.append(Statement(statement_shape(statement), seconds, call_site()))
+
+    @contextmanager
+    def profile(self, label: str) -> Iterator[RequestProfile]:
+        """Attribute the statements run in the block to one request."""
+        profile = RequestProfile(label)
+        token = self._current.set(profile)
+        try:
+            yield profile
+        finally:
+            self._current.reset(token)
+            profile.closed = True
+            self.record(profile)
+
+    def record(self, profile: RequestProfile) -> None:
+        summary = self.routes.setdefault(profile.label, RouteSummary())
+        summary.requests += 1
+        summary.statements += len(profile.statements)
+        summary.max_statements = max(summary.max_statements, len(profile.statements))
+        summary.seconds += sum(s.seconds for s in profile.statements)
+        summary.shapes.update(s.shape for s in profile.statements)
+
+        for shape, statements in profile.repeated(self.repeat_threshold).items():
+            info = summary.repeated.setdefault(shape, {"requests": 0, "max": 0, "sites": {}})
+            info["requests"] += 1
+            info["max"] = max(info["max"], len(statements))
+            for site, count in Counter(s.site for s in statements).items():
+                info["sites"][site] = info["sites"].get(site, 0) + count
+            logger.warning(
+                "%s ran the same statement %d times (possible N+1) from %s: %s",
+                profile.label, len(statements), ", ".join(sorted({s.site for s in statements})), shape
+            )
+
+    def summary(self) -> dict:
+        return {label: summary.as_dict() for label, summary in sorted(self.routes.items())}
+
+    def write(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+            f.write("\n")
+
+
+# The active profiler, or None when profiling is off
+profiler: Optional[SQLProfiler] = None
+
+
+def enable(engine: Engine, repeat_threshold: int) -> SQLProfiler:
+    """Start profiling statements run on engine."""
+    global profiler
+    if profiler is None:
+        profiler = SQLProfiler(repeat_threshold)
+        profiler.install(engine)
+    return profiler
+
+
+@contextmanager
+def profile(label: str) -> Iterator[Optional[RequestProfile]]:
+    """Profile the block as one request under label; does nothing when profiling is off."""
+    if profiler is None:
+        yield None
+        return
+    with profiler.profile(label) as request_profile:
+        yield request_profile
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling each HTTP request under its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or profiler is None:
+            await self.app(scope, receive, send)
+            return
+        with profile("unmatched") as request_profile:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                # The route is only known once the router has matched it
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    request_profile.label = f"{scope['method']} {route}"
@@ -0,0 +1,241 @@
+"""
+Pub/sub bus for WebSocket fan-out across worker processes.
+
+Broadcasts are published to the bus instead of going straight to sockets.
+Every worker subscribes and delivers each message to the sockets it holds,
+so a broadcast made by one worker reaches players connected to any worker.
+The publishing worker delivers to its own sockets directly; the bus carries
+the message to the other workers.
+
+Backends, chosen with PUBSUB_URL:
+- memory://                single process; publishing is a plain call
+- unix:///path/to/bus.sock workers on one host, relayed by a small broker on
+                           a Unix-domain socket. The first worker to start
+                           hosts the broker; if it exits, another takes over.
+
+Messages cross the broker as JSON, so they arrive with string keys only
+(artist values are keyed by round number) and lists for tuples. The
+publishing worker delivers the same decoded form to its own sockets, so every
+worker diffs identical states and sends identical patches.
+
+Messages from one worker reach every other worker in the order they were
+published. subscribe_remote() sets a hook run on those alone, before they
+are delivered: workers that may each hold a copy of a game use it to drop
+theirs when another worker changes the game. A worker that is reconnecting
+to the broker misses what is published meanwhile; its clients catch up
+through the usual version-gap resync.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from .encoding import decode_json, encode_json
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+# Bytes a broker lets queue for one worker before dropping it
+BROKER_MAX_BUFFER = 16 * 1024 * 1024
+# Seconds a worker keeps trying to reach (or become) the broker on startup
+CONNECT_TIMEOUT = 10.0
+
+
+def _frame(data: bytes) -> bytes:
+    """Length-prefix a payload for the broker stream."""
+    return len(data).to_bytes(4, "big") + data
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Read one length-prefixed frame (header included)."""
+    header = await reader.readexactly(4)
+    return header + await reader.readexactly(int.from_bytes(header, "big"))
+
+
+class Bus:
+    """In-process bus: messages are delivered to this process only."""
+
+    def __init__(self):
+        self.handler: Optional[Handler] = None
+        self.remote_handler: Optional[Handler] = None
+
+    def subscribe(self, handler: Handler) -> None:
+        """Set the coroutine that delivers a message to this worker's sockets."""
+        self.handler = handler
+
+    def subscribe_remote(self, handler: Handler) -> None:
+        """Set a coroutine run first on each message another worker published."""
+        self.remote_handler = handler
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, message: dict) -> None:
+        """Deliver a message here, then send it to the other workers."""
+        if self.handler is not None:
+            await self.handler(message)
+        self._send_remote(message)
+
+    def _send_remote(self, message: dict) -> None:
+        pass
+
+
+class Broker:
+    """Relays every frame a worker sends to all the other workers."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.clients: set[asyncio.StreamWriter] = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            # Left behind by a broker that did not shut down cleanly
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self._serve, path=self.path)
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        for client in list(self.clients):
+            client.close()
+        self.clients.clear()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.clients.add(writer)
+        try:
+            while True:
+                frame = await _read_frame(reader)
+                for client in list(self.clients):
+                    if client is writer:
+                        continue
+                    if client.transport.get_write_buffer_size() > BROKER_MAX_BUFFER:
+                        # Stalled worker; dropping it makes it reconnect and resync
+                        logger.warning("Dropping pub/sub client: %d bytes queued", BROKER_MAX_BUFFER)
+                        self.clients.discard(client)
+                        client.close()
+                        continue
+                    client.write(frame)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            # Worker went away, or the broker is shutting down
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+
+class UnixSocketBus(Bus):
+    """Bus shared by the workers on one host through a Unix-socket broker."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.broker: Optional[Broker] = None
+        self._lock_file = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self._connect()
+        self._read_task = asyncio.create_task(self._read_loop())
+
+    async def stop(self) -> None:
+        if self._read_task is not None:
+            self._read_task.cancel()
+            try:
+                await self._read_task
+            except asyncio.CancelledError:
+                pass
+            self._read_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self.broker is not None:
+            await self.broker.stop()
+            self.broker = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def publish(self, message: dict) -> None:
+        """Deliver a message here as the other workers will decode it, then send it to them."""
+        data = encode_json(message)
+        if self.handler is not None:
+            await self.handler(decode_json(data))
+        if self._writer is not None:
+            self._writer.write(_frame(data.encode()))
+
+    async def _connect(self) -> None:
+        """Connect to the broker, hosting it here if no worker does yet."""
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                if await self._host_broker():
+                    continue
+                if time.monotonic() > deadline:
+                    raise
+                # Another worker holds the broker and is still starting it
+                await asyncio.sleep(0.05)
+
+    async def _host_broker(self) -> bool:
+        """Start the broker in this process, unless another worker already holds it."""
+        import fcntl  # Unix only, like the socket itself
+
+        if self.broker is not None:
+            return False
+        lock_file = open(self.path + ".lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        # Held for the life of this process; the next worker takes over when it exits
+        self._lock_file = lock_file
+        self.broker = Broker(self.path)
+        await self.broker.start()
+        logger.info("Hosting pub/sub broker at %s (pid %d)", self.path, os.getpid())
+        return True
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                frame = await _read_frame(self._reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.warning("Lost pub/sub broker at %s; reconnecting", self.path)
+                self._writer = None
+                try:
+                    await self._connect()
+                except OSError:
+                    logger.exception("Could not reach pub/sub broker at %s", self.path)
+                    await asyncio.sleep(1.0)
+                continue
+            try:
+                message = decode_json(frame[4:])
+                if self.remote_handler is not None:
+                    await self.remote_handler(message)
+                await self.handler(message)
+            except Exception:
+                logger.exception("Failed to deliver pub/sub message")
+
+
+def create_bus(url: str) -> Bus:
+    """Create the bus backend for a PUBSUB_URL."""
+    if url in ("", "memory://"):
+        return Bus()
+    if url.startswith("unix://"):
+        return UnixSocketBus(url[len("unix://"):])
+    raise ValueError(f"Unsupported PUBSUB_URL: {url}")
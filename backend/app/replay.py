@@ -0,0 +1,135 @@
+"""
+Rebuild games by replaying their event log (see events.py).
+
+Events are applied through the same game_logic functions that produced them,
+so a replayed game ends up exactly as the live one was, apart from the ids of
+cards put into play (new ones are generated).
+"""
+
+import json
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .events import (
+    GAME_CREATED,
+    PLAYER_JOINED,
+    TURN_ORDER_SET,
+    GAME_STARTED,
+    CARD_PLAYED,
+    DOUBLE_CARD_ADDED,
+    DOUBLE_DECLINED,
+    AUCTION_RECORDED,
+    decode_cards,
+    replaying,
+    restore_snapshot,
+)
+from .game_logic import (
+    add_player,
+    set_turn_order,
+    start_game,
+    play_card,
+    add_double_card,
+    decline_double,
+    record_auction_result,
+    end_round,
+)
+from .models import Game, GameEvent, GameSnapshot
+
+
+class ReplayError(Exception):
+    """An event log that cannot be applied to the game it belongs to."""
+
+
+def _player(game: Game, player_id: str):
+    player = next((p for p in game.players if p.id == player_id), None)
+    if player is None:
+        raise ReplayError(f"Player {player_id} is not in game {game.code}")
+    return player
+
+
+def apply_event(db: Session, game: Game, event_type: str, data: dict) -> None:
+    """Apply one logged event, including any round end it triggered."""
+    if event_type in (GAME_CREATED, PLAYER_JOINED):
+        add_player(game, data["player_id"], data["name"])
+    elif event_type == TURN_ORDER_SET:
+        set_turn_order(db, game, data["player_ids"])
+    elif event_type == GAME_STARTED:
+        start_game(db, game, deck=decode_cards(data["deck"]))
+    elif event_type == CARD_PLAYED:
+        player = _player(game, data["player_id"])
+        _, is_round_ending, _ = play_card(db, game, player, data["card_index"])
+        if is_round_ending:
+            end_round(db, game, round_ending_player_id=player.id)
+    elif event_type == DOUBLE_CARD_ADDED:
+        player = _player(game, data["player_id"])
+        _, is_round_ending = add_double_card(db, game, player, data["card_index"])
+        if is_round_ending:
+            end_round(db, game, round_ending_player_id=player.id)
+    elif event_type == DOUBLE_DECLINED:
+        decline_double(db, game, _player(game, data["player_id"]), list(game.players))
+    elif event_type == AUCTION_RECORDED:
+        record_auction_result(db, game, data["winner_id"], data["price"], list(game.players))
+    else:
+        raise ReplayError(f"Unknown event type {event_type!r}")
+
+
+def replay_events(db: Session, game: Game, events: Iterable[GameEvent]) -> int:
+    """
+    Apply events that follow the game's current event_seq, in order.
+
+    Returns the number applied. The events are not logged again.
+    """
+    applied = 0
+    with replaying(game):
+        for event in events:
+            if event.seq != (game.event_seq or 0) + 1:
+                raise ReplayError(f"Game {game.code} is at event {game.event_seq}, next logged event is {event.seq}")
+            try:
+                apply_event(db, game, event.type, json.loads(event.data))
+            except ValueError as e:
+                raise ReplayError(f"Game {game.code} event {event.seq} ({event.type}): {e}") from e
+            applied += 1
+    return applied
+
+
+async def rebuild_game(db: AsyncSession, code: str, seq: Optional[int] = None) -> Optional[Game]:
+    """
+    Rebuild a game as it was after event seq (its latest event if None).
+
+    Starts from the latest snapshot at or before seq, or from the game's
+    creation, and replays the events after it. The result is a detached copy,
+    separate from the live game. Returns None if the game does not exist.
+    """
+    stored = (await db.execute(select(Game).where(Game.code == code.upper()))).scalars().first()
+    if stored is None:
+        return None
+
+    snapshots = select(GameSnapshot).where(GameSnapshot.game_id == stored.id)
+    if seq is not None:
+        snapshots = snapshots.where(GameSnapshot.seq <= seq)
+    snapshot = (await db.execute(snapshots.order_by(GameSnapshot.seq.desc()).limit(1))).scalars().first()
+
+    events = select(GameEvent).where(GameEvent.game_id == stored.id)
+    if snapshot is not None:
+        events = events.where(GameEvent.seq > snapshot.seq)
+    if seq is not None:
+        events = events.where(GameEvent.seq <= seq)
+    events = (await db.execute(events.order_by(GameEvent.seq))).scalars().all()
+
+    game = Game(
+        id=stored.id, code=stored.code, created_at=stored.created_at,
+        status="lobby", current_round=0, awaiting_auction_result=False, event_seq=0
+    )
+    if snapshot is not None:
+        restore_snapshot(game, snapshot.state, snapshot.seq)
+    elif not events or events[0].type != GAME_CREATED:
+        raise ReplayError(f"Game {game.code} has no event log from its creation")
+
+    # The copy is in no session; game_logic's commits have nothing to write
+    replay_events(Session(), game, events)
+    if seq is not None and game.event_seq != seq:
+        raise ReplayError(f"Game {game.code} has no event {seq}")
+    return game
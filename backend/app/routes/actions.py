@@ -1,11 +1,19 @@
 """
 Game action routes: play card, record auction, double auction handling.
+
+Each action is a function run under the game's lock, shared by its HTTP route
+and by the matching command on a player's WebSocket (see run_socket_command).
+Actions reject moves by raising HTTPException; over the socket that becomes a
+failed ack.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
-from ..database import get_db
 from ..models import Game, Player
 from ..schemas import (
     PlayCardRequest,
@@ -23,7 +31,9 @@ from ..game_logic import (
     get_artist_count_this_round,
 )
 from ..websocket import manager
-from .games import get_game_by_code, build_game_state_response, get_private_data
+from .games import lock_active_game, build_game_state_response, get_private_data
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/games", tags=["actions"])
 
@@ -36,14 +46,8 @@ def get_player(game: Game, player_id: str) -> Player:
     return player
 
 
-@router.post("/{code}/play-card")
-async def play_card_route(
-    code: str,
-    request: PlayCardRequest,
-    db: Session = Depends(get_db)
-):
+async def play_card_action(db: Session, game: Game, request: PlayCardRequest) -> dict:
     """Play a card from hand."""
-    game = get_game_by_code(db, code)
     player = get_player(game, request.player_id)
 
     if game.status != "in_progress":
@@ -136,14 +140,18 @@ async def play_card_route(
     }
 
 
-@router.post("/{code}/add-double")
-async def add_double_route(
+@router.post("/{code}/play-card")
+async def play_card_route(
     code: str,
-    request: AddDoubleRequest,
-    db: Session = Depends(get_db)
+    request: PlayCardRequest
 ):
+    """Play a card from hand."""
+    async with lock_active_game(code) as (db, game):
+        return await play_card_action(db, game, request)
+
+
+async def add_double_action(db: Session, game: Game, request: AddDoubleRequest) -> dict:
     """Add a second card to a double auction."""
-    game = get_game_by_code(db, code)
     player = get_player(game, request.player_id)
 
     if not game.double_auction_state:
@@ -204,14 +212,18 @@ async def add_double_route(
     }
 
 
-@router.post("/{code}/decline-double")
-async def decline_double_route(
+@router.post("/{code}/add-double")
+async def add_double_route(
     code: str,
-    request: DeclineDoubleRequest,
-    db: Session = Depends(get_db)
+    request: AddDoubleRequest
 ):
+    """Add a second card to a double auction."""
+    async with lock_active_game(code) as (db, game):
+        return await add_double_action(db, game, request)
+
+
+async def decline_double_action(db: Session, game: Game, request: DeclineDoubleRequest) -> dict:
     """Decline to add a second card to a double auction."""
-    game = get_game_by_code(db, code)
     player = get_player(game, request.player_id)
     players = list(game.players)
 
@@ -263,14 +275,18 @@ async def decline_double_route(
     }
 
 
-@router.post("/{code}/record-auction")
-async def record_auction_route(
+@router.post("/{code}/decline-double")
+async def decline_double_route(
     code: str,
-    request: RecordAuctionRequest,
-    db: Session = Depends(get_db)
+    request: DeclineDoubleRequest
 ):
+    """Decline to add a second card to a double auction."""
+    async with lock_active_game(code) as (db, game):
+        return await decline_double_action(db, game, request)
+
+
+async def record_auction_action(db: Session, game: Game, request: RecordAuctionRequest) -> dict:
     """Record the result of an auction."""
-    game = get_game_by_code(db, code)
     players = list(game.players)
 
     if not game.awaiting_auction_result:
@@ -307,3 +323,64 @@ async def record_auction_route(
         "winner_id": request.winner_id,
         "price": request.price
     }
+
+
+@router.post("/{code}/record-auction")
+async def record_auction_route(
+    code: str,
+    request: RecordAuctionRequest
+):
+    """Record the result of an auction."""
+    async with lock_active_game(code) as (db, game):
+        return await record_auction_action(db, game, request)
+
+
+# Commands a player can send over their WebSocket: name -> (request schema, action)
+SOCKET_COMMANDS = {
+    "play_card": (PlayCardRequest, play_card_action),
+    "add_double": (AddDoubleRequest, add_double_action),
+    "decline_double": (DeclineDoubleRequest, decline_double_action),
+    "record_auction": (RecordAuctionRequest, record_auction_action),
+}
+
+
+def _ack(command_id: Any, ok: bool, **fields) -> dict:
+    return {"type": "ack", "id": command_id, "ok": ok, **fields}
+
+
+async def run_socket_command(code: str, player_id: str, message: dict) -> dict:
+    """
+    Run a command sent over a player's WebSocket and build its ack.
+
+    Commands look like {"type": "command", "id": ..., "command": "play_card",
+    "data": {"card_index": 2}}. The ack echoes the id, with the same body the
+    HTTP route returns as "result", or "status" and "error" if it was
+    rejected. The player is always the socket's own.
+
+    Broadcasts caused by the command are queued on the socket before its ack,
+    so the client has the new state by the time the ack arrives.
+    """
+    command_id = message.get("id")
+    entry = SOCKET_COMMANDS.get(message.get("command"))
+    data = message.get("data", {})
+    if entry is None:
+        return _ack(command_id, False, status=400, error="Unknown command")
+    if not isinstance(data, dict):
+        return _ack(command_id, False, status=422, error="Command data must be an object")
+
+    schema, action = entry
+    try:
+        request = schema.model_validate({**data, "player_id": player_id})
+    except ValidationError as e:
+        return _ack(command_id, False, status=422, error=str(e.errors(include_url=False)[0]["msg"]))
+
+    try:
+        async with lock_active_game(code) as (db, game):
+            result = await action(db, game, request)
+    except HTTPException as e:
+        return _ack(command_id, False, status=e.status_code, error=e.detail)
+    except Exception:
+        # Answered like the HTTP route's 500, and the socket stays open
+        logger.exception("Command %s on game %s failed", message.get("command"), code)
+        return _ack(command_id, False, status=500, error="Internal error")
+    return _ack(command_id, True, result=result)
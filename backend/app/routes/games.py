@@ -3,11 +3,16 @@ Game management routes: create, join, get state, start.
 """
 
 import json
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from ..models import Game, Player
+from ..events import take_pending_events
+from ..models import Game, GameEvent, generate_game_code, generate_uuid
 from ..schemas import (
     CreateGameRequest,
     JoinGameRequest,
@@ -19,39 +24,70 @@ from ..schemas import (
     ArtistValueResponse,
 )
 from ..game_logic import (
+    add_player,
+    set_turn_order,
     start_game,
     get_player_hand,
-    get_artist_count_this_round,
-    get_artist_values_by_round,
-    get_cumulative_artist_values,
     get_double_auction_state,
 )
 from ..cards import ARTISTS
+from ..runtime import runtime
+from ..scoring import get_scoreboard
+from ..state_cache import state_cache
 from ..websocket import manager
 
 router = APIRouter(prefix="/api/games", tags=["games"])
 
 
-def get_game_by_code(db: Session, code: str) -> Game:
-    """Helper to get game by code or raise 404."""
-    game = db.query(Game).filter(Game.code == code.upper()).first()
-    if not game:
+async def get_active_game(code: str) -> tuple[Session, Game]:
+    """Helper to get an in-memory game and its session by code or raise 404."""
+    active = await runtime.get(code)
+    if not active:
         raise HTTPException(status_code=404, detail="Game not found")
-    return game
+    return active.db, active.game
+
+
+@asynccontextmanager
+async def lock_active_game(code: str) -> AsyncIterator[tuple[Session, Game]]:
+    """
+    Like get_active_game, but holds the game's action lock for the block.
+
+    Every route that changes a game runs under it, so two requests racing on
+    the same game (e.g. play-card and record-auction) are handled one after
+    the other, each seeing the other's result. The block's broadcasts are
+    batched, so each player gets the whole change (say card_played and the
+    new state) as one frame, sent before the lock is released.
+    """
+    async with runtime.acquire(code) as active:
+        if not active:
+            raise HTTPException(status_code=404, detail="Game not found")
+        async with manager.batch(active.game.code):
+            yield active.db, active.game
+            if not await runtime.settle(active):
+                raise HTTPException(status_code=409, detail="Game changed on another worker; try again")
 
 
 def build_game_state_response(db: Session, game: Game) -> dict:
-    """Build the public game state response."""
+    """
+    Build the public game state response.
+
+    Served from the state cache until the game next changes; the returned dict
+    is shared and must not be modified.
+    """
+    cached = state_cache.get(game.id)
+    if cached is not None:
+        return cached
+
     players = list(game.players)
 
+    # Cards in play this round, and paintings owned per player this round
+    round_cards = [c for c in game.cards_in_play if c.round == game.current_round]
+    painting_counts = Counter(c.owner_id for c in round_cards)
+
     # Build player list with public info
     player_list = []
     for p in sorted(players, key=lambda x: x.turn_order or 0):
-        # Count paintings owned this round
-        painting_count = len([
-            c for c in game.cards_in_play
-            if c.owner_id == p.id and c.round == game.current_round
-        ])
+        painting_count = painting_counts[p.id]
         player_list.append(PlayerPublic(
             id=p.id,
             name=p.name,
@@ -61,22 +97,20 @@ def build_game_state_response(db: Session, game: Game) -> dict:
             is_connected=p.is_connected
         ))
 
-    # Artist counts this round
-    artist_counts = get_artist_count_this_round(db, game)
-
-    # Artist values
-    values_by_round = get_artist_values_by_round(db, game)
-    cumulative = get_cumulative_artist_values(db, game)
+    # Artist counts this round and artist values
+    scoreboard = get_scoreboard(game)
+    artist_counts = scoreboard.round_counts(game.current_round)
     artist_values = [
         ArtistValueResponse(
             artist=artist,
-            values_by_round=values_by_round.get(artist, {}),
-            cumulative_value=cumulative.get(artist, 0)
+            values_by_round=scoreboard.values_by_round[artist],
+            cumulative_value=scoreboard.cumulative[artist]
         )
         for artist in ARTISTS
     ]
 
     # Cards in play this round
+    names = {p.id: p.name for p in players}
     cards = [
         CardInPlayResponse(
             id=c.id,
@@ -84,17 +118,16 @@ def build_game_state_response(db: Session, game: Game) -> dict:
             artist=c.artist,
             auction_type=c.auction_type,
             owner_id=c.owner_id,
-            owner_name=next((p.name for p in players if p.id == c.owner_id), None),
+            owner_name=names.get(c.owner_id),
             price_paid=c.price_paid
         )
-        for c in game.cards_in_play
-        if c.round == game.current_round
+        for c in round_cards
     ]
 
     # Double auction state if any
     double_state = get_double_auction_state(game)
 
-    return {
+    state = {
         "id": game.id,
         "code": game.code,
         "status": game.status,
@@ -109,6 +142,8 @@ def build_game_state_response(db: Session, game: Game) -> dict:
         "double_auction_state": double_state.model_dump() if double_state else None,
         "created_at": game.created_at.isoformat()
     }
+    state_cache.put(game.id, state)
+    return state
 
 
 def get_private_data(game: Game) -> dict[str, dict]:
@@ -123,33 +158,22 @@ def get_private_data(game: Game) -> dict[str, dict]:
 
 
 @router.post("", response_model=GameCreatedResponse)
-async def create_game(request: CreateGameRequest, db: Session = Depends(get_db)):
+async def create_game(request: CreateGameRequest, db: AsyncSession = Depends(get_db)):
     """Create a new game and join as host."""
-    # Create game
-    game = Game()
+    # Ids are generated up front so all rows go out in a single flush
+    game = Game(id=generate_uuid(), code=generate_game_code(), event_seq=0)
+    player = add_player(game, generate_uuid(), request.host_name)
     db.add(game)
-    db.flush()
-
-    # Create host player
-    player = Player(
-        game_id=game.id,
-        name=request.host_name,
-        turn_order=0
-    )
-    db.add(player)
-    db.flush()
-
-    # Set host
-    game.host_player_id = player.id
-    db.commit()
+    db.add_all(GameEvent(**row) for row in take_pending_events(game))
+    await db.commit()
 
     return GameCreatedResponse(game_code=game.code, player_id=player.id)
 
 
 @router.get("/{code}")
-async def get_game(code: str, player_id: str, db: Session = Depends(get_db)):
+async def get_game(code: str, player_id: str):
     """Get game state. Requires player_id to get private data."""
-    game = get_game_by_code(db, code)
+    db, game = await get_active_game(code)
 
     # Verify player is in game
     player = next((p for p in game.players if p.id == player_id), None)
@@ -168,91 +192,78 @@ async def get_game(code: str, player_id: str, db: Session = Depends(get_db)):
 
 
 @router.post("/{code}/join", response_model=JoinedGameResponse)
-async def join_game(code: str, request: JoinGameRequest, db: Session = Depends(get_db)):
+async def join_game(code: str, request: JoinGameRequest):
     """Join an existing game."""
-    game = get_game_by_code(db, code)
+    async with lock_active_game(code) as (db, game):
+        if game.status != "lobby":
+            raise HTTPException(status_code=400, detail="Game already started")
 
-    if game.status != "lobby":
-        raise HTTPException(status_code=400, detail="Game already started")
+        if len(game.players) >= 5:
+            raise HTTPException(status_code=400, detail="Game is full")
 
-    if len(game.players) >= 5:
-        raise HTTPException(status_code=400, detail="Game is full")
+        # Check for duplicate name
+        if any(p.name.lower() == request.player_name.lower() for p in game.players):
+            raise HTTPException(status_code=400, detail="Name already taken")
 
-    # Check for duplicate name
-    if any(p.name.lower() == request.player_name.lower() for p in game.players):
-        raise HTTPException(status_code=400, detail="Name already taken")
+        player = add_player(game, generate_uuid(), request.player_name)
+        db.commit()
 
-    # Create player
-    turn_order = len(game.players)
-    player = Player(
-        game_id=game.id,
-        name=request.player_name,
-        turn_order=turn_order
-    )
-    db.add(player)
-    db.commit()
-
-    # Broadcast to other players
-    await manager.broadcast(
-        {"type": "player_joined", "data": {"player_id": player.id, "player_name": player.name}},
-        game.code
-    )
+        # Broadcast to other players
+        await manager.broadcast(
+            {"type": "player_joined", "data": {"player_id": player.id, "player_name": player.name}},
+            game.code
+        )
 
-    return JoinedGameResponse(player_id=player.id)
+        return JoinedGameResponse(player_id=player.id)
 
 
 @router.post("/{code}/randomize-order")
-async def randomize_order(code: str, player_id: str, db: Session = Depends(get_db)):
+async def randomize_order(code: str, player_id: str):
     """Randomize player turn order (host only, lobby only)."""
     import random
 
-    game = get_game_by_code(db, code)
+    async with lock_active_game(code) as (db, game):
+        if game.host_player_id != player_id:
+            raise HTTPException(status_code=403, detail="Only host can randomize order")
 
-    if game.host_player_id != player_id:
-        raise HTTPException(status_code=403, detail="Only host can randomize order")
+        if game.status != "lobby":
+            raise HTTPException(status_code=400, detail="Can only randomize in lobby")
 
-    if game.status != "lobby":
-        raise HTTPException(status_code=400, detail="Can only randomize in lobby")
+        # Shuffle turn order
+        players = list(game.players)
+        random.shuffle(players)
+        set_turn_order(db, game, [p.id for p in players])
 
-    # Shuffle turn order
-    players = list(game.players)
-    random.shuffle(players)
-    for i, player in enumerate(players):
-        player.turn_order = i
+        # Broadcast updated player list
+        await manager.broadcast({
+            "type": "players_reordered",
+            "data": {
+                "players": [{"id": p.id, "name": p.name, "turn_order": p.turn_order} for p in players]
+            }
+        }, game.code)
 
-    db.commit()
-
-    # Broadcast updated player list
-    await manager.broadcast({
-        "type": "players_reordered",
-        "data": {
-            "players": [{"id": p.id, "name": p.name, "turn_order": p.turn_order} for p in players]
-        }
-    }, game.code)
-
-    return {"status": "randomized"}
+        return {"status": "randomized"}
 
 
 @router.post("/{code}/start")
-async def start_game_route(code: str, player_id: str, db: Session = Depends(get_db)):
+async def start_game_route(code: str, player_id: str):
     """Start the game (host only)."""
-    game = get_game_by_code(db, code)
-
-    if game.host_player_id != player_id:
-        raise HTTPException(status_code=403, detail="Only host can start the game")
+    async with lock_active_game(code) as (db, game):
+        if game.host_player_id != player_id:
+            raise HTTPException(status_code=403, detail="Only host can start the game")
 
-    if game.status != "lobby":
-        raise HTTPException(status_code=400, detail="Game already started")
+        if game.status != "lobby":
+            raise HTTPException(status_code=400, detail="Game already started")
 
-    if len(game.players) < 3:
-        raise HTTPException(status_code=400, detail="Need at least 3 players")
+        if len(game.players) < 3:
+            raise HTTPException(status_code=400, detail="Need at least 3 players")
 
-    # Start the game
-    start_game(db, game)
+        # Start the game
+        start_game(db, game)
 
-    # Broadcast game started with full state
-    state = build_game_state_response(db, game)
-    private = get_private_data(game)
-    await manager.broadcast_game_state(state, game.code, private)
+        # Broadcast game started with full state
+        state = build_game_state_response(db, game)
+        private = get_private_data(game)
+        await manager.broadcast_game_state(state, game.code, private)
 
-    return {"status": "started"}
+        return {"status": "started"}
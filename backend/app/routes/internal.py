@@ -0,0 +1,52 @@
+"""
+Internal routes used by the dispatcher to move games between workers.
+
+Only mounted when WORKER_INTERNAL_API is set, which the dispatcher does for
+the workers it starts; the dispatcher never forwards /internal from clients.
+Every request must also carry the secret the dispatcher gave the worker
+(WORKER_INTERNAL_TOKEN), since the client address proves nothing behind a
+proxy.
+"""
+
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from ..config import WORKER_INTERNAL_TOKEN
+from ..runtime import runtime
+from ..websocket import manager
+
+
+def require_internal_token(x_internal_token: str = Header("")) -> None:
+    if not WORKER_INTERNAL_TOKEN or not secrets.compare_digest(x_internal_token, WORKER_INTERNAL_TOKEN):
+        raise HTTPException(status_code=403, detail="Internal API needs the worker's token")
+
+
+router = APIRouter(prefix="/internal", tags=["internal"], dependencies=[Depends(require_internal_token)])
+
+
+@router.get("/games")
+async def list_active_games():
+    """Codes of the games this worker holds in memory or has sockets for."""
+    return {"games": sorted(set(runtime.games) | set(manager.active_connections))}
+
+
+@router.post("/games/{code}/release")
+async def release_game(code: str):
+    """
+    Give up a game that now belongs to another worker.
+
+    Writes it to the database and drops it from memory, so the new owner
+    loads the latest state, and closes its sockets so clients reconnect there.
+    """
+    code = code.upper()
+    if code in runtime.games:
+        # Wait for any action in progress; later ones reload from the database
+        async with runtime.acquire(code) as active:
+            if active is not None:
+                await runtime.evict(code)
+        if code in runtime.games:
+            # Its events could not be written; the new owner would load a stale game
+            raise HTTPException(status_code=503, detail="Game could not be written out")
+    manager.hand_off(code)
+    return {"status": "released"}
@@ -0,0 +1,457 @@
+"""
+In-memory game runtime with write-behind persistence.
+
+Each active game is loaded once and kept in memory as the source of truth.
+The game's objects live in a WriteBehindSession: game_logic mutates them and
+calls db.commit() exactly as before, but the commit only marks the game dirty.
+A background flusher writes dirty games to the database in batches.
+
+A flush appends the game's new events (see events.py). The game's rows, with
+a snapshot, are only rewritten every EVENT_SNAPSHOT_INTERVAL events, at round
+ends and on eviction. Loading a game replays any events logged after its rows
+were written, so a crash loses nothing that was flushed.
+
+The events go in first, in their own transaction, so a failed write of the
+rows loses nothing either: the game is reloaded from the rows and events in
+the database. Events that fail to go in are put back and retried on the
+next flush when the failure may pass (a locked database, a dropped
+connection). Any other failure drops the game, and discard_handler brings
+its players back in line with the state reloaded from the database.
+
+Database I/O goes through the async engine. Every game has an AsyncSession
+whose sync_session is the WriteBehindSession handed to game_logic, so the
+rules run unchanged while loads and flushes never block the event loop.
+
+Actions that change a game run under runtime.acquire(), which holds that
+game's own lock; actions on different games never wait for each other.
+
+Workers sharing a unix:// bus without the dispatcher may each hold a copy of
+the same game. They run shared: every action's changes, rows included, are
+written before its broadcasts go out and before it answers (settle()), and
+each request reloads the game unless it is in use here. A worker also drops
+its copy when another worker's broadcast for the game arrives (drop_copy()),
+so idle copies do not linger. Two workers changing a game at once both
+write the same event seq; the database keeps the first, and the other's
+settle() reports the conflict.
+
+Durability is tuned with RUNTIME_FLUSH_INTERVAL (0 writes through on every
+commit) and RUNTIME_FLUSH_ON_ROUND_END (write the rows immediately when the
+round or status changes).
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, raiseload, selectinload
+
+from .config import (
+    DB_POOL_SIZE,
+    EVENT_SNAPSHOT_INTERVAL,
+    RUNTIME_FLUSH_INTERVAL,
+    RUNTIME_FLUSH_ON_ROUND_END,
+    RUNTIME_IDLE_TIMEOUT,
+)
+from .database import IS_SQLITE, engine
+from .events import has_pending_events, restore_pending_events, snapshot_state, take_pending_events
+from .models import Game, GameEvent, GameSnapshot
+from .replay import replay_events
+from .state_cache import state_cache
+
+logger = logging.getLogger(__name__)
+
+# Loads a game's whole aggregate in four queries: the game, then one SELECT ... IN
+# per collection. Anything not listed here refuses to emit SQL, so a lazy load
+# added later fails loudly instead of quietly turning into an N+1. Many-to-one
+# lookups such as CardInPlay.owner still resolve from the identity map.
+GAME_AGGREGATE = (
+    selectinload(Game.players).raiseload("*", sql_only=True),
+    selectinload(Game.cards_in_play).raiseload("*", sql_only=True),
+    selectinload(Game.artist_values).raiseload("*", sql_only=True),
+)
+
+
+class WriteBehindSession(Session):
+    """
+    Session whose commit() is deferred.
+
+    commit() only notifies the runtime; write_behind() performs the real commit.
+    """
+
+    on_commit: Optional[Callable[[], None]] = None
+
+    def commit(self) -> None:
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def write_behind(self, events: list[dict] = (), snapshot: Optional[dict] = None) -> None:
+        """Write all pending changes to the database, in one transaction with new event and snapshot rows."""
+        if events:
+            self.execute(insert(GameEvent), events)
+        if snapshot is not None:
+            self.execute(insert(GameSnapshot), [snapshot])
+        super().commit()
+
+
+@dataclass
+class ActiveGame:
+    """A game held in memory by the runtime."""
+    code: str
+    async_db: AsyncSession
+    game: Game
+    # The rows in the database are behind the game in memory
+    dirty: bool = False
+    evicted: bool = False
+    flushed_marker: tuple = ()
+    # Last event reflected in the game's rows in the database
+    projected_seq: int = 0
+    loaded_at: float = field(default_factory=time.monotonic)
+    last_access: float = field(default_factory=time.monotonic)
+    # Held while the game is being written; actions wait for it so they never
+    # mutate objects in the middle of a flush
+    flush_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Held for the whole of an action, from validation to broadcast, so actions
+    # on one game run one at a time and their messages go out in order
+    action_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def db(self) -> WriteBehindSession:
+        """The sync session game_logic runs against."""
+        return self.async_db.sync_session
+
+
+def _round_marker(game: Game) -> tuple:
+    return (game.current_round, game.status)
+
+
+def _retryable(error: Exception) -> bool:
+    """Whether a failed write may succeed if tried again unchanged."""
+    if isinstance(error, DBAPIError):
+        # "database is locked", a lost connection and the like
+        return isinstance(error, OperationalError) or error.connection_invalidated
+    return isinstance(error, (PoolTimeoutError, OSError, asyncio.TimeoutError))
+
+
+class GameRuntime:
+    """Keeps active games in memory and flushes their changes in the background."""
+
+    def __init__(
+        self,
+        flush_interval: float = RUNTIME_FLUSH_INTERVAL,
+        flush_on_round_end: bool = RUNTIME_FLUSH_ON_ROUND_END,
+        idle_timeout: float = RUNTIME_IDLE_TIMEOUT,
+        snapshot_interval: int = EVENT_SNAPSHOT_INTERVAL,
+    ):
+        self.flush_interval = flush_interval
+        self.flush_on_round_end = flush_on_round_end
+        self.idle_timeout = idle_timeout
+        self.snapshot_interval = snapshot_interval
+        # game_code -> ActiveGame
+        self.games: dict[str, ActiveGame] = {}
+        # game_code -> load in progress, so concurrent requests share one load
+        self._loading: dict[str, asyncio.Task] = {}
+        # Flushes scheduled from commits (kept so they are not garbage collected)
+        self._scheduled: set[asyncio.Task] = set()
+        self._flusher: Optional[asyncio.Task] = None
+        # Flushes writing at once. SQLite has a single writer, so more only
+        # contend for its lock while holding pooled connections.
+        self._write_slots = asyncio.Semaphore(1 if IS_SQLITE else DB_POOL_SIZE)
+        # Called with a game's code after its copy is dropped because a write
+        # failed, to resync its sockets (set by main)
+        self.discard_handler: Optional[Callable[[str], Awaitable[None]]] = None
+        # Other workers may hold copies of the same games (set by main)
+        self.shared = False
+
+    async def get(self, code: str) -> Optional[ActiveGame]:
+        """
+        Get an active game by code, loading it from the database on first use.
+
+        Waits for any flush of the game in progress, so the caller can mutate
+        the game until its next await.
+        """
+        code = code.upper()
+        started = time.monotonic()
+        while True:
+            active = self.games.get(code)
+            if active is not None and self._stale(active, started) and not active.action_lock.locked():
+                await self._drop(active)
+                continue
+            if active is None:
+                loading = self._loading.get(code)
+                if loading is None:
+                    loading = asyncio.create_task(self._load(code))
+                    self._loading[code] = loading
+                    loading.add_done_callback(lambda _: self._loading.pop(code, None))
+                active = await loading
+                if active is None:
+                    return None
+
+            async with active.flush_lock:
+                pass
+            if not active.evicted:
+                active.last_access = time.monotonic()
+                return active
+
+    @asynccontextmanager
+    async def acquire(self, code: str) -> AsyncIterator[Optional[ActiveGame]]:
+        """
+        Get an active game and hold its action lock for the duration of the block.
+
+        Yields None if the game does not exist. Only actions on the same game
+        wait for each other; games never share a lock.
+        """
+        started = time.monotonic()
+        while True:
+            active = await self.get(code)
+            if active is None:
+                yield None
+                return
+            async with active.action_lock:
+                # A flush or eviction may have started while waiting for the lock
+                async with active.flush_lock:
+                    pass
+                if active.evicted:
+                    continue
+                if self._stale(active, started):
+                    # Another worker may have acted while this one waited
+                    await self._drop(active)
+                    continue
+                active.last_access = time.monotonic()
+                yield active
+                return
+
+    def _stale(self, active: ActiveGame, since: float) -> bool:
+        """When running shared, whether a copy predates a request and can be reloaded for it."""
+        return (
+            self.shared and active.loaded_at < since
+            and not active.dirty and not has_pending_events(active.game)
+        )
+
+    async def _load(self, code: str) -> Optional[ActiveGame]:
+        """
+        Load a game's whole aggregate into a new write-behind session, and
+        replay the events logged since its rows were last written.
+        """
+        async_db = AsyncSession(
+            engine,
+            sync_session_class=WriteBehindSession,
+            autoflush=False,
+            # The aggregate stays loaded across commits; nothing is ever re-fetched
+            expire_on_commit=False,
+        )
+        result = await async_db.execute(select(Game).where(Game.code == code).options(*GAME_AGGREGATE))
+        game = result.scalars().first()
+        if not game:
+            await async_db.close()
+            return None
+        # Bounded by the snapshot interval, unless the worker stopped uncleanly
+        events = (await async_db.execute(
+            select(GameEvent.seq, GameEvent.type, GameEvent.data)
+            .where(GameEvent.game_id == game.id, GameEvent.seq > game.event_seq)
+            .order_by(GameEvent.seq)
+        )).all()
+
+        # End the read transaction so the session does not pin a pooled connection
+        await async_db.run_sync(WriteBehindSession.write_behind)
+
+        active = ActiveGame(
+            code=code, async_db=async_db, game=game,
+            flushed_marker=_round_marker(game), projected_seq=game.event_seq
+        )
+        if events:
+            replay_events(active.db, game, events)
+            active.dirty = True
+            logger.info("Game %s: replayed %d events logged after its rows", code, len(events))
+        active.db.on_commit = lambda: self._on_commit(active)
+        self.games[code] = active
+        return active
+
+    def _on_commit(self, active: ActiveGame) -> None:
+        active.dirty = True
+        if self.flush_interval <= 0 or (
+            self.flush_on_round_end and _round_marker(active.game) != active.flushed_marker
+        ):
+            self._schedule(self.flush_game(active))
+
+    def _schedule(self, coro: Awaitable) -> None:
+        # In a fresh context: a task started during an action must not join
+        # the action's broadcast batch, which is published without it
+        task = asyncio.get_running_loop().create_task(coro, context=contextvars.Context())
+        self._scheduled.add(task)
+        task.add_done_callback(self._scheduled.discard)
+
+    def _rows_due(self, active: ActiveGame) -> bool:
+        """Whether a flush should rewrite the game's rows rather than only log events."""
+        return (
+            active.game.event_seq - active.projected_seq >= self.snapshot_interval
+            or (self.flush_on_round_end and _round_marker(active.game) != active.flushed_marker)
+        )
+
+    async def flush_game(self, active: ActiveGame, rows: bool = False) -> bool:
+        """
+        Write one game's pending changes to the database: its new events, and
+        its rows and a snapshot when they are due or rows is set.
+
+        Returns whether anything was written. A failure is logged, not raised:
+        the events are kept for the next flush if it may pass, otherwise the
+        game is dropped and resynced.
+        """
+        # Wait for a write slot before taking the game's flush lock, so actions
+        # on the game are not held up while the flush is only queued
+        async with self._write_slots, active.flush_lock:
+            if active.evicted:
+                return False
+            game = active.game
+            write_rows = active.dirty and (rows or self._rows_due(active))
+            if not write_rows and not has_pending_events(game):
+                return False
+            marker = _round_marker(game)
+            seq = game.event_seq
+            events = take_pending_events(game)
+            if events:
+                try:
+                    async with engine.begin() as conn:
+                        await conn.execute(insert(GameEvent), events)
+                except Exception as e:
+                    restore_pending_events(game, events)
+                    if _retryable(e):
+                        logger.warning("Failed to write events of game %s; retrying: %s", active.code, e)
+                        return False
+                    # Such as the same seq already written by another copy: the
+                    # database's history wins and this copy's unwritten moves are undone
+                    logger.exception("Failed to write events of game %s; reloading it", active.code)
+                    await self._discard(active)
+                    return False
+            if not write_rows:
+                return True
+            active.dirty = False
+            # The rows at a seq never change, so one snapshot per seq
+            snapshot = None
+            if seq != active.projected_seq:
+                snapshot = {"game_id": game.id, "seq": seq, "state": snapshot_state(game)}
+            try:
+                await active.async_db.run_sync(WriteBehindSession.write_behind, (), snapshot)
+            except Exception:
+                # The session's objects can no longer be trusted, but every event
+                # is in, so reloading replays them onto the last rows written.
+                # Closing the session discards the failed transaction.
+                logger.exception("Failed to write rows of game %s; reloading it", active.code)
+                await self._discard(active)
+                return False
+            active.projected_seq = seq
+            active.flushed_marker = marker
+            return True
+
+    async def settle(self, active: ActiveGame) -> bool:
+        """
+        When running shared, write an action's changes out, rows included,
+        before its broadcasts reach the workers that will reload the game.
+
+        Returns False if the write failed and the game was dropped, such as
+        when another worker changed it first.
+        """
+        if self.shared and active.dirty:
+            await self.flush_game(active, rows=True)
+        return not active.evicted
+
+    async def drop_copy(self, code: str) -> None:
+        """
+        Another worker changed a game: once any action on it here is done,
+        drop this worker's copy unwritten, so the next request reloads it.
+        """
+        active = self.games.get(code.upper())
+        if active is None:
+            return
+        async with active.action_lock:
+            if active.dirty or has_pending_events(active.game):
+                # A write here failed and is being retried; if this copy is stale
+                # the retry conflicts, and the game is dropped and resynced then
+                return
+            await self.evict(code, flush=False)
+
+    async def flush_all(self) -> int:
+        """Flush every dirty game. Returns the number of games written."""
+        dirty = [active for active in self.games.values() if active.dirty]
+        written = 0
+        for active in dirty:
+            written += await self.flush_game(active)
+        return written
+
+    async def drain(self) -> None:
+        """Wait for flushes scheduled by commits to finish."""
+        if self._scheduled:
+            await asyncio.gather(*self._scheduled, return_exceptions=True)
+
+    async def evict(self, code: str, flush: bool = True) -> None:
+        """Remove a game from memory, writing it out first unless told not to."""
+        active = self.games.get(code.upper())
+        if active is None:
+            return
+        if flush:
+            await self.flush_game(active, rows=True)
+            if not active.evicted and has_pending_events(active.game):
+                # Kept until its events are in; the next flush retries them
+                logger.warning("Game %s not evicted: its events could not be written", active.code)
+                return
+        await self._drop(active)
+
+    async def _drop(self, active: ActiveGame) -> None:
+        """Forget a game; requests already holding it reload on their next get()."""
+        if self.games.get(active.code) is active:
+            del self.games[active.code]
+        active.evicted = True
+        state_cache.discard(active.game.id)
+        active.db.on_commit = None
+        await active.async_db.close()
+
+    async def _discard(self, active: ActiveGame) -> None:
+        """Drop a game whose copy could not be written, and resync its sockets once it reloads."""
+        await self._drop(active)
+        if self.discard_handler is not None:
+            # Not awaited: the caller still holds the game's flush lock
+            self._schedule(self.discard_handler(active.code))
+
+    async def evict_idle(self) -> None:
+        """Evict games that have not been accessed within the idle timeout."""
+        cutoff = time.monotonic() - self.idle_timeout
+        for code in [c for c, a in self.games.items() if a.last_access < cutoff]:
+            await self.evict(code)
+
+    async def _flush_loop(self) -> None:
+        interval = self.flush_interval if self.flush_interval > 0 else 1.0
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush_all()
+                await self.evict_idle()
+            except Exception:
+                logger.exception("Game runtime flush failed")
+
+    def start(self) -> None:
+        """Start the background flusher."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background flusher and write everything out."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.drain()
+        for code in list(self.games):
+            await self.evict(code)
+
+
+# Global game runtime instance
+runtime = GameRuntime()
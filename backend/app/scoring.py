@@ -0,0 +1,62 @@
+"""
+Scoring read model: artist counts per round and artist values.
+
+A game's cards_in_play and artist_values only ever grow, so each game keeps a
+Scoreboard that folds in the rows appended since it was last read. Reading
+counts or values costs a dict lookup plus the new rows, instead of a scan of
+every card and value in the game. Scoreboards are held per Game instance and
+disappear with it, so a game reloaded from the database starts from scratch.
+"""
+
+from weakref import WeakKeyDictionary
+
+from .cards import ARTISTS
+from .models import Game
+
+
+class Scoreboard:
+    """Per-round artist counts and per-round/cumulative artist values of one game."""
+
+    def __init__(self):
+        # round -> artist -> paintings played
+        self.counts: dict[int, dict[str, int]] = {}
+        # artist -> round -> value
+        self.values_by_round: dict[str, dict[int, int]] = {artist: {} for artist in ARTISTS}
+        # artist -> total value across rounds
+        self.cumulative: dict[str, int] = {artist: 0 for artist in ARTISTS}
+        # How many cards_in_play / artist_values rows have been folded in
+        self.cards_seen = 0
+        self.values_seen = 0
+
+    def sync(self, game: Game) -> None:
+        """Fold in rows appended to the game since the last sync."""
+        cards = game.cards_in_play
+        for card in cards[self.cards_seen:]:
+            round_counts = self.counts.get(card.round)
+            if round_counts is None:
+                round_counts = self.counts[card.round] = {artist: 0 for artist in ARTISTS}
+            round_counts[card.artist] += 1
+        self.cards_seen = len(cards)
+
+        values = game.artist_values
+        for av in values[self.values_seen:]:
+            self.values_by_round[av.artist][av.round] = av.value
+            self.cumulative[av.artist] += av.value
+        self.values_seen = len(values)
+
+    def round_counts(self, round_num: int) -> dict[str, int]:
+        """Paintings played per artist in a round (a copy)."""
+        counts = self.counts.get(round_num)
+        return dict(counts) if counts else {artist: 0 for artist in ARTISTS}
+
+
+_scoreboards: "WeakKeyDictionary[Game, Scoreboard]" = WeakKeyDictionary()
+
+
+def get_scoreboard(game: Game) -> Scoreboard:
+    """Get the game's scoreboard, brought up to date with its rows."""
+    board = _scoreboards.get(game)
+    if board is None:
+        board = _scoreboards[game] = Scoreboard()
+    board.sync(game)
+    return board
@@ -0,0 +1,58 @@
+"""
+Per-game cache of the public game state built by build_game_state_response.
+
+Every change to a game bumps its revision with invalidate(); entries are keyed
+by (game id, revision) so a stale state is never served. Cached states are
+shared between callers and must be treated as read-only.
+"""
+
+from typing import Optional
+
+
+class StateCache:
+    """Caches one public state per game, with hit/miss counters."""
+
+    def __init__(self):
+        # game_id -> revision, bumped on every change to the game
+        self.revisions: dict[str, int] = {}
+        # game_id -> (revision the state was built at, state)
+        self.entries: dict[str, tuple[int, dict]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, game_id: str) -> Optional[dict]:
+        """Get the cached state for the game's current revision, if any."""
+        entry = self.entries.get(game_id)
+        if entry is not None and entry[0] == self.revisions.get(game_id, 0):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def put(self, game_id: str, state: dict) -> None:
+        """Cache a state built at the game's current revision."""
+        self.entries[game_id] = (self.revisions.get(game_id, 0), state)
+
+    def invalidate(self, game_id: str) -> None:
+        """Mark the game as changed."""
+        self.revisions[game_id] = self.revisions.get(game_id, 0) + 1
+        self.entries.pop(game_id, None)
+
+    def discard(self, game_id: str) -> None:
+        """Forget a game entirely (e.g. when it leaves memory)."""
+        self.revisions.pop(game_id, None)
+        self.entries.pop(game_id, None)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "entries": len(self.entries),
+        }
+
+
+# Global state cache instance
+state_cache = StateCache()
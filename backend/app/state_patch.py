@@ -0,0 +1,51 @@
+"""
+JSON-patch style diffs between two game states.
+
+Produces a subset of RFC 6902 operations (add, remove, replace) that the
+frontend applies in order to turn the previous state into the new one.
+"""
+
+from typing import Any
+
+
+def _escape(key: Any) -> str:
+    """Escape a key for use as a JSON pointer segment."""
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def make_patch(old: Any, new: Any, path: str = "") -> list[dict]:
+    """
+    Build the operations that turn `old` into `new`.
+
+    Dicts are compared key by key. Lists are compared index by index, with
+    trailing items added or removed; a list that becomes (or was) empty is
+    replaced whole. Anything else is replaced when it differs.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(make_patch(old[key], value, child))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list) and old and new:
+        ops = []
+        common = min(len(old), len(new))
+        for i in range(common):
+            ops.extend(make_patch(old[i], new[i], f"{path}/{i}"))
+        for i in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{i}", "value": new[i]})
+        # Remove from the end so earlier indices stay valid
+        for i in range(len(old) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{i}"})
+        return ops
+
+    if old != new or type(old) is not type(new):
+        return [{"op": "replace", "path": path, "value": new}]
+    return []
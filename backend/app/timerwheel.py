@@ -0,0 +1,61 @@
+"""
+Hashed timer wheel: many timeouts, one clock.
+
+Deadlines are rounded up to the next tick and kept in a ring of slots, one
+per tick. Scheduling and cancelling are O(1) set operations, and each tick
+only looks at the keys due in that slot, however many are scheduled. Nothing
+here sleeps or creates tasks: the owner calls advance() from its own loop.
+
+A key lives in at most one slot. Timeouts that are usually pushed back (a
+connection's idle deadline moving on with every message) are cheapest left
+in place and rechecked when they come due, rather than rescheduled each time.
+"""
+
+import math
+import time
+from typing import Hashable
+
+
+class TimerWheel:
+    """Keys due after a delay, resolved to whole ticks."""
+
+    def __init__(self, tick: float, span: float):
+        """tick: seconds per slot; span: the longest delay, longer ones are capped to it."""
+        self.tick = tick
+        self.slots: list[set] = [set() for _ in range(math.ceil(span / tick) + 1)]
+        # key -> index of the slot holding it
+        self.where: dict[Hashable, int] = {}
+        self.position = 0
+        self.now = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.where)
+
+    def schedule(self, key: Hashable, delay: float) -> None:
+        """Make key due after delay seconds (at least one tick), replacing any earlier schedule."""
+        self.cancel(key)
+        ticks = min(max(1, math.ceil(delay / self.tick)), len(self.slots) - 1)
+        index = (self.position + ticks) % len(self.slots)
+        self.slots[index].add(key)
+        self.where[key] = index
+
+    def cancel(self, key: Hashable) -> None:
+        index = self.where.pop(key, None)
+        if index is not None:
+            self.slots[index].discard(key)
+
+    def advance(self, now: float) -> list:
+        """Move the wheel on to now and return the keys that came due, oldest slot first."""
+        due = []
+        ticks = int((now - self.now) // self.tick)
+        self.now += ticks * self.tick
+        # After a stall longer than the span, one turn empties every slot
+        for _ in range(min(ticks, len(self.slots))):
+            self.position = (self.position + 1) % len(self.slots)
+            slot = self.slots[self.position]
+            if slot:
+                for key in slot:
+                    del self.where[key]
+                due.extend(slot)
+                slot.clear()
+        return due
@@ -1,74 +1,682 @@
 """
 WebSocket connection manager for real-time updates.
+
+Game state is versioned per game. The first broadcast (and every connect or
+resync) sends a full `game_state` snapshot; later broadcasts send a
+`game_state_patch` holding only the diff against the previous version.
+
+Sends never block the caller: each connection has an outbound queue drained
+by its own writer task, so one slow client cannot delay the others. A send
+that exceeds WS_SEND_TIMEOUT, or a queue that fills up, evicts the connection.
+
+Messages are encoded to text once per broadcast; per-player private fields are
+spliced onto the shared encoding (see encoding.py). Fan-out time, recipients
+and frame sizes are recorded per message type (see metrics.py). Sockets that
+negotiated MessagePack get each frame transcoded as it is queued, once per
+frame however many of them share it.
+
+Broadcasts made inside batch() are held and sent together when the block
+ends, as a single `batch` frame per recipient listing its messages in order.
+Every action runs in one, so its event and the state it led to arrive as one
+frame.
+
+Spectators connect read-only and get only the public state and events. They
+are not players: they take no seat and have no private data, so every
+update is encoded once for all of a game's spectators and the same text is
+queued on each of their sockets. A connecting spectator is sent the last
+broadcast state, encoded once per version, without touching the game.
+
+Broadcasts go through a pub/sub bus (see pubsub.py) so that, with several
+worker processes, each worker delivers them to the sockets it holds. Versions
+and patch bases are kept per worker: every worker diffs the published state
+against the last state its own clients saw.
+
+Each game keeps its last WS_REPLAY_BUFFER patches. A client reconnecting
+after a drop sends the version it last applied and the stream it belongs to
+(a per-game id that changes whenever versions restart, on another worker or
+after a restart), and is sent just the patches it missed. It gets a snapshot
+only when the gap goes back further than the buffer. Other broadcasts are
+notifications whose effects are part of the state, so they are not replayed.
+
+Liveness is checked by the server. Every message a socket sends counts as a
+sign of life; one that has been silent for WS_HEARTBEAT_INTERVAL is sent
+"ping", and one that does not answer within WS_HEARTBEAT_TIMEOUT is closed.
+A dead TCP connection is otherwise only noticed when a send to it fails.
+All sockets share one timer wheel (see timerwheel.py) served by one task;
+each tick, the players of the sockets closed are handed to reap_handler
+together, one call per game.
 """
 
-import json
-from typing import Optional
-from fastapi import WebSocket
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Optional, Union
+from fastapi import WebSocket, WebSocketDisconnect
+
+from .config import (
+    PUBSUB_URL,
+    WS_HEARTBEAT_INTERVAL,
+    WS_HEARTBEAT_TICK,
+    WS_HEARTBEAT_TIMEOUT,
+    WS_REPLAY_BUFFER,
+    WS_SEND_QUEUE_SIZE,
+    WS_SEND_TIMEOUT,
+)
+from .encoding import (
+    choose_subprotocol,
+    decode_json,
+    decode_msgpack,
+    encode_envelope,
+    encode_json,
+    json_to_msgpack,
+    splice_fields,
+)
+from .metrics import (
+    BROADCAST_RECIPIENTS,
+    BROADCAST_SECONDS,
+    WS_CONNECT_SYNC,
+    WS_HEARTBEAT_EVICTIONS,
+    WS_MESSAGE_BYTES,
+)
+from .pubsub import Bus, create_bus
+from .state_patch import make_patch
+from .timerwheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+# Connection ids of spectators start with this; player ids are UUIDs
+SPECTATOR_PREFIX = "spectator-"
+
+# The open batch: (game_code, bus messages held for it), or None
+_batch: ContextVar[Optional[tuple[str, list[dict]]]] = ContextVar("broadcast_batch", default=None)
 
 
 class ConnectionManager:
     """Manages WebSocket connections per game."""
 
-    def __init__(self):
+    def __init__(self, bus: Optional[Bus] = None):
+        self.bus = bus or Bus()
+        self.bus.subscribe(self._deliver)
         # game_code -> {player_id -> WebSocket}
         self.active_connections: dict[str, dict[str, WebSocket]] = {}
+        # game_code -> {spectator id -> WebSocket}
+        self.spectators: dict[str, dict[str, WebSocket]] = {}
+        # game_code -> version of the last broadcast public state
+        self.state_versions: dict[str, int] = {}
+        # game_code -> last broadcast public state (the base for the next patch)
+        self.last_states: dict[str, dict] = {}
+        # game_code -> id of the run of versions state_versions counts
+        self.streams: dict[str, str] = {}
+        # game_code -> (version, encoded patch envelope) for the latest versions,
+        # consecutive and ending at the current one; empty after a snapshot
+        self.replay_buffers: dict[str, deque[tuple[int, str]]] = {}
+        # game_code -> (version, encoded snapshot frame) sent to connecting spectators
+        self.spectator_snapshots: dict[str, tuple[int, str]] = {}
+        # WebSocket -> queue of encoded frames (bytes on binary sockets) and the
+        # writer task draining it
+        self.outboxes: dict[WebSocket, asyncio.Queue] = {}
+        self.writers: dict[WebSocket, asyncio.Task] = {}
+        # Sockets closed because their game moved to another worker
+        self.handed_off: set[WebSocket] = set()
+        # Sockets that negotiated MessagePack, and the last frame transcoded
+        # for them, reused while a broadcast is queued for each of them
+        self.binary: set[WebSocket] = set()
+        self._transcoded: tuple[Optional[str], bytes] = (None, b"")
+        # WebSocket -> monotonic time it last sent anything, for open sockets;
+        # the wheel holds each one's next check as (websocket, game_code, id)
+        self.last_seen: dict[WebSocket, float] = {}
+        self.heartbeats = TimerWheel(WS_HEARTBEAT_TICK, max(WS_HEARTBEAT_INTERVAL, WS_HEARTBEAT_TIMEOUT))
+        # WebSocket -> monotonic time it was sent a ping, until its answer is checked
+        self.pinged: dict[WebSocket, float] = {}
+        # Player sockets closed for silence; their players were already marked
+        # disconnected, so the endpoint skips its disconnect bookkeeping
+        self.reaped: set[WebSocket] = set()
+        # Called with a game's code and the players whose sockets were closed
+        # for silence in one tick
+        self.reap_handler: Optional[Callable[[str, list[str]], Awaitable[None]]] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Join the pub/sub bus and start the heartbeat checks."""
+        await self.bus.start()
+        if WS_HEARTBEAT_INTERVAL > 0 and self._heartbeat_task is None:
+            self.heartbeats.now = time.monotonic()
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        """Stop the heartbeat checks and leave the pub/sub bus."""
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        await self.bus.stop()
 
     async def connect(self, websocket: WebSocket, game_code: str, player_id: str):
-        """Accept a new WebSocket connection."""
-        await websocket.accept()
-        if game_code not in self.active_connections:
-            self.active_connections[game_code] = {}
-        self.active_connections[game_code][player_id] = websocket
-
-    def disconnect(self, game_code: str, player_id: str):
-        """Remove a WebSocket connection."""
-        if game_code in self.active_connections:
-            self.active_connections[game_code].pop(player_id, None)
-            if not self.active_connections[game_code]:
-                del self.active_connections[game_code]
+        """Accept a new WebSocket connection in the wire format the client offered."""
+        subprotocol = choose_subprotocol(websocket.scope.get("subprotocols", []))
+        await websocket.accept(subprotocol=subprotocol)
+        if subprotocol == "msgpack":
+            self.binary.add(websocket)
 
-    async def send_personal_message(self, message: dict, game_code: str, player_id: str):
-        """Send a message to a specific player."""
-        if game_code in self.active_connections:
-            websocket = self.active_connections[game_code].get(player_id)
+        # A reconnect can arrive before the old socket is noticed as dead
+        connections = self._connections(player_id)
+        previous = connections.get(game_code, {}).get(player_id)
+        if previous is not None:
+            self.evict(game_code, player_id, previous)
+
+        connections.setdefault(game_code, {})[player_id] = websocket
+        self.outboxes[websocket] = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.writers[websocket] = asyncio.create_task(
+            self._writer(websocket, game_code, player_id)
+        )
+        if WS_HEARTBEAT_INTERVAL > 0:
+            self.last_seen[websocket] = time.monotonic()
+            self.heartbeats.schedule((websocket, game_code, player_id), WS_HEARTBEAT_INTERVAL)
+
+    async def connect_spectator(self, websocket: WebSocket, game_code: str) -> str:
+        """Accept a spectator's WebSocket. Returns the id it is registered under."""
+        spectator_id = SPECTATOR_PREFIX + uuid.uuid4().hex
+        await self.connect(websocket, game_code, spectator_id)
+        return spectator_id
+
+    def _connections(self, connection_id: str) -> dict[str, dict[str, WebSocket]]:
+        """The registry a player or spectator connection belongs in."""
+        return self.spectators if connection_id.startswith(SPECTATOR_PREFIX) else self.active_connections
+
+    def disconnect(self, game_code: str, player_id: str, websocket: Optional[WebSocket] = None):
+        """
+        Remove a WebSocket connection.
+
+        If websocket is given, only remove the player's connection if it is still
+        that socket (a newer connection for the same player is left alone).
+        """
+        registry = self._connections(player_id)
+        connections = registry.get(game_code)
+        if connections is not None:
+            current = connections.get(player_id)
+            if websocket is None:
+                websocket = current
+            if current is websocket:
+                connections.pop(player_id, None)
+            if not connections:
+                del registry[game_code]
+            if game_code not in self.active_connections and game_code not in self.spectators:
+                # Nobody holds a base to patch against; next broadcast is a snapshot
+                self.last_states.pop(game_code, None)
+                self.replay_buffers.pop(game_code, None)
+                self.spectator_snapshots.pop(game_code, None)
+
+        if websocket is not None:
+            self._stop_writer(websocket)
+
+    def seen(self, websocket: WebSocket):
+        """Note that a socket sent something, so it is alive."""
+        if websocket in self.last_seen:
+            self.last_seen[websocket] = time.monotonic()
+
+    async def receive(self, websocket: WebSocket) -> Union[dict, str, None]:
+        """
+        The next frame a client sent, marking the socket seen.
+
+        "ping" and "pong" come back as text. Other text frames are decoded as
+        JSON; binary frames as MessagePack, and only from a socket that
+        negotiated it: any other binary frame closes the socket with 1003.
+        Returns None for a frame that does not decode; raises
+        WebSocketDisconnect when the client has gone.
+        """
+        frame = await websocket.receive()
+        if frame["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(frame.get("code", 1000), frame.get("reason"))
+        self.seen(websocket)
+        text = frame.get("text")
+        if text is not None:
+            if text in ("ping", "pong"):
+                return text
+            try:
+                return decode_json(text)
+            except ValueError:
+                return None
+        if websocket not in self.binary:
+            await self._close(websocket, code=1003)
+            raise WebSocketDisconnect(1003, "Binary frames need the msgpack subprotocol")
+        try:
+            return decode_msgpack(frame["bytes"])
+        except (ValueError, TypeError, IndexError):
+            return None
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeats.tick)
+            try:
+                await self.check_heartbeats(time.monotonic())
+            except Exception:
+                logger.exception("WebSocket heartbeat check failed")
+
+    async def check_heartbeats(self, now: float):
+        """
+        Check the sockets whose deadlines have come: ping those silent for the
+        heartbeat interval, close those that did not answer their ping, and
+        hand each game's closed players to reap_handler in one call.
+        """
+        silent: dict[str, list[str]] = {}
+        for key in self.heartbeats.advance(now):
+            websocket, game_code, connection_id = key
+            last_seen = self.last_seen.get(websocket)
+            if last_seen is None:
+                # Closed since it was scheduled
+                continue
+            pinged_at = self.pinged.pop(websocket, None)
+            if pinged_at is None or last_seen >= pinged_at:
+                if now - last_seen < WS_HEARTBEAT_INTERVAL:
+                    # Heard from lately; check again once it has been quiet long enough
+                    self.heartbeats.schedule(key, last_seen + WS_HEARTBEAT_INTERVAL - now)
+                else:
+                    self.pinged[websocket] = now
+                    self._enqueue(websocket, game_code, connection_id, "ping")
+                    self.heartbeats.schedule(key, WS_HEARTBEAT_TIMEOUT)
+            else:
+                logger.info("Evicting %s/%s: no heartbeat", game_code, connection_id)
+                WS_HEARTBEAT_EVICTIONS.inc()
+                if not connection_id.startswith(SPECTATOR_PREFIX):
+                    self.reaped.add(websocket)
+                    silent.setdefault(game_code, []).append(connection_id)
+                self.evict(game_code, connection_id, websocket)
+        if self.reap_handler is not None:
+            for game_code, player_ids in silent.items():
+                await self.reap_handler(game_code, player_ids)
+
+    async def send_personal_message(self, message: Union[dict, str], game_code: str, player_id: str):
+        """Send a message (a dict, or already-encoded text) to a specific player or spectator."""
+        connections = self._connections(player_id)
+        if game_code in connections:
+            websocket = connections[game_code].get(player_id)
             if websocket:
-                await websocket.send_json(message)
+                frame = message if isinstance(message, str) else encode_json(message)
+                self._enqueue(websocket, game_code, player_id, frame)
 
     async def broadcast(self, message: dict, game_code: str, exclude_player_id: Optional[str] = None):
-        """Broadcast a message to all players in a game."""
-        if game_code in self.active_connections:
-            for player_id, websocket in self.active_connections[game_code].items():
-                if player_id != exclude_player_id:
-                    try:
-                        await websocket.send_json(message)
-                    except Exception:
-                        # Connection might be closed
-                        pass
+        """Broadcast a message to all players in a game, on every worker."""
+        await self._publish({
+            "type": "broadcast",
+            "game_code": game_code,
+            "message_type": message["type"],
+            "frame": encode_json(message),
+            "exclude_player_id": exclude_player_id
+        })
+
+    @asynccontextmanager
+    async def batch(self, game_code: str) -> AsyncIterator[None]:
+        """
+        Hold the game's broadcasts made in the block and publish them together
+        on exit, so each recipient gets them in one frame. A batch already open
+        for the game takes the block's broadcasts instead.
+        """
+        current = _batch.get()
+        if current is not None and current[0] == game_code:
+            yield
+            return
+        messages: list[dict] = []
+        token = _batch.set((game_code, messages))
+        try:
+            yield
+        finally:
+            _batch.reset(token)
+            if len(messages) == 1:
+                await self.bus.publish(messages[0])
+            elif messages:
+                await self.bus.publish({"type": "batch", "game_code": game_code, "messages": messages})
+
+    async def _publish(self, message: dict):
+        """Publish a message on the bus, or hold it if its game has a batch open."""
+        current = _batch.get()
+        if current is not None and current[0] == message["game_code"]:
+            current[1].append(message)
+        else:
+            await self.bus.publish(message)
 
-    async def broadcast_game_state(self, game_state: dict, game_code: str, private_data: dict[str, dict]):
+    async def _deliver(self, message: dict):
+        """Deliver a message from the bus to this worker's sockets."""
+        start = time.perf_counter()
+        if message["type"] == "batch":
+            message_type = "batch"
+            frames, shared = self._render_batch(message["messages"])
+        else:
+            message_type, frames, shared = self._render(message)
+        game_code = message["game_code"]
+        spectators = self.spectators.get(game_code, {}) if shared is not None else {}
+        if not frames and not spectators:
+            return
+        connections = self.active_connections.get(game_code, {})
+        for player_id, frame in frames.items():
+            websocket = connections.get(player_id)
+            if websocket is not None:
+                self._enqueue(websocket, game_code, player_id, frame)
+        # One encoding for every spectator
+        for spectator_id, websocket in list(spectators.items()):
+            self._enqueue(websocket, game_code, spectator_id, shared)
+        BROADCAST_SECONDS.observe(time.perf_counter() - start, type=message_type)
+        BROADCAST_RECIPIENTS.observe(len(frames) + len(spectators), type=message_type)
+        for frame in frames.values():
+            WS_MESSAGE_BYTES.observe(len(frame), type=message_type)
+        if spectators:
+            WS_MESSAGE_BYTES.observe(len(shared), type=message_type)
+
+    def _render(self, message: dict) -> tuple[str, dict[str, str], Optional[str]]:
+        """
+        A bus message's type as sent, the frame for each of this worker's
+        players, and the frame for its spectators (None if there are none).
+        """
+        if message["type"] == "game_state":
+            return self._render_game_state(
+                message["game_state"],
+                message["game_code"],
+                message["private_data"],
+                message["exclude_player_id"]
+            )
+        game_code = message["game_code"]
+        exclude_player_id = message["exclude_player_id"]
+        frame = message["frame"]
+        players = {
+            player_id: frame
+            for player_id in self.active_connections.get(game_code, {})
+            if player_id != exclude_player_id
+        }
+        return message.get("message_type", "broadcast"), players, frame if game_code in self.spectators else None
+
+    def _render_batch(self, messages: list[dict]) -> tuple[dict[str, str], Optional[str]]:
+        """Each player's frames, and the spectators', from a batch of messages, each joined into one frame in order."""
+        frames: dict[str, list[str]] = {}
+        shared: list[str] = []
+        for message in messages:
+            _, players, spectators = self._render(message)
+            for player_id, frame in players.items():
+                frames.setdefault(player_id, []).append(frame)
+            if spectators is not None:
+                shared.append(spectators)
+        return (
+            {player_id: self._join(parts) for player_id, parts in frames.items()},
+            self._join(shared) if shared else None
+        )
+
+    @staticmethod
+    def _join(frames: list[str]) -> str:
+        """One frame carrying already-encoded messages in order, joined as text."""
+        if len(frames) == 1:
+            return frames[0]
+        return '{"type":"batch","messages":[' + ",".join(frames) + "]}"
+
+    def _enqueue(self, websocket: WebSocket, game_code: str, player_id: str, frame: str):
+        """
+        Queue a frame for a connection's writer, evicting it if it has fallen
+        too far behind. Messages go to binary sockets as MessagePack; other
+        text (the "pong" keepalive) is sent as it is.
+        """
+        outbox = self.outboxes.get(websocket)
+        if outbox is None:
+            return
+        if websocket in self.binary and frame.startswith("{"):
+            if self._transcoded[0] is not frame:
+                self._transcoded = frame, json_to_msgpack(frame)
+            frame = self._transcoded[1]
+        try:
+            outbox.put_nowait(frame)
+        except asyncio.QueueFull:
+            logger.info("Evicting %s/%s: send queue full", game_code, player_id)
+            self.evict(game_code, player_id, websocket)
+
+    async def _writer(self, websocket: WebSocket, game_code: str, player_id: str):
+        """Drain one connection's outbound queue in order."""
+        outbox = self.outboxes[websocket]
+        while True:
+            frame = await outbox.get()
+            send = websocket.send_bytes if isinstance(frame, bytes) else websocket.send_text
+            try:
+                await asyncio.wait_for(send(frame), WS_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.info("Evicting %s/%s: send timed out", game_code, player_id)
+                self.evict(game_code, player_id, websocket)
+                return
+            except Exception:
+                # Connection closed underneath us
+                self.evict(game_code, player_id, websocket)
+                return
+            # On Python 3.11, wait_for can swallow a cancel that lands as the
+            # send completes; a stopped writer must not wait on its old queue.
+            if self.outboxes.get(websocket) is not outbox:
+                return
+
+    def evict(self, game_code: str, player_id: str, websocket: WebSocket, code: int = 1011):
+        """
+        Drop a connection and close its socket in the background.
+
+        The endpoint's receive loop then sees the disconnect and runs its usual
+        cleanup.
+        """
+        self.disconnect(game_code, player_id, websocket)
+        asyncio.create_task(self._close(websocket, code))
+
+    def hand_off(self, game_code: str):
+        """
+        Close every connection to a game that has moved to another worker.
+
+        Sockets are closed with 1012 (service restart) so clients reconnect,
+        and are remembered so the endpoint skips its disconnect bookkeeping:
+        the players are not leaving, they are moving. Spectators move too.
+        """
+        for registry in (self.active_connections, self.spectators):
+            for player_id, websocket in list(registry.get(game_code, {}).items()):
+                self.handed_off.add(websocket)
+                self.evict(game_code, player_id, websocket, code=1012)
+        self.state_versions.pop(game_code, None)
+        self.streams.pop(game_code, None)
+        self.replay_buffers.pop(game_code, None)
+
+    def _stop_writer(self, websocket: WebSocket):
+        self.binary.discard(websocket)
+        self.last_seen.pop(websocket, None)
+        self.pinged.pop(websocket, None)
+        self.outboxes.pop(websocket, None)
+        writer = self.writers.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int = 1011):
+        try:
+            await asyncio.wait_for(websocket.close(code=code), WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    async def broadcast_game_state(
+        self,
+        game_state: dict,
+        game_code: str,
+        private_data: dict[str, dict],
+        exclude_player_id: Optional[str] = None
+    ):
         """
         Broadcast game state to all players, with private data (hand, money) per player.
 
+        Sends a patch against the previous version when one exists, otherwise a
+        full snapshot. Nothing is sent if the public state did not change.
+
         game_state: Public game state
         private_data: {player_id: {"hand": [...], "money": int}}
         """
-        if game_code in self.active_connections:
-            for player_id, websocket in self.active_connections[game_code].items():
-                try:
-                    # Merge public state with this player's private data
-                    message = {
-                        "type": "game_state",
-                        "data": {
-                            **game_state,
-                            "your_hand": private_data.get(player_id, {}).get("hand", []),
-                            "your_money": private_data.get(player_id, {}).get("money", 0),
-                            "your_player_id": player_id
-                        }
-                    }
-                    await websocket.send_json(message)
-                except Exception:
-                    pass
+        await self._publish({
+            "type": "game_state",
+            "game_code": game_code,
+            "game_state": game_state,
+            "private_data": private_data,
+            "exclude_player_id": exclude_player_id
+        })
+
+    def _render_game_state(
+        self,
+        game_state: dict,
+        game_code: str,
+        private_data: dict[str, dict],
+        exclude_player_id: Optional[str]
+    ) -> tuple[str, dict[str, str], Optional[str]]:
+        """Advance the game's version and render its snapshot or patch for each recipient."""
+        previous = self.last_states.get(game_code)
+        patch = make_patch(previous, game_state) if previous is not None else None
+        if patch == []:
+            return "game_state_patch", {}, None
+
+        base_version = self.state_versions.get(game_code, 0)
+        version = self._next_version(game_code)
+        self.last_states[game_code] = game_state
+
+        if game_code not in self.active_connections and game_code not in self.spectators:
+            self.replay_buffers.pop(game_code, None)
+            return "game_state", {}, None
+
+        # Encode the shared part once; each player only adds their private fields
+        if patch is None:
+            message_type = "game_state"
+            envelope = self._snapshot_envelope(game_state, game_code)
+            self.replay_buffers.pop(game_code, None)
+        else:
+            message_type = "game_state_patch"
+            envelope = encode_envelope({
+                "type": "game_state_patch",
+                "data": {
+                    "version": version,
+                    "base_version": base_version,
+                    "patch": patch
+                }
+            })
+            buffer = self.replay_buffers.get(game_code)
+            if buffer is None:
+                buffer = self.replay_buffers[game_code] = deque(maxlen=WS_REPLAY_BUFFER)
+            buffer.append((version, envelope))
+        players = {
+            player_id: splice_fields(envelope, self._private_fields(player_id, private_data))
+            for player_id in self.active_connections.get(game_code, {})
+            if player_id != exclude_player_id
+        }
+        shared = None
+        if game_code in self.spectators:
+            shared = splice_fields(envelope, {})
+            if patch is None:
+                self.spectator_snapshots[game_code] = (version, shared)
+        return message_type, players, shared
+
+    async def send_game_state(
+        self,
+        game_state: dict,
+        game_code: str,
+        player_id: str,
+        private_data: dict[str, dict]
+    ):
+        """
+        Send a full snapshot of the current version to one player (or spectator).
+
+        Used on connect and when a client reports a version gap. The state
+        becomes the base for the next patch if the game has none yet.
+        """
+        if game_code not in self.last_states:
+            self._next_version(game_code)
+            self.replay_buffers.pop(game_code, None)
+            self.last_states[game_code] = game_state
+        frame = splice_fields(
+            self._snapshot_envelope(game_state, game_code),
+            self._private_fields(player_id, private_data)
+        )
+        await self.send_personal_message(frame, game_code, player_id)
+
+    async def send_spectator_state(self, game_code: str, spectator_id: str) -> bool:
+        """
+        Send a spectator a snapshot of the last broadcast state, encoded once
+        per version however many spectators ask for it.
+
+        Returns False if the game has no broadcast state yet; build one and
+        use send_game_state instead.
+        """
+        state = self.last_states.get(game_code)
+        if state is None:
+            return False
+        version = self.state_versions[game_code]
+        snapshot = self.spectator_snapshots.get(game_code)
+        if snapshot is None or snapshot[0] != version:
+            snapshot = version, splice_fields(self._snapshot_envelope(state, game_code), {})
+            self.spectator_snapshots[game_code] = snapshot
+        await self.send_personal_message(snapshot[1], game_code, spectator_id)
+        return True
+
+    def send_missed_states(
+        self,
+        game_code: str,
+        player_id: str,
+        private_data: dict[str, dict],
+        since: Optional[int] = None,
+        stream: Optional[str] = None
+    ) -> bool:
+        """
+        Catch a reconnecting player up from the version they last applied by
+        resending the patches they missed, with their current private fields.
+
+        Returns False if that is not possible (a first connect, another stream,
+        or a gap older than the buffer); send a snapshot instead.
+        """
+        version = self.state_versions.get(game_code)
+        buffer = self.replay_buffers.get(game_code, ())
+        if since is None or version is None or stream != self.streams.get(game_code) or since > version:
+            WS_CONNECT_SYNC.inc(method="snapshot")
+            return False
+        if since == version:
+            WS_CONNECT_SYNC.inc(method="current")
+            return True
+        if not buffer or buffer[0][0] > since + 1:
+            WS_CONNECT_SYNC.inc(method="snapshot")
+            return False
+
+        websocket = self._connections(player_id).get(game_code, {}).get(player_id)
+        if websocket is not None:
+            fields = self._private_fields(player_id, private_data)
+            for patch_version, envelope in buffer:
+                if patch_version > since:
+                    self._enqueue(websocket, game_code, player_id, splice_fields(envelope, fields))
+        WS_CONNECT_SYNC.inc(method="replay")
+        return True
+
+    def _next_version(self, game_code: str) -> int:
+        """Advance a game's state version, starting a new stream if versions restart."""
+        version = self.state_versions.get(game_code, 0) + 1
+        self.state_versions[game_code] = version
+        if version == 1 or game_code not in self.streams:
+            self.streams[game_code] = uuid.uuid4().hex[:12]
+        return version
+
+    @staticmethod
+    def _private_fields(player_id: str, private_data: dict[str, dict]) -> dict:
+        """This player's private data (hand, money, id) as message fields; spectators have none."""
+        if player_id.startswith(SPECTATOR_PREFIX):
+            return {}
+        return {
+            "your_hand": private_data.get(player_id, {}).get("hand", []),
+            "your_money": private_data.get(player_id, {}).get("money", 0),
+            "your_player_id": player_id
+        }
+
+    def _snapshot_envelope(self, game_state: dict, game_code: str) -> str:
+        """Encoded full game_state message at the current version, awaiting a player's private fields."""
+        return encode_envelope({
+            "type": "game_state",
+            "data": {
+                **game_state,
+                "version": self.state_versions[game_code],
+                "stream": self.streams[game_code]
+            }
+        })
 
     def get_connected_players(self, game_code: str) -> list[str]:
         """Get list of connected player IDs for a game."""
@@ -78,4 +686,4 @@ class ConnectionManager:
 
 
 # Global connection manager instance
-manager = ConnectionManager()
+manager = ConnectionManager(create_bus(PUBSUB_URL))
@@ -0,0 +1,160 @@
+"""
+Stress benchmark: conflicting actions fired at once at many games.
+
+Every step, each game gets a burst of identical conflicting requests sent
+concurrently (the player to move plays a card several times, or several
+different auction results are posted). All games' bursts run at the same
+time. Checks, per burst and per game:
+- exactly one request of each burst is accepted; the rest get a 400
+- no card is lost or duplicated (hands + cards in play + deck + a double
+  auction's pending first card == full deck)
+
+and reports accepted actions and requests per second.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.bench_action_races --games 500
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Optional
+
+import httpx
+
+from app.cards import DECK
+from app.game_logic import get_double_auction_state, get_game_deck, get_player_hand
+from app.runtime import runtime
+
+from .driver import create_game, make_client, start_app, stop_app
+
+
+class Violations:
+    def __init__(self):
+        self.messages: list[str] = []
+
+    def add(self, message: str) -> None:
+        if len(self.messages) < 20:
+            print("violation:", message)
+        self.messages.append(message)
+
+
+async def burst(
+    client: httpx.AsyncClient,
+    code: str,
+    player_ids: list[str],
+    rng: random.Random,
+    width: int,
+) -> tuple[Optional[str], list[int]]:
+    """Send one burst of conflicting requests. Returns (kind, status codes)."""
+    state = (await client.get(f"/api/games/{code}", params={"player_id": player_ids[0]})).json()
+    if state["status"] != "in_progress":
+        return None, []
+
+    if state["awaiting_auction_result"]:
+        kind = "record-auction"
+        requests = []
+        for _ in range(width):
+            winner = rng.choice(player_ids + [None])
+            requests.append(client.post(f"/api/games/{code}/record-auction", json={
+                "winner_id": winner,
+                "price": rng.randint(0, 5) if winner else 0
+            }))
+    elif state["double_auction_state"]:
+        # Declines are not exclusive (any player may decline), so no burst here
+        kind = "decline-double"
+        offerer = state["double_auction_state"]["current_offerer_id"]
+        requests = [client.post(f"/api/games/{code}/decline-double", json={"player_id": offerer})]
+    else:
+        kind = "play-card"
+        current = state["current_turn_player_id"]
+        hand = (await client.get(f"/api/games/{code}", params={"player_id": current})).json()["your_hand"]
+        if not hand:
+            return None, []
+        index = rng.randrange(len(hand))
+        requests = [
+            client.post(f"/api/games/{code}/play-card", json={"player_id": current, "card_index": index})
+            for _ in range(width)
+        ]
+
+    responses = await asyncio.gather(*requests)
+    return kind, [r.status_code for r in responses]
+
+
+def check_cards(code: str, violations: Violations) -> None:
+    """Every card is in exactly one place: a hand, in play, the deck or a pending double."""
+    active = runtime.games.get(code)
+    if active is None:
+        return
+    game = active.game
+    total = (
+        sum(len(get_player_hand(p)) for p in game.players)
+        + len(game.cards_in_play)
+        + len(get_game_deck(game))
+    )
+    double = get_double_auction_state(game)
+    if double and double.second_card is None:
+        # The first card leaves the hand but only goes into play once the double resolves
+        total += 1
+    if total != len(DECK):
+        violations.add(f"{code}: {total} cards accounted for, expected {len(DECK)}")
+
+
+async def play(
+    client: httpx.AsyncClient,
+    code: str,
+    player_ids: list[str],
+    seed: int,
+    width: int,
+    violations: Violations,
+    totals: dict[str, int],
+) -> None:
+    rng = random.Random(seed)
+    while True:
+        kind, statuses = await burst(client, code, player_ids, rng, width)
+        if kind is None:
+            break
+        accepted = statuses.count(200)
+        rejected = statuses.count(400)
+        if accepted != 1 or accepted + rejected != len(statuses):
+            violations.add(f"{code}: {kind} burst returned {sorted(statuses)}")
+        totals["accepted"] += accepted
+        totals["requests"] += len(statuses)
+        check_cards(code, violations)
+
+
+async def run(games: int, players: int, width: int) -> int:
+    await start_app()
+    violations = Violations()
+    totals = {"accepted": 0, "requests": 0}
+    async with make_client() as client:
+        setup = await asyncio.gather(*(create_game(client, players) for _ in range(games)))
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            play(client, code, player_ids, seed, width, violations, totals)
+            for seed, (code, player_ids) in enumerate(setup)
+        ))
+        elapsed = time.perf_counter() - start
+    await stop_app()
+
+    print(f"games: {games}  players: {players}  burst width: {width}")
+    print(f"accepted actions: {totals['accepted']}  conflicting requests: {totals['requests']}")
+    print(f"elapsed: {elapsed:.2f}s")
+    print(f"accepted actions/s: {totals['accepted'] / elapsed:.0f}  requests/s: {totals['requests'] / elapsed:.0f}")
+    print(f"violations: {len(violations.messages)}")
+    return 1 if violations.messages else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--width", type=int, default=3, help="concurrent requests per burst")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.games, args.players, args.width)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Micro-benchmark: encoding game_state broadcasts.
+
+Compares the per-recipient approach (merge public state and private fields
+into one dict, JSON-encode it for every recipient) with encoding the public
+part once and splicing each recipient's private fields onto it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_broadcast_encoding
+"""
+
+import json
+import random
+
+from app import encoding
+from app.encoding import encode_envelope, splice_fields
+from app.routes.games import build_game_state_response, get_private_data
+from app.state_patch import make_patch
+
+from .common import build_mid_game, random_step, timeit
+
+
+def per_recipient(message_type: str, data: dict, recipients: list[str], private: dict) -> list[str]:
+    """Previous approach: one merged dict and one full encode per recipient."""
+    frames = []
+    for player_id in recipients:
+        frames.append(json.dumps({
+            "type": message_type,
+            "data": {
+                **data,
+                "your_hand": private.get(player_id, {}).get("hand", []),
+                "your_money": private.get(player_id, {}).get("money", 0),
+                "your_player_id": player_id
+            }
+        }, separators=(",", ":")))
+    return frames
+
+
+def encode_once(message_type: str, data: dict, recipients: list[str], private: dict) -> list[str]:
+    """Current approach: encode shared data once, splice private fields."""
+    envelope = encode_envelope({"type": message_type, "data": data})
+    return [
+        splice_fields(envelope, {
+            "your_hand": private.get(player_id, {}).get("hand", []),
+            "your_money": private.get(player_id, {}).get("money", 0),
+            "your_player_id": player_id
+        })
+        for player_id in recipients
+    ]
+
+
+def main():
+    db, game = build_mid_game(num_players=5, target_round=3, cards_this_round=8)
+    state = build_game_state_response(db, game)
+    private = get_private_data(game)
+    players = [p.id for p in game.players]
+
+    # One more action gives a realistic patch
+    random_step(db, game, random.Random(1))
+    patch = make_patch(state, build_game_state_response(db, game))
+
+    payloads = {
+        "snapshot": ("game_state", {**state, "version": 1}),
+        "patch": ("game_state_patch", {"version": 2, "base_version": 1, "patch": patch}),
+    }
+    audiences = {
+        "5 players": players,
+        "5 players + 200 spectators": players + [f"spectator-{i}" for i in range(200)],
+    }
+
+    encoders = [("per-recipient json", per_recipient, None), ("encode-once json", encode_once, None)]
+    if encoding.orjson is not None:
+        encoders.append(("encode-once orjson", encode_once, encoding.orjson))
+
+    print(f"{'payload':<10} {'audience':<28} {'approach':<20} {'us/broadcast':>13} {'bytes/frame':>12}")
+    for payload_name, (message_type, data) in payloads.items():
+        for audience_name, recipients in audiences.items():
+            for name, fn, fast in encoders:
+                saved = encoding.orjson
+                encoding.orjson = fast
+                try:
+                    frames = fn(message_type, data, recipients, private)
+                    assert json.loads(frames[0]) == json.loads(
+                        per_recipient(message_type, data, recipients[:1], private)[0]
+                    )
+                    seconds = timeit(lambda: fn(message_type, data, recipients, private), number=50)
+                finally:
+                    encoding.orjson = saved
+                print(f"{payload_name:<10} {audience_name:<28} {name:<20} "
+                      f"{seconds * 1e6:>13.1f} {len(frames[0]):>12}")
+
+
+if __name__ == "__main__":
+    main()
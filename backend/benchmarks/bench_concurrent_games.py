@@ -0,0 +1,62 @@
+"""
+Benchmark: concurrent-game throughput through the HTTP API.
+
+Plays N complete games at once against the in-process app and reports
+actions per second, plus the longest event-loop stall seen while they ran
+(blocking database calls show up there).
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:////tmp/bench.db RUNTIME_FLUSH_INTERVAL=0 \\
+        python -m benchmarks.bench_concurrent_games --games 50
+
+RUNTIME_FLUSH_INTERVAL=0 writes every action through to the database.
+"""
+
+import argparse
+import asyncio
+import time
+
+from .driver import make_client, play_game, start_app, stop_app
+
+
+async def watch_loop(stop: asyncio.Event, stalls: list[float], interval: float = 0.005) -> None:
+    """Record how late the event loop wakes a sleeping task."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+
+async def run(games: int, players: int) -> None:
+    await start_app()
+    stop = asyncio.Event()
+    stalls: list[float] = []
+    watcher = asyncio.create_task(watch_loop(stop, stalls))
+
+    async with make_client() as client:
+        start = time.perf_counter()
+        counts = await asyncio.gather(*(play_game(client, players, seed) for seed in range(games)))
+        elapsed = time.perf_counter() - start
+
+    stop.set()
+    await watcher
+    await stop_app()
+
+    actions = sum(counts)
+    stalls.sort()
+    print(f"games={games} players={players} actions={actions} elapsed={elapsed:.2f}s")
+    print(f"  games/s={games / elapsed:.1f} actions/s={actions / elapsed:.0f}")
+    print(f"  loop stall p50={stalls[len(stalls) // 2] * 1e3:.2f}ms "
+          f"p99={stalls[int(len(stalls) * 0.99)] * 1e3:.2f}ms max={stalls[-1] * 1e3:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--players", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args.games, args.players))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: game load and per-action latency as finished games pile up.
+
+Fills the database with finished games in steps (bulk-inserted, about 40
+cards and 12 artist values each) and after each step measures:
+- load: evicting a live game and loading its aggregate back from the database
+- action: one write-through move (state fetch plus action, flushed immediately)
+
+Usage (from backend/):
+    python -m benchmarks.bench_db_growth --sizes 0 1000 10000 100000
+    python -m benchmarks.bench_db_growth --drop-indexes   # for comparison
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import uuid
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_db_growth.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("RUNTIME_FLUSH_INTERVAL", "0")
+
+from app.cards import ARTISTS, AUCTION_TYPES  # noqa: E402
+from app.runtime import runtime  # noqa: E402
+
+from .driver import create_game, make_client, play_action, start_app, stop_app  # noqa: E402
+
+INDEXES = ["ix_players_game_id", "ix_cards_in_play_game_round_owner"]
+
+
+def add_finished_games(path: str, start: int, count: int, rng: random.Random) -> None:
+    """Bulk-insert finished 4-player games straight into SQLite."""
+    games, players, cards, values = [], [], [], []
+    for n in range(start, start + count):
+        game_id = str(uuid.uuid4())
+        player_ids = [str(uuid.uuid4()) for _ in range(4)]
+        # Sequential codes: random 8-hex codes collide at this volume
+        games.append((game_id, f"Z{n:07d}", "finished", 4, player_ids[0]))
+        for i, player_id in enumerate(player_ids):
+            players.append((player_id, game_id, f"P{i}", rng.randint(50, 400), "[]", i, False))
+        for round_num in range(1, 5):
+            for _ in range(10):
+                owner = rng.choice(player_ids)
+                cards.append((
+                    str(uuid.uuid4()), game_id, round_num, rng.choice(ARTISTS),
+                    rng.choice(AUCTION_TYPES), owner, rng.randint(0, 40), owner
+                ))
+            for value, artist in zip((30, 20, 10), rng.sample(ARTISTS, 3)):
+                values.append((game_id, artist, round_num, value))
+
+    con = sqlite3.connect(path)
+    with con:
+        con.executemany(
+            "INSERT INTO games (id, code, status, current_round, host_player_id, awaiting_auction_result, created_at)"
+            " VALUES (?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP)", games)
+        con.executemany(
+            "INSERT INTO players (id, game_id, name, money, hand, turn_order, is_connected)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)", players)
+        con.executemany(
+            "INSERT INTO cards_in_play (id, game_id, round, artist, auction_type, owner_id, price_paid, played_by_id)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", cards)
+        con.executemany(
+            "INSERT INTO artist_values (game_id, artist, round, value) VALUES (?, ?, ?, ?)", values)
+    con.close()
+
+
+async def measure(client, samples: int, rng: random.Random) -> tuple[float, float]:
+    """Median load and action latency in milliseconds on a fresh game."""
+    code, player_ids = await create_game(client, 4)
+    load, action = [], []
+    for _ in range(samples):
+        await runtime.evict(code)
+        start = time.perf_counter()
+        await runtime.get(code)
+        load.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        if not await play_action(client, code, player_ids, rng):
+            code, player_ids = await create_game(client, 4)
+            continue
+        await runtime.drain()
+        action.append(time.perf_counter() - start)
+    return statistics.median(load) * 1e3, statistics.median(action) * 1e3
+
+
+async def run(sizes: list[int], samples: int, drop_indexes: bool) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+    await start_app()
+    if drop_indexes:
+        con = sqlite3.connect(DB_PATH)
+        for name in INDEXES:
+            con.execute(f"DROP INDEX IF EXISTS {name}")
+        con.close()
+
+    rng = random.Random(0)
+    total = 0
+    print(f"indexes={'dropped' if drop_indexes else 'present'}")
+    print(f"{'finished games':>15} {'load ms':>10} {'action ms':>10}")
+    async with make_client() as client:
+        for size in sizes:
+            if size > total:
+                add_finished_games(DB_PATH, total, size - total, rng)
+                total = size
+            load_ms, action_ms = await measure(client, samples, rng)
+            print(f"{total:>15} {load_ms:>10.2f} {action_ms:>10.2f}")
+    await stop_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1000, 10000, 100000])
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--drop-indexes", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.samples, args.drop_indexes))
+
+
+if __name__ == "__main__":
+    main()
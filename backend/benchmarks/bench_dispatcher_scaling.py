@@ -0,0 +1,183 @@
+"""
+Benchmark: concurrent-game throughput through the dispatcher by worker count.
+
+For each worker count, starts the dispatcher (uvicorn app.dispatcher:app)
+with that many workers and plays games through it from several load
+generator processes, reporting actions per second and the speedup over one
+worker. Throughput can only scale with workers while there are free cores
+for them (and for the dispatcher and load generators).
+
+With --rebalance, a worker is added and another removed while the games are
+being played, with every game's host holding a WebSocket. Every request must
+still succeed, and every socket closed by a move must reconnect and get a
+snapshot.
+
+Usage (from backend/):
+    python -m benchmarks.bench_dispatcher_scaling --workers 1 2 4 --games 200
+    python -m benchmarks.bench_dispatcher_scaling --workers 2 --games 50 --rebalance
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+
+from .driver import create_game, play_action
+
+# The dispatcher's admin routes need a bearer token; the benchmark sets its own
+ADMIN_TOKEN = "bench-dispatcher-scaling"
+ADMIN_HEADERS = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+async def watch_socket(url: str, stats: dict, stop: asyncio.Event) -> None:
+    """Hold a player's socket, reconnecting whenever the dispatcher moves the game."""
+    while not stop.is_set():
+        try:
+            async with websockets.connect(url) as ws:
+                async for raw in ws:
+                    if json.loads(raw)["type"] == "game_state":
+                        stats["snapshots"] += 1
+        except websockets.ConnectionClosed as e:
+            if e.rcvd is not None and e.rcvd.code == 1012:
+                stats["moved"] += 1
+                continue
+        except OSError:
+            pass
+        await asyncio.sleep(0.05)
+
+
+async def play_games(base_url: str, games: int, players: int, seed: int, sockets: bool) -> dict:
+    stats = {"actions": 0, "errors": 0, "snapshots": 0, "moved": 0}
+    stop = asyncio.Event()
+    watchers = []
+    limits = httpx.Limits(max_connections=games, max_keepalive_connections=games)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def one(n: int) -> None:
+            import random
+            rng = random.Random(seed * 100_000 + n)
+            try:
+                code, player_ids = await create_game(client, players)
+                if sockets:
+                    ws_url = base_url.replace("http", "ws", 1) + f"/ws/{code}/{player_ids[0]}"
+                    watchers.append(asyncio.create_task(watch_socket(ws_url, stats, stop)))
+                while await play_action(client, code, player_ids, rng):
+                    stats["actions"] += 1
+            except (httpx.HTTPError, KeyError) as e:
+                stats["errors"] += 1
+                print(f"game {seed}/{n} failed: {e!r}", file=sys.stderr)
+
+        await asyncio.gather(*(one(n) for n in range(games)))
+    stop.set()
+    for watcher in watchers:
+        watcher.cancel()
+    await asyncio.gather(*watchers, return_exceptions=True)
+    return stats
+
+
+def load_generator(args: tuple) -> dict:
+    return asyncio.run(play_games(*args))
+
+
+def start_dispatcher(workers: int, port: int, tmp: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp}/game.db",
+        "DISPATCHER_WORKERS": str(workers),
+        "DISPATCHER_SOCKET_DIR": tmp,
+        "DISPATCHER_ADMIN_TOKEN": ADMIN_TOKEN,
+    }
+    log = open(os.path.join(tmp, "dispatcher.log"), "a")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.dispatcher:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/").raise_for_status()
+            return process
+        except httpx.HTTPError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                raise RuntimeError(f"dispatcher did not start; see {log.name}")
+            time.sleep(0.2)
+
+
+def stop_dispatcher(process: subprocess.Popen) -> None:
+    process.send_signal(signal.SIGINT)
+    process.wait(timeout=60)
+
+
+def run_load(base_url: str, games: int, players: int, generators: int, sockets: bool) -> tuple[dict, float]:
+    per = [games // generators + (1 if i < games % generators else 0) for i in range(generators)]
+    jobs = [(base_url, n, players, i, sockets) for i, n in enumerate(per) if n]
+    start = time.perf_counter()
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.map(load_generator, jobs)
+    elapsed = time.perf_counter() - start
+    totals = {key: sum(r[key] for r in results) for key in results[0]}
+    return totals, elapsed
+
+
+def rebalance_during(base_url: str, delay: float) -> None:
+    """Add a worker, then remove the first one, while the load is running."""
+    time.sleep(delay)
+    added = httpx.post(f"{base_url}/dispatcher/workers", headers=ADMIN_HEADERS, timeout=60).json()
+    print(f"  added {added['name']}")
+    time.sleep(delay)
+    httpx.delete(f"{base_url}/dispatcher/workers/worker-0", headers=ADMIN_HEADERS, timeout=60).raise_for_status()
+    print("  removed worker-0")
+    workers = httpx.get(f"{base_url}/dispatcher/workers", headers=ADMIN_HEADERS, timeout=60).json()["workers"]
+    print("  now:", ", ".join(f"{w['name']} ({w['active_games']} games)" for w in workers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--generators", type=int, default=max(1, (os.cpu_count() or 1) // 2))
+    parser.add_argument("--port", type=int, default=8730)
+    parser.add_argument("--rebalance", action="store_true")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"cores: {os.cpu_count()}  games: {args.games}  players: {args.players}  load generators: {args.generators}")
+    baseline = None
+    failed = False
+    for workers in args.workers:
+        tmp = tempfile.mkdtemp(prefix="bench_dispatcher_")
+        process = start_dispatcher(workers, args.port, tmp)
+        try:
+            if args.rebalance:
+                import threading
+                changer = threading.Thread(target=rebalance_during, args=(base_url, 2.0))
+                changer.start()
+            totals, elapsed = run_load(base_url, args.games, args.players, args.generators, args.rebalance)
+            if args.rebalance:
+                changer.join()
+        finally:
+            stop_dispatcher(process)
+
+        rate = totals["actions"] / elapsed
+        baseline = baseline or rate
+        print(
+            f"workers {workers:>3}: {totals['actions']:>7} actions in {elapsed:6.2f}s  "
+            f"{rate:8.0f} actions/s  speedup {rate / baseline:4.2f}x  errors {totals['errors']}"
+        )
+        if args.rebalance:
+            print(f"  sockets moved: {totals['moved']}  snapshots received: {totals['snapshots']}")
+        failed = failed or totals["errors"] > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Benchmark: the game event log (app/events.py, app/replay.py).
+
+Plays games through the HTTP API with write-through flushing, recording the
+live game after every event, then checks and measures:
+- rebuilds: replay.rebuild_game() at every event of every game matches the
+  live game as it was then, and how long a rebuild takes
+- crash recovery: a game dropped from memory without writing its rows is
+  reloaded from its rows plus the events logged since, and matches
+- write size: statements and bytes written per action, logging events with
+  rows every EVENT_SNAPSHOT_INTERVAL events, against rewriting the rows on
+  every action (a snapshot interval of 1)
+
+Card ids are left out of comparisons; replays generate new ones.
+
+Usage (from backend/):
+    python -m benchmarks.bench_event_log --games 10 --players 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench_event_log_')}/game.db")
+os.environ.setdefault("RUNTIME_FLUSH_INTERVAL", "0")
+
+from sqlalchemy import event  # noqa: E402
+
+from app.database import SessionLocal, engine  # noqa: E402
+from app.models import Game  # noqa: E402
+from app.replay import rebuild_game  # noqa: E402
+from app.runtime import runtime  # noqa: E402
+
+from .driver import create_game, make_client, play_action, start_app, stop_app  # noqa: E402
+
+
+def fingerprint(game: Game) -> tuple:
+    """Everything about a game except generated card ids and presence."""
+    return (
+        game.status,
+        game.current_round,
+        game.host_player_id,
+        game.current_turn_player_id,
+        bool(game.awaiting_auction_result),
+        json.loads(game.deck) if game.deck else None,
+        json.loads(game.double_auction_state) if game.double_auction_state else None,
+        sorted((p.id, p.name, p.money, json.loads(p.hand) if p.hand else [], p.turn_order) for p in game.players),
+        # The collection has no ordering, so reloaded rows may come back in any order
+        sorted(
+            ((c.round, c.artist, c.auction_type, c.owner_id, c.price_paid, c.played_by_id) for c in game.cards_in_play),
+            key=repr,
+        ),
+        sorted((v.artist, v.round, v.value) for v in game.artist_values),
+    )
+
+
+class WriteCounter:
+    """Statements, and bytes of parameters, sent to write games."""
+
+    def __init__(self):
+        self.statements = 0
+        self.bytes = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.startswith(("INSERT", "UPDATE", "DELETE")):
+            self.statements += 1
+            rows = parameters if executemany else [parameters]
+            self.bytes += sum(len(str(value)) for row in rows for value in row)
+
+
+async def play(client, players: int, seed: int) -> tuple[str, dict[int, tuple], int]:
+    """Play a game, recording the live game after each event. Returns (code, states, actions)."""
+    code, player_ids = await create_game(client, players)
+    states = {}
+    game = runtime.games[code].game
+    states[game.event_seq] = fingerprint(game)
+    rng = random.Random(seed)
+    actions = 0
+    while await play_action(client, code, player_ids, rng):
+        actions += 1
+        game = runtime.games[code].game
+        states[game.event_seq] = fingerprint(game)
+    await runtime.drain()
+    return code, states, actions
+
+
+async def check_rebuilds(code: str, states: dict[int, tuple]) -> tuple[list[float], list[str]]:
+    timings, problems = [], []
+    # Events before the game was created in memory (create, joins) are not recorded live
+    for seq, expected in states.items():
+        start = time.perf_counter()
+        async with SessionLocal() as db:
+            rebuilt = await rebuild_game(db, code, seq)
+        timings.append((time.perf_counter() - start) * 1000)
+        if fingerprint(rebuilt) != expected:
+            problems.append(f"{code}: rebuild at event {seq} differs from the live game")
+    return timings, problems
+
+
+async def check_recovery(client, players: int, seed: int) -> tuple[int, list[str]]:
+    """Drop a game mid-round without writing its rows, then reload it."""
+    code, player_ids = await create_game(client, players)
+    rng = random.Random(seed)
+    # Stop between row writes, so some events are only in the log
+    target = rng.randint(10, 40)
+    actions = 0
+    while await play_action(client, code, player_ids, rng):
+        actions += 1
+        await runtime.drain()
+        active = runtime.games[code]
+        if actions >= target and active.game.event_seq > active.projected_seq:
+            break
+    active = runtime.games[code]
+    expected, seq, behind = fingerprint(active.game), active.game.event_seq, active.game.event_seq - active.projected_seq
+    await runtime.evict(code, flush=False)
+
+    reloaded = await runtime.get(code)
+    problems = []
+    if reloaded.game.event_seq != seq or fingerprint(reloaded.game) != expected:
+        problems.append(f"{code}: reloaded game differs after dropping {behind} unwritten events")
+    return behind, problems
+
+
+async def measure_writes(client, players: int, games: int, snapshot_interval: int) -> tuple[float, float]:
+    """Statements and bytes written per action, evicting each game when it ends."""
+    runtime.snapshot_interval = snapshot_interval
+    counter = WriteCounter()
+    actions = 0
+    for seed in range(games):
+        code, player_ids = await create_game(client, players)
+        rng = random.Random(seed)
+        while await play_action(client, code, player_ids, rng):
+            actions += 1
+            # One flush per action, rather than letting queued flushes coalesce
+            await runtime.drain()
+        await runtime.evict(code)
+    event.remove(engine.sync_engine, "before_cursor_execute", counter._count)
+    return counter.statements / actions, counter.bytes / actions
+
+
+async def run(games: int, players: int) -> int:
+    await start_app()
+    problems = []
+    try:
+        async with make_client() as client:
+            timings = []
+            events = 0
+            for seed in range(games):
+                code, states, actions = await play(client, players, seed)
+                events += max(states)
+                game_timings, game_problems = await check_rebuilds(code, states)
+                timings += game_timings
+                problems += game_problems
+            print(f"games: {games}  players: {players}  events: {events}  snapshot interval: {runtime.snapshot_interval}")
+            timings.sort()
+            print(
+                f"rebuild at any event: median {statistics.median(timings):.2f} ms  "
+                f"p95 {timings[int(len(timings) * 0.95)]:.2f} ms  max {timings[-1]:.2f} ms  ({len(timings)} rebuilds)"
+            )
+
+            replayed = []
+            for seed in range(games):
+                behind, recovery_problems = await check_recovery(client, players, 1000 + seed)
+                replayed.append(behind)
+                problems += recovery_problems
+            print(f"crash recovery: {games} games reloaded, replaying {min(replayed)}-{max(replayed)} events each")
+
+            interval = runtime.snapshot_interval
+            logged = await measure_writes(client, players, games, interval)
+            rewritten = await measure_writes(client, players, games, 1)
+            runtime.snapshot_interval = interval
+            print("writes per action:        statements   bytes")
+            print(f"  event log                {logged[0]:10.2f} {logged[1]:7.0f}")
+            print(f"  rows every action        {rewritten[0]:10.2f} {rewritten[1]:7.0f}")
+    finally:
+        await stop_app()
+
+    for problem in problems:
+        print("problem:", problem)
+    return 1 if problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--players", type=int, default=4)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.games, args.players)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: liveness checks for many idle sockets, one timer wheel against a
+task per socket.
+
+Registers --sockets stand-in connections with a ConnectionManager and keeps
+them all alive (each "sends" a message every --message-every seconds), then
+runs the checks for --seconds with the heartbeat interval shortened to
+--interval so every socket comes due several times:
+- wheel: the manager's own check_heartbeats, called every tick by one task
+- tasks: a task per socket sleeping until its own deadline and checking it
+
+Reports the CPU time spent on the checks (over a run with messages but no
+checks) and the memory they hold. Nobody is pinged or reaped: the cost
+measured is that of watching live sockets, which is what a server pays all
+the time.
+
+Usage (from backend/):
+    python -m benchmarks.bench_heartbeats --sockets 20000
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from app import websocket as ws_module
+from app.timerwheel import TimerWheel
+from app.websocket import ConnectionManager
+
+
+class Socket:
+    """Stands in for a WebSocket: only its identity is used."""
+
+
+async def send_messages(manager: ConnectionManager, sockets: list, every: float, seconds: float) -> None:
+    """Mark every socket seen once per `every` seconds, a slice at a time."""
+    slices = 20
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        for i in range(slices):
+            for socket in sockets[i::slices]:
+                manager.seen(socket)
+            await asyncio.sleep(every / slices)
+
+
+async def wheel_checks(manager: ConnectionManager) -> None:
+    while True:
+        await asyncio.sleep(manager.heartbeats.tick)
+        await manager.check_heartbeats(time.monotonic())
+
+
+async def socket_task(manager: ConnectionManager, socket: Socket, interval: float) -> None:
+    """One socket's own liveness loop: sleep until it could be silent too long, then check."""
+    while True:
+        last_seen = manager.last_seen[socket]
+        delay = last_seen + interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif manager.last_seen[socket] == last_seen:
+            raise RuntimeError("a live socket went silent")
+
+
+async def run(mode: str, count: int, interval: float, tick: float, every: float, seconds: float) -> tuple[float, int]:
+    """CPU seconds and bytes allocated for one mode ("none", "wheel" or "tasks")."""
+    manager = ConnectionManager()
+    manager.heartbeats = TimerWheel(tick, interval)
+    sockets = [Socket() for _ in range(count)]
+
+    tracemalloc.start()
+    now = time.monotonic()
+    tasks = []
+    for i, socket in enumerate(sockets):
+        manager.last_seen[socket] = now
+        if mode == "wheel":
+            manager.heartbeats.schedule((socket, "GAME", f"player-{i}"), interval)
+        elif mode == "tasks":
+            tasks.append(asyncio.create_task(socket_task(manager, socket, interval)))
+    if mode == "wheel":
+        manager.heartbeats.now = now
+        tasks.append(asyncio.create_task(wheel_checks(manager)))
+    await asyncio.sleep(0)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    cpu = time.process_time()
+    await send_messages(manager, sockets, every, seconds)
+    cpu = time.process_time() - cpu
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return cpu, held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=20000)
+    parser.add_argument("--interval", type=float, default=1.0, help="heartbeat interval, seconds")
+    parser.add_argument("--tick", type=float, default=0.05, help="wheel tick, seconds")
+    parser.add_argument("--message-every", type=float, default=0.4, help="seconds between a socket's messages")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    # The manager only checks deadlines against its configured interval
+    ws_module.WS_HEARTBEAT_INTERVAL = args.interval
+
+    results = {
+        mode: asyncio.run(run(mode, args.sockets, args.interval, args.tick, args.message_every, args.seconds))
+        for mode in ("none", "wheel", "tasks")
+    }
+    baseline = results["none"][0]
+    print(f"sockets: {args.sockets}  interval {args.interval} s  tick {args.tick} s  "
+          f"a message every {args.message_every} s  for {args.seconds} s")
+    print(f"{'checks':<8} {'cpu s/s':>8} {'us/socket/s':>12} {'memory MB':>10}")
+    for mode in ("wheel", "tasks"):
+        cpu, held = results[mode]
+        extra = max(cpu - baseline, 0.0) / args.seconds
+        print(f"{mode:<8} {extra:>8.3f} {extra / args.sockets * 1e6:>12.2f} {held / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Integration benchmark: WebSocket fan-out across worker processes.
+
+Starts several uvicorn workers sharing one database and a Unix-socket pub/sub
+bus. A game is created, joined and played through every worker's HTTP API in
+turn, and once it has started each player's WebSocket connects to a
+different worker. Checks that:
+- every client receives the same sequence of game events
+- every client receives the same patches, whichever worker diffed them
+- every client's state versions arrive without gaps
+- every client's reconstructed state matches the final state from the API,
+  which every worker reports alike
+
+and reports how much later events reach clients on other workers than
+clients on the worker that made the move.
+
+Without the dispatcher any worker may load any game, so the workers run
+shared (see runtime.py): write-through (RUNTIME_FLUSH_INTERVAL=0), dropping
+their copy of a game whenever another worker changes it.
+
+Usage (from backend/):
+    python -m benchmarks.bench_multiworker --workers 3 --players 5 --games 3
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+
+from .driver import play_action
+
+PRIVATE_FIELDS = ("your_hand", "your_money", "your_player_id", "version", "stream")
+
+
+def apply_patch(state: dict, patch: list[dict]) -> dict:
+    """Apply add/remove/replace operations (see app/state_patch.py)."""
+    state = copy.deepcopy(state)
+    for op in patch:
+        keys = [k.replace("~1", "/").replace("~0", "~") for k in op["path"].split("/")[1:]]
+        if not keys:
+            state = op["value"]
+            continue
+        parent = state
+        for key in keys[:-1]:
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+        last = keys[-1]
+        if isinstance(parent, list):
+            index = int(last)
+            if op["op"] == "add":
+                parent.insert(index, op["value"])
+            elif op["op"] == "remove":
+                del parent[index]
+            else:
+                parent[index] = op["value"]
+        elif op["op"] == "remove":
+            del parent[last]
+        else:
+            parent[last] = op["value"]
+    return state
+
+
+class Client:
+    """One player's WebSocket, recording everything it receives."""
+
+    def __init__(self, url: str, worker: int):
+        self.url = url
+        self.worker = worker
+        self.state = None
+        self.version = None
+        self.gaps = 0
+        self.patches: list[list[dict]] = []
+        # (arrival time, message type) of non-state messages
+        self.events: list[tuple[float, str]] = []
+        # Arrival times of state messages
+        self.arrivals: list[float] = []
+
+    async def run(self, ready: asyncio.Event) -> None:
+        async with websockets.connect(self.url) as ws:
+            async for raw in ws:
+                frame = json.loads(raw)
+                for message in frame["messages"] if frame["type"] == "batch" else [frame]:
+                    self.receive(message, ready)
+
+    def receive(self, message: dict, ready: asyncio.Event) -> None:
+        if message["type"] == "game_state":
+            self.state, self.version = message["data"], message["data"]["version"]
+            ready.set()
+        elif message["type"] == "game_state_patch":
+            self.arrivals.append(time.perf_counter())
+            data = message["data"]
+            if data["base_version"] != self.version:
+                self.gaps += 1
+            self.state = apply_patch(self.state, data["patch"])
+            self.patches.append(data["patch"])
+            self.version = data["version"]
+        else:
+            self.events.append((time.perf_counter(), message["type"]))
+
+
+def public(state: dict) -> dict:
+    state = {k: v for k, v in state.items() if k not in PRIVATE_FIELDS}
+    # Round numbers are JSON object keys, so they arrive as strings either way
+    state = json.loads(json.dumps(state))
+    # A game reloaded from the database lists its cards in the database's order
+    state["cards_in_play"].sort(key=lambda card: card["id"])
+    return state
+
+
+async def wait_for(url: str, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                (await client.get(url)).raise_for_status()
+                return
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+
+async def play_one(ports: list[int], players: int, seed: int) -> dict:
+    """Play one game with requests and sockets spread over all workers."""
+    apis = [httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") for port in ports]
+    try:
+        r = await apis[0].post("/api/games", json={"host_name": "P0"})
+        code, host = r.json()["game_code"], r.json()["player_id"]
+        player_ids = [host]
+        for i in range(1, players):
+            r = await apis[i % len(apis)].post(f"/api/games/{code}/join", json={"player_name": f"P{i}"})
+            r.raise_for_status()
+            player_ids.append(r.json()["player_id"])
+        (await apis[-1].post(f"/api/games/{code}/start", params={"player_id": host})).raise_for_status()
+
+        # Connect once the game has started, player i to worker i % workers
+        clients, tasks = [], []
+        for i, player_id in enumerate(player_ids):
+            worker = i % len(ports)
+            client = Client(f"ws://127.0.0.1:{ports[worker]}/ws/{code}/{player_id}", worker)
+            ready = asyncio.Event()
+            tasks.append(asyncio.create_task(client.run(ready)))
+            await asyncio.wait_for(ready.wait(), 10)
+            clients.append(client)
+        # Let the connect broadcasts settle before counting events
+        await asyncio.sleep(0.3)
+        for client in clients:
+            client.events.clear()
+            client.patches.clear()
+            client.arrivals.clear()
+
+        # Each move through the next worker, which has to reload the game
+        rng = random.Random(seed)
+        actions, movers = 0, []
+        while await play_action(apis[actions % len(apis)], code, player_ids, rng):
+            movers.append(actions % len(apis))
+            actions += 1
+        await asyncio.sleep(0.5)
+        finals = [(await api.get(f"/api/games/{code}", params={"player_id": host})).json() for api in apis]
+    finally:
+        for api in apis:
+            await api.aclose()
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    final = finals[0]
+    reference = [kind for _, kind in clients[0].events]
+    result = {"actions": actions, "events": len(reference), "problems": [], "delays": []}
+    for worker, other in enumerate(finals[1:], 1):
+        if public(other) != public(final):
+            result["problems"].append(f"{code}: worker {worker} reports a different final state")
+    for i, client in enumerate(clients):
+        kinds = [kind for _, kind in client.events]
+        if kinds != reference:
+            result["problems"].append(f"{code} client {i} (worker {client.worker}): event sequence differs")
+        if client.patches != clients[0].patches:
+            result["problems"].append(f"{code} client {i} (worker {client.worker}): patches differ")
+        if client.gaps:
+            result["problems"].append(f"{code} client {i} (worker {client.worker}): {client.gaps} version gaps")
+        if public(client.state) != public(final):
+            result["problems"].append(f"{code} client {i} (worker {client.worker}): final state differs")
+    # A move's state reaches a client on the moving worker first; compare the
+    # others with the earliest such client
+    local = {worker: next(c for c in clients if c.worker == worker) for worker in set(movers)
+             if any(c.worker == worker for c in clients)}
+    for client in clients:
+        if len(client.arrivals) != len(movers):
+            continue
+        for i, worker in enumerate(movers):
+            origin = local.get(worker)
+            if origin is not None and origin is not client and len(origin.arrivals) == len(movers):
+                result["delays"].append((client.arrivals[i] - origin.arrivals[i]) * 1000)
+    return result
+
+
+async def run(ports: list[int], players: int, games: int) -> int:
+    for port in ports:
+        await wait_for(f"http://127.0.0.1:{port}/")
+    problems, delays, actions, events = [], [], 0, 0
+    for seed in range(games):
+        result = await play_one(ports, players, seed)
+        problems += result["problems"]
+        delays += result["delays"]
+        actions += result["actions"]
+        events += result["events"]
+
+    print(f"workers: {len(ports)}  games: {games}  players: {players}")
+    print(f"actions: {actions}  game events per client: {events}")
+    if delays:
+        delays.sort()
+        print(
+            f"cross-worker extra delay (ms): median {statistics.median(delays):.2f}"
+            f"  p95 {delays[int(len(delays) * 0.95)]:.2f}  max {delays[-1]:.2f}"
+        )
+    for problem in problems:
+        print("problem:", problem)
+    print("ok" if not problems else f"{len(problems)} problems")
+    return 1 if problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--players", type=int, default=5)
+    parser.add_argument("--games", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=8710)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_multiworker_")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp}/game.db",
+        "PUBSUB_URL": f"unix://{tmp}/bus.sock",
+        "RUNTIME_FLUSH_INTERVAL": "0",
+    }
+    ports = [args.base_port + i for i in range(args.workers)]
+    log = open(os.path.join(tmp, "workers.log"), "w")
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        for port in ports
+    ]
+    try:
+        code = asyncio.run(run(ports, args.players, args.games))
+    finally:
+        for worker in workers:
+            worker.send_signal(signal.SIGINT)
+        for worker in workers:
+            worker.wait(timeout=20)
+        log.close()
+    print(f"worker logs: {log.name}")
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark: SQL statements per API route.
+
+Plays complete games through the HTTP API with write-through flushing and
+counts the statements each request causes, including the flush it schedules.
+Two passes are made:
+- warm: the game stays in the runtime, as it does while people are playing
+- cold: the game is evicted before every request, so each one reloads it
+
+The counts must not grow as a game accumulates cards and rounds. A request's
+budget is the aggregate load if the game was not in memory, plus, for writes,
+the event insert and, when the rows are due (see runtime.py), one statement
+per changed table and player and the snapshot. --check exits non-zero if any
+request goes over its budget.
+
+The run also turns on the SQL profiler (app/profiling.py), and lists any
+statement a request ran SQL_PROFILE_REPEAT_THRESHOLD or more times with where
+it came from; with --check, one is a failure too.
+
+Usage (from backend/):
+    python -m benchmarks.bench_query_counts
+    python -m benchmarks.bench_query_counts --games 3 --players 5 --check
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from collections import defaultdict
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_query_counts.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("RUNTIME_FLUSH_INTERVAL", "0")
+os.environ.setdefault("SQL_PROFILE", "true")
+os.environ.setdefault("SQL_PROFILE_OUTPUT", os.path.join(tempfile.gettempdir(), "bench_query_counts_profile.json"))
+
+import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import profiling  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.runtime import runtime  # noqa: E402
+
+from .driver import play_game, start_app, stop_app  # noqa: E402
+
+# Loading a game's aggregate: game, players, cards_in_play, artist_values, and
+# the events logged after its rows
+LOAD_QUERIES = 5
+
+
+def write_budget(players: int) -> int:
+    """
+    Flushing one action: its events, and when the rows are due the game row,
+    each player row, new cards, artist values and the snapshot.
+    """
+    return 5 + players
+
+
+def route_of(request: httpx.Request) -> str:
+    path = re.sub(r"^/api/games/[^/]+", "/api/games/{code}", request.url.path)
+    return f"{request.method} {path}"
+
+
+class CountingTransport(httpx.ASGITransport):
+    """ASGI transport that records statements per route, flushes included."""
+
+    def __init__(self, *args, evict_before: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.evict_before = evict_before
+        self.statements = 0
+        # route -> [(statements, budget)]
+        self.counts: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self.players: dict[str, int] = {}
+
+    def on_execute(self, *args) -> None:
+        self.statements += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        match = re.match(r"^/api/games/([^/]+)", request.url.path)
+        code = match.group(1).upper() if match else None
+        if self.evict_before and code:
+            await runtime.evict(code)
+        # Creating a game loads nothing
+        budget = 0 if code is None or code in runtime.games else LOAD_QUERIES
+
+        before = self.statements
+        response = await super().handle_async_request(request)
+        await runtime.drain()
+
+        active = runtime.games.get(code)
+        if active is not None:
+            self.players[code] = len(active.game.players)
+        if request.method != "GET":
+            budget += write_budget(self.players.get(code, 1))
+        self.counts[route_of(request)].append((self.statements - before, budget))
+        return response
+
+
+async def run_pass(games: int, players: int, cold: bool) -> dict[str, list[tuple[int, int]]]:
+    transport = CountingTransport(app=app, evict_before=cold)
+    event.listen(engine.sync_engine, "before_cursor_execute", transport.on_execute)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for seed in range(games):
+                await play_game(client, players, seed)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", transport.on_execute)
+    return transport.counts
+
+
+def report(name: str, counts: dict[str, list[tuple[int, int]]]) -> list[str]:
+    print(f"\n{name}")
+    print(f"{'route':<42}{'requests':>9}{'mean':>7}{'max':>5}{'over budget':>13}")
+    over = []
+    for route, samples in sorted(counts.items()):
+        statements = [n for n, _ in samples]
+        exceeded = sum(1 for n, budget in samples if n > budget)
+        print(f"{route:<42}{len(samples):>9}{sum(statements) / len(samples):>7.1f}{max(statements):>5}{exceeded:>13}")
+        if exceeded:
+            over.append(f"{name}: {route}")
+    return over
+
+
+def report_repeated() -> list[str]:
+    """Statements the profiler saw repeated within one request."""
+    if profiling.profiler is None:
+        return []
+    repeated = []
+    for label, summary in sorted(profiling.profiler.routes.items()):
+        for shape, info in summary.repeated.items():
+            sites = ", ".join(f"{site} ({count})" for site, count in sorted(info["sites"].items()))
+            repeated.append(f"{label}: up to {info['max']}x in {info['requests']} requests from {sites}: {shape}")
+    print("\nrepeated statements (possible N+1)")
+    for line in repeated or ["none"]:
+        print(f"  {line}")
+    return repeated
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=2)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--check", action="store_true", help="exit 1 if a route exceeds its budget or repeats a statement")
+    args = parser.parse_args()
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    await start_app()
+    try:
+        warm = await run_pass(args.games, args.players, cold=False)
+        cold = await run_pass(args.games, args.players, cold=True)
+    finally:
+        await stop_app()
+
+    over = report("warm (game in memory)", warm)
+    over += report("cold (game reloaded per request)", cold)
+    repeated = report_repeated()
+    if over:
+        print("\nover budget: " + ", ".join(over))
+    if args.check and (over or repeated):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
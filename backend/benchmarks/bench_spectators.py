@@ -0,0 +1,200 @@
+"""
+Benchmark: one game watched by thousands of spectators.
+
+Runs the app in-process under uvicorn, starts a game and connects --spectators
+WebSocket clients to /ws/{code}/spectate in batches, then plays --actions
+moves over HTTP. Reports:
+- how long the audience took to connect, each getting the public snapshot
+- per action, how long until the first and the last spectator had its frame
+- the server's time to queue each update for every spectator, from the
+  broadcast_fanout_duration_seconds metric, and the size of the shared frame
+
+A few spectators rebuild the state from their frames; at the end they must
+match the public state from the API, with no private fields ever received.
+Clients and server share one process and one CPU here, so the end-to-end
+times include the clients reading 5,000 sockets.
+
+Clients do not negotiate permessage-deflate, so the server writes each
+update's encoded text as it is.
+
+Usage (from backend/):
+    python -m benchmarks.bench_spectators --spectators 5000 --actions 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench_spectators_')}/game.db")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.metrics import BROADCAST_SECONDS, WS_MESSAGE_BYTES  # noqa: E402
+
+from .bench_multiworker import PRIVATE_FIELDS, apply_patch, public  # noqa: E402
+from .driver import play_action  # noqa: E402
+
+# Every this many spectators rebuilds the state from its frames
+SAMPLE_EVERY = 1000
+
+
+class Audience:
+    """Counts frames across all spectators and wakes a waiter at a target count."""
+
+    def __init__(self):
+        self.frames = 0
+        self.target = 0
+        self.first: float = 0.0
+        self.reached = asyncio.Event()
+        self.private_seen = 0
+
+    def expect(self, frames: int) -> None:
+        self.target, self.first = frames, 0.0
+        self.reached.clear()
+
+    def received(self) -> None:
+        self.frames += 1
+        if not self.first:
+            self.first = time.perf_counter()
+        if self.frames >= self.target:
+            self.reached.set()
+
+
+class Spectator:
+    def __init__(self, url: str, audience: Audience, sample: bool):
+        self.url = url
+        self.audience = audience
+        self.sample = sample
+        self.state = None
+
+    async def run(self, ready: asyncio.Event) -> None:
+        async with websockets.connect(self.url, compression=None, max_queue=None, open_timeout=60) as ws:
+            async for raw in ws:
+                if self.sample:
+                    self.receive(json.loads(raw))
+                if not ready.is_set():
+                    ready.set()
+                    continue
+                self.audience.received()
+
+    def receive(self, frame: dict) -> None:
+        for message in frame["messages"] if frame["type"] == "batch" else [frame]:
+            data = message.get("data", {})
+            self.audience.private_seen += any(key.startswith("your_") for key in data)
+            if message["type"] == "game_state":
+                self.state = data
+            elif message["type"] == "game_state_patch":
+                self.state = {**apply_patch(self.state, data["patch"]), "version": data["version"]}
+
+
+def _fanout() -> tuple[int, float]:
+    """Updates fanned out so far and the seconds spent queueing them (batched actions)."""
+    series = BROADCAST_SECONDS.series.get(("batch",))
+    return (series[2], series[1]) if series else (0, 0.0)
+
+
+async def run(port: int, spectators: int, actions: int, batch: int, seed: int) -> list[str]:
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning", backlog=4096))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    problems = []
+    audience = Audience()
+    clients: list[Spectator] = []
+    tasks: list[asyncio.Task] = []
+    base = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base, timeout=60) as api:
+            r = await api.post("/api/games", json={"host_name": "P0"})
+            code, player_ids = r.json()["game_code"], [r.json()["player_id"]]
+            for i in (1, 2):
+                r = await api.post(f"/api/games/{code}/join", json={"player_name": f"P{i}"})
+                player_ids.append(r.json()["player_id"])
+            (await api.post(f"/api/games/{code}/start", params={"player_id": player_ids[0]})).raise_for_status()
+
+            start = time.perf_counter()
+            for first in range(0, spectators, batch):
+                readies = []
+                for i in range(first, min(spectators, first + batch)):
+                    client = Spectator(f"ws://127.0.0.1:{port}/ws/{code}/spectate", audience, i % SAMPLE_EVERY == 0)
+                    ready = asyncio.Event()
+                    clients.append(client)
+                    readies.append(ready)
+                    tasks.append(asyncio.create_task(client.run(ready)))
+                await asyncio.wait_for(asyncio.gather(*(r.wait() for r in readies)), 120)
+            connect_seconds = time.perf_counter() - start
+            print(f"spectators: {spectators}  connected in {connect_seconds:.1f} s "
+                  f"({spectators / connect_seconds:.0f}/s, batches of {batch})")
+
+            rng = random.Random(seed)
+            firsts, lasts = [], []
+            updates_before, queue_seconds_before = _fanout()
+            played = 0
+            for _ in range(actions):
+                # Each action is one batched frame per spectator
+                audience.expect(audience.frames + spectators)
+                sent = time.perf_counter()
+                if not await play_action(api, code, player_ids, rng):
+                    break
+                await asyncio.wait_for(audience.reached.wait(), 60)
+                played += 1
+                firsts.append((audience.first - sent) * 1000)
+                lasts.append((time.perf_counter() - sent) * 1000)
+            updates, queue_seconds = _fanout()
+            updates -= updates_before
+            queue_seconds -= queue_seconds_before
+
+            truth = (await api.get(f"/api/games/{code}", params={"player_id": player_ids[0]})).json()
+
+        frame_bytes = WS_MESSAGE_BYTES.series.get(("batch",))
+        print(f"actions: {played}")
+        print(f"  first spectator  median {statistics.median(firsts):7.1f} ms  max {max(firsts):7.1f} ms")
+        print(f"  last spectator   median {statistics.median(lasts):7.1f} ms  max {max(lasts):7.1f} ms")
+        if updates:
+            print(f"  server queueing  mean {queue_seconds / updates * 1000:7.2f} ms per update "
+                  f"({queue_seconds / updates / spectators * 1e6:.2f} us per spectator)")
+        if frame_bytes:
+            print(f"  shared frame     mean {frame_bytes[1] / frame_bytes[2]:7.0f} bytes")
+
+        expected = {k: v for k, v in public(truth).items() if k not in PRIVATE_FIELDS}
+        for client in clients:
+            if client.sample and {k: v for k, v in public(client.state).items() if k not in PRIVATE_FIELDS} != expected:
+                problems.append("a spectator's rebuilt state differs from the public state")
+        if audience.private_seen:
+            problems.append(f"spectators received private fields {audience.private_seen} times")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        server.should_exit = True
+        await serving
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spectators", type=int, default=5000)
+    parser.add_argument("--actions", type=int, default=30)
+    parser.add_argument("--batch", type=int, default=250, help="spectators connecting at once")
+    parser.add_argument("--port", type=int, default=8741)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    problems = asyncio.run(run(args.port, args.spectators, args.actions, args.batch, args.seed))
+    for problem in problems:
+        print("problem:", problem)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
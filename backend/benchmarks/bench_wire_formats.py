@@ -0,0 +1,131 @@
+"""
+Micro-benchmark: bytes on the wire and encode CPU per WebSocket wire format.
+
+Plays a game with random moves and builds the frames one player would be
+sent (a snapshot, then a patch per action, each with the player's private
+fields), then encodes each frame in every format:
+- json: the text the server builds once per broadcast (see encoding.py)
+- msgpack: the same message transcoded to plain MessagePack
+- msgpack+dict: MessagePack with artist names and auction types
+  dictionary-encoded, which is what a "msgpack" client is sent
+- +deflate: permessage-deflate as a compressing server applies it, one
+  stream per connection with context takeover
+
+Encode times are per frame: for json, encoding the message; for the others,
+transcoding the JSON text as the server does, on top of that. Deflate times
+are for compressing the encoded frame. With deflate, each socket compresses
+its own copy, so a broadcast's deflate cost is per recipient, spectators
+included.
+
+Usage (from backend/):
+    python -m benchmarks.bench_wire_formats --actions 200
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import zlib
+
+from app import encoding
+from app.encoding import decode_msgpack, encode_envelope, json_to_msgpack, splice_fields
+from app.routes.games import build_game_state_response, get_private_data
+from app.state_patch import make_patch
+
+from .common import build_mid_game, random_step
+
+
+def game_frames(actions: int, seed: int) -> dict[str, list[str]]:
+    """JSON frames one player receives over a game, by kind: one snapshot, then patches."""
+    db, game = build_mid_game(num_players=5, target_round=1, cards_this_round=0, seed=seed)
+    rng = random.Random(seed)
+    player_id = game.players[0].id
+
+    def private() -> dict:
+        data = get_private_data(game)[player_id]
+        return {"your_hand": data["hand"], "your_money": data["money"], "your_player_id": player_id}
+
+    state = build_game_state_response(db, game)
+    frames = {
+        "snapshot": [splice_fields(encode_envelope({"type": "game_state", "data": {**state, "version": 1}}), private())],
+        "patch": [],
+    }
+    for version in range(2, actions + 2):
+        if game.status != "in_progress" or random_step(db, game, rng) is None:
+            break
+        new_state = build_game_state_response(db, game)
+        envelope = encode_envelope({
+            "type": "game_state_patch",
+            "data": {"version": version, "base_version": version - 1, "patch": make_patch(state, new_state)}
+        })
+        frames["patch"].append(splice_fields(envelope, private()))
+        state = new_state
+    return frames
+
+
+def plain_msgpack(text: str) -> bytes:
+    return encoding.msgpack.packb(json.loads(text))
+
+
+def deflate_all(frames: list[bytes]) -> list[bytes]:
+    """Compress frames in order on one connection's stream, as permessage-deflate sends them."""
+    stream = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # Each message ends with a sync flush, whose trailing 00 00 ff ff is not sent
+    return [(stream.compress(frame) + stream.flush(zlib.Z_SYNC_FLUSH))[:-4] for frame in frames]
+
+
+def best_seconds(fn, frames: list, repeat: int) -> float:
+    """Best-of-repeat seconds to run fn over all frames."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(frames)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if encoding.msgpack is None:
+        sys.exit("msgpack is not installed (pip install msgpack)")
+
+    frames = game_frames(args.actions, args.seed)
+    print(f"frames: 1 snapshot, {len(frames['patch'])} patches "
+          f"(orjson {'on' if encoding.orjson else 'off'})")
+    print(f"{'frames':<9} {'format':<22} {'bytes/frame':>12} {'vs json':>8} {'encode us':>10} {'deflate us':>11}")
+    problems = 0
+    for kind, texts in frames.items():
+        if not texts:
+            continue
+        json_frames = [text.encode() for text in texts]
+        messages = [json.loads(text) for text in texts]
+        formats = [
+            ("json", json_frames, best_seconds(lambda ms: [encoding.encode_json(m) for m in ms], messages, args.repeat)),
+            ("msgpack", [plain_msgpack(t) for t in texts],
+             best_seconds(lambda fs: [plain_msgpack(t) for t in fs], texts, args.repeat)),
+            ("msgpack+dict", [json_to_msgpack(t) for t in texts],
+             best_seconds(lambda fs: [json_to_msgpack(t) for t in fs], texts, args.repeat)),
+        ]
+        problems += sum(decode_msgpack(frame) != message for frame, message in zip(formats[2][1], messages))
+        json_bytes = sum(map(len, json_frames)) / len(texts)
+        for name, encoded, encode_seconds in formats:
+            for deflate in (False, True):
+                sent = deflate_all(encoded) if deflate else encoded
+                deflate_seconds = best_seconds(deflate_all, encoded, args.repeat) if deflate else 0.0
+                size = sum(map(len, sent)) / len(texts)
+                print(f"{kind:<9} {name + ('+deflate' if deflate else ''):<22} {size:>12.0f} "
+                      f"{size / json_bytes:>7.0%} {encode_seconds / len(texts) * 1e6:>10.1f} "
+                      f"{deflate_seconds / len(texts) * 1e6:>11.1f}")
+    if problems:
+        print(f"problem: {problems} MessagePack frames did not decode to their JSON message")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark: action latency over HTTP POSTs vs WebSocket commands.
+
+Starts the app under uvicorn and plays the same games twice, making the same
+random moves (benchmarks.driver.choose_action), once as HTTP POSTs to the
+action routes and once as commands on each player's open socket. Reports
+per-action round-trip latency: for HTTP until the response arrives, for
+commands until the ack arrives (after the broadcasts it caused). Also checks
+that every command was accepted and acked in order. The server deals from an
+unseeded shuffle, so the two runs play different (but equally long) games.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ws_commands --games 20 --players 4
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import websockets
+
+from .driver import choose_action
+
+
+class PlayerSocket:
+    """A player's socket that sends commands and waits for their acks."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.ids = itertools.count()
+        self.pending: dict[int, asyncio.Future] = {}
+        self.acked: list[int] = []
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        async for raw in self.ws:
+            message = json.loads(raw)
+            if message["type"] == "ack":
+                self.acked.append(message["id"])
+                self.pending.pop(message["id"]).set_result(message)
+
+    async def command(self, command: str, data: dict) -> dict:
+        command_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[command_id] = future
+        await self.ws.send(json.dumps({"type": "command", "id": command_id, "command": command, "data": data}))
+        return await future
+
+    async def close(self) -> None:
+        await self.ws.close()
+        self.reader.cancel()
+
+
+async def setup_game(api: httpx.AsyncClient, players: int) -> tuple[str, list[str]]:
+    r = await api.post("/api/games", json={"host_name": "P0"})
+    code, player_ids = r.json()["game_code"], [r.json()["player_id"]]
+    for i in range(1, players):
+        r = await api.post(f"/api/games/{code}/join", json={"player_name": f"P{i}"})
+        player_ids.append(r.json()["player_id"])
+    return code, player_ids
+
+
+async def play(port: int, players: int, seed: int, use_socket: bool) -> tuple[list[float], str, bool]:
+    """Play one game. Returns per-action latencies (ms), its final status, and whether acks were in order."""
+    base = f"http://127.0.0.1:{port}"
+    latencies = []
+    async with httpx.AsyncClient(base_url=base) as api:
+        code, player_ids = await setup_game(api, players)
+        sockets = {}
+        if use_socket:
+            for pid in player_ids:
+                ws = await websockets.connect(f"ws://127.0.0.1:{port}/ws/{code}/{pid}")
+                sockets[pid] = PlayerSocket(ws)
+        (await api.post(f"/api/games/{code}/start", params={"player_id": player_ids[0]})).raise_for_status()
+
+        rng = random.Random(seed)
+        while (choice := await choose_action(api, code, player_ids, rng)) is not None:
+            action, body = choice
+            start = time.perf_counter()
+            if use_socket:
+                sender = sockets[body.pop("player_id", player_ids[0])]
+                ack = await sender.command(action.replace("-", "_"), body)
+                if not ack["ok"]:
+                    raise RuntimeError(f"{action} rejected: {ack['error']}")
+            else:
+                (await api.post(f"/api/games/{code}/{action}", json=body)).raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        final = (await api.get(f"/api/games/{code}", params={"player_id": player_ids[0]})).json()
+        in_order = all(s.acked == sorted(s.acked) for s in sockets.values())
+        for s in sockets.values():
+            await s.close()
+    return latencies, final["status"], in_order
+
+
+def summary(latencies: list[float]) -> str:
+    latencies = sorted(latencies)
+    return (
+        f"median {statistics.median(latencies):6.2f} ms  p95 {latencies[int(len(latencies) * 0.95)]:6.2f} ms  "
+        f"mean {statistics.fmean(latencies):6.2f} ms"
+    )
+
+
+async def run(port: int, games: int, players: int) -> int:
+    deadline = time.monotonic() + 20
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                (await client.get(f"http://127.0.0.1:{port}/")).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+    results = {}
+    problems = []
+    for use_socket in (False, True):
+        label = "websocket" if use_socket else "http"
+        latencies, finished = [], 0
+        for seed in range(games):
+            game_latencies, status, in_order = await play(port, players, seed, use_socket)
+            latencies += game_latencies
+            finished += status == "finished"
+            if not in_order:
+                problems.append(f"game {seed}: acks out of order")
+        results[label] = latencies
+        print(f"{label:>9}: {finished}/{games} games finished  {len(latencies):>6} actions  {summary(latencies)}")
+
+    http_median = statistics.median(results["http"])
+    ws_median = statistics.median(results["websocket"])
+    print(f"median speedup: {http_median / ws_median:.2f}x")
+    for problem in problems:
+        print("problem:", problem)
+    return 1 if problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8750)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_ws_commands_")
+    log = open(os.path.join(tmp, "server.log"), "w")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{tmp}/game.db"},
+        stdout=log, stderr=subprocess.STDOUT
+    )
+    try:
+        code = asyncio.run(run(args.port, args.games, args.players))
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(timeout=20)
+        log.close()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
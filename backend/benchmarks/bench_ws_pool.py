@@ -0,0 +1,160 @@
+"""
+Benchmark: database pool usage as connected WebSockets grow to 1,000.
+
+Runs the app in-process under uvicorn with a small pool (5 connections, no
+overflow) and connects players' sockets in steps, 5 players to a game. After
+each step it records:
+- connections checked out of the pool once the sockets are idle
+- the most connections checked out at once while the step's sockets
+  connected (loading their games) and their changes were flushed
+- the latency of a read and of a game-creating write over HTTP
+
+Idle sockets must hold no connections, so checked-out stays at 0 and HTTP
+latency stays flat however many sockets are open. The peak depends on how
+many games load at once (--batch), not on how many sockets are open; a
+pool timeout fails the run. With --check, exits non-zero if any idle step
+has a connection checked out.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ws_pool --sockets 1000 --check
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+POOL_SIZE = 5
+
+# Configure the app before importing it
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench_ws_pool_')}/game.db")
+os.environ["DB_POOL_SIZE"] = str(POOL_SIZE)
+os.environ["DB_MAX_OVERFLOW"] = "0"
+os.environ["DB_POOL_TIMEOUT"] = "5"
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+import websockets  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.runtime import runtime  # noqa: E402
+
+PLAYERS_PER_GAME = 5
+
+
+class PoolWatcher:
+    """Tracks connections checked out of the pool and the peak since the last reset."""
+
+    def __init__(self):
+        self.checked_out = 0
+        self.peak = 0
+        event.listen(engine.sync_engine, "checkout", self._checkout)
+        event.listen(engine.sync_engine, "checkin", self._checkin)
+
+    def _checkout(self, *args) -> None:
+        self.checked_out += 1
+        self.peak = max(self.peak, self.checked_out)
+
+    def _checkin(self, *args) -> None:
+        self.checked_out -= 1
+
+    def reset_peak(self) -> None:
+        self.peak = self.checked_out
+
+
+async def make_game(api: httpx.AsyncClient) -> tuple[str, list[str]]:
+    r = await api.post("/api/games", json={"host_name": "P0"})
+    r.raise_for_status()
+    code, player_ids = r.json()["game_code"], [r.json()["player_id"]]
+    for i in range(1, PLAYERS_PER_GAME):
+        r = await api.post(f"/api/games/{code}/join", json={"player_name": f"P{i}"})
+        r.raise_for_status()
+        player_ids.append(r.json()["player_id"])
+    return code, player_ids
+
+
+async def hold_socket(url: str, ready: asyncio.Event) -> None:
+    """Connect, wait for the snapshot, then keep reading until cancelled."""
+    async with websockets.connect(url, max_queue=None) as ws:
+        async for raw in ws:
+            if json.loads(raw)["type"] == "game_state":
+                ready.set()
+
+
+async def timed(request) -> float:
+    start = time.perf_counter()
+    (await request).raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(port: int, total: int, steps: list[int], batch: int) -> list[str]:
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    pool = PoolWatcher()
+    problems = []
+    sockets: list[asyncio.Task] = []
+    base = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient(base_url=base, timeout=30) as api:
+        games = [await make_game(api) for _ in range(-(-total // PLAYERS_PER_GAME))]
+        seats = [(code, pid) for code, players in games for pid in players][:total]
+        probe_code, probe_player = games[0][0], games[0][1][0]
+        # Start cold, so the handshakes load their games from the database
+        for code in list(runtime.games):
+            await runtime.evict(code)
+
+        print(f"pool: size {POOL_SIZE}, no overflow   games: {len(games)}")
+        print(f"{'sockets':>8} {'idle checked out':>17} {'peak connecting+flush':>22} {'GET ms':>8} {'POST ms':>8}")
+        for step in steps:
+            pool.reset_peak()
+            for start in range(len(sockets), step, batch):
+                readies = []
+                for code, pid in seats[start:min(step, start + batch)]:
+                    ready = asyncio.Event()
+                    readies.append(ready)
+                    sockets.append(asyncio.create_task(hold_socket(f"ws://127.0.0.1:{port}/ws/{code}/{pid}", ready)))
+                await asyncio.wait_for(asyncio.gather(*(r.wait() for r in readies)), 60)
+            # Write the connected flags out, then go idle
+            await runtime.flush_all()
+            await asyncio.sleep(0.2)
+            peak = pool.peak
+            idle = pool.checked_out
+            get_ms = await timed(api.get(f"/api/games/{probe_code}", params={"player_id": probe_player}))
+            post_ms = await timed(api.post("/api/games", json={"host_name": "probe"}))
+            print(f"{step:>8} {idle:>17} {peak:>22} {get_ms:>8.1f} {post_ms:>8.1f}")
+
+            if idle:
+                problems.append(f"{idle} connections checked out with {step} idle sockets")
+    for task in sockets:
+        task.cancel()
+    await asyncio.gather(*sockets, return_exceptions=True)
+    server.should_exit = True
+    await serving
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=50, help="sockets connecting at once")
+    parser.add_argument("--port", type=int, default=8740)
+    parser.add_argument("--check", action="store_true", help="exit non-zero if idle sockets hold connections")
+    args = parser.parse_args()
+
+    steps = sorted({s for s in (0, 100, 250, 500, args.sockets) if s <= args.sockets})
+    problems = asyncio.run(run(args.port, args.sockets, steps, args.batch))
+    for problem in problems:
+        print("problem:", problem)
+    if args.check and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
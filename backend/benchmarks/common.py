@@ -0,0 +1,122 @@
+"""
+Shared helpers for benchmarks: build games in memory without a database.
+
+Games are plain ORM objects held by an unbound WriteBehindSession, so
+game_logic runs exactly as it does in the server but never touches SQLite.
+"""
+
+import json
+import random
+import time
+from typing import Optional
+from datetime import datetime
+
+from app.game_logic import (
+    start_game,
+    play_card,
+    add_double_card,
+    decline_double,
+    record_auction_result,
+    end_round,
+    get_player_hand,
+)
+from app.models import Game, Player, STARTING_MONEY, generate_uuid, generate_game_code
+from app.runtime import WriteBehindSession
+
+
+def new_session() -> WriteBehindSession:
+    """A session whose commits are no-ops."""
+    return WriteBehindSession()
+
+
+def new_game(num_players: int) -> Game:
+    """Create a lobby game with num_players players, all in memory."""
+    game = Game(
+        id=generate_uuid(),
+        code=generate_game_code(),
+        status="lobby",
+        current_round=0,
+        awaiting_auction_result=False,
+        created_at=datetime.utcnow(),
+    )
+    for i in range(num_players):
+        game.players.append(Player(
+            id=generate_uuid(),
+            game_id=game.id,
+            name=f"Player {i + 1}",
+            money=STARTING_MONEY,
+            turn_order=i,
+            is_connected=True,
+        ))
+    game.host_player_id = game.players[0].id
+    return game
+
+
+def random_step(db, game: Game, rng: random.Random) -> Optional[str]:
+    """
+    Take one random legal action. Returns the action name, or None if the
+    player to move has no cards left (the rules have no move for that).
+    """
+    players = list(game.players)
+    if game.awaiting_auction_result:
+        winner = rng.choice(players + [None])
+        price = rng.randint(0, min(winner.money, 40)) if winner else 0
+        record_auction_result(db, game, winner.id if winner else None, price, players)
+        return "record_auction_result"
+
+    if game.double_auction_state:
+        state = json.loads(game.double_auction_state)
+        offerer = next(p for p in players if p.id == state["current_offerer_id"])
+        artist = state["first_card"]["artist"]
+        valid = [
+            i for i, c in enumerate(get_player_hand(offerer))
+            if c["artist"] == artist and c["auction_type"] != "double"
+        ]
+        if valid and rng.random() < 0.5:
+            _, ends = add_double_card(db, game, offerer, rng.choice(valid))
+            if ends:
+                end_round(db, game, round_ending_player_id=offerer.id)
+            return "add_double_card"
+        decline_double(db, game, offerer, players)
+        return "decline_double"
+
+    player = next(p for p in players if p.id == game.current_turn_player_id)
+    hand = get_player_hand(player)
+    if not hand:
+        return None
+    _, ends, _ = play_card(db, game, player, rng.randrange(len(hand)))
+    if ends:
+        end_round(db, game, round_ending_player_id=player.id)
+    return "play_card"
+
+
+def build_mid_game(num_players: int = 5, target_round: int = 3, cards_this_round: int = 8, seed: int = 0):
+    """
+    Play random moves until the game reaches target_round with roughly
+    cards_this_round cards on the table. Returns (db, game).
+    """
+    rng = random.Random(seed)
+    db = new_session()
+    game = new_game(num_players)
+    random.seed(seed)
+    start_game(db, game)
+    while game.status == "in_progress":
+        on_table = sum(1 for c in game.cards_in_play if c.round == game.current_round)
+        if game.current_round >= target_round and on_table >= cards_this_round and not (
+            game.awaiting_auction_result or game.double_auction_state
+        ):
+            break
+        if random_step(db, game, rng) is None:
+            break
+    return db, game
+
+
+def timeit(fn, repeat: int = 5, number: int = 200) -> float:
+    """Best-of-repeat seconds per call."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
@@ -0,0 +1,112 @@
+"""
+Drive complete games through the HTTP API with an in-process ASGI client.
+
+Used by the throughput benchmarks; every move is a real request handled by
+the FastAPI app, with legal moves chosen at random from the returned state.
+"""
+
+import random
+from typing import Optional
+
+import httpx
+
+from app.database import init_db
+from app.main import app
+from app.runtime import runtime
+from app.websocket import manager
+
+
+async def start_app() -> None:
+    """Run the app's startup work (ASGITransport does not send lifespan events)."""
+    await init_db()
+    await manager.start()
+    runtime.start()
+
+
+async def stop_app() -> None:
+    await runtime.stop()
+    await manager.stop()
+
+
+def make_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+
+async def create_game(client: httpx.AsyncClient, num_players: int) -> tuple[str, list[str]]:
+    """Create and start a game. Returns (code, player_ids)."""
+    r = await client.post("/api/games", json={"host_name": "P0"})
+    r.raise_for_status()
+    code, host = r.json()["game_code"], r.json()["player_id"]
+    player_ids = [host]
+    for i in range(1, num_players):
+        r = await client.post(f"/api/games/{code}/join", json={"player_name": f"P{i}"})
+        r.raise_for_status()
+        player_ids.append(r.json()["player_id"])
+    r = await client.post(f"/api/games/{code}/start", params={"player_id": host})
+    r.raise_for_status()
+    return code, player_ids
+
+
+async def choose_action(
+    client: httpx.AsyncClient,
+    code: str,
+    player_ids: list[str],
+    rng: random.Random
+) -> Optional[tuple[str, dict]]:
+    """
+    Pick a random legal move from the current state. Returns the action's
+    route name and request body, or None if the game is finished or the
+    player to move has no cards.
+    """
+    state = (await client.get(f"/api/games/{code}", params={"player_id": player_ids[0]})).json()
+    if state["status"] != "in_progress":
+        return None
+
+    if state["awaiting_auction_result"]:
+        winner = rng.choice(player_ids + [None])
+        return "record-auction", {"winner_id": winner, "price": rng.randint(0, 5) if winner else 0}
+
+    if state["double_auction_state"]:
+        double = state["double_auction_state"]
+        offerer = double["current_offerer_id"]
+        hand = (await client.get(f"/api/games/{code}", params={"player_id": offerer})).json()["your_hand"]
+        artist = double["first_card"]["artist"]
+        valid = [i for i, c in enumerate(hand) if c["artist"] == artist and c["auction_type"] != "double"]
+        if valid and rng.random() < 0.5:
+            return "add-double", {"player_id": offerer, "card_index": rng.choice(valid)}
+        return "decline-double", {"player_id": offerer}
+
+    current = state["current_turn_player_id"]
+    hand = (await client.get(f"/api/games/{code}", params={"player_id": current})).json()["your_hand"]
+    if not hand:
+        return None
+    return "play-card", {"player_id": current, "card_index": rng.randrange(len(hand))}
+
+
+async def play_action(
+    client: httpx.AsyncClient,
+    code: str,
+    player_ids: list[str],
+    rng: random.Random
+) -> Optional[str]:
+    """
+    Make one random legal move. Returns the action taken, or None if the game
+    is finished or the player to move has no cards.
+    """
+    choice = await choose_action(client, code, player_ids, rng)
+    if choice is None:
+        return None
+    action, body = choice
+    r = await client.post(f"/api/games/{code}/{action}", json=body)
+    r.raise_for_status()
+    return action
+
+
+async def play_game(client: httpx.AsyncClient, num_players: int, seed: int, max_actions: int = 10_000) -> int:
+    """Create, start and play a game to the end. Returns the number of actions made."""
+    rng = random.Random(seed)
+    code, player_ids = await create_game(client, num_players)
+    actions = 0
+    while actions < max_actions and await play_action(client, code, player_ids, rng):
+        actions += 1
+    return actions
@@ -0,0 +1,282 @@
+"""
+Headless game simulator: bots play complete games straight through game_logic.
+
+No server, database or browser is involved. Each game is built in memory
+(see common.py), started with a deck shuffled from the game's seed, and played
+to the end by one policy per seat calling start_game, play_card,
+add_double_card, decline_double, record_auction_result and end_round exactly
+as the action routes do. Every call is timed, so the report shows where the
+rules engine spends its time.
+
+Games are spread over a process pool. A run is reproducible from its seed.
+
+Policies:
+- random: any legal move, random bids
+- greedy: plays and bids for the artists worth most this round
+- mixed: seats alternate random and greedy
+
+Usage (from backend/):
+    python -m benchmarks.simulator --games 3000 --players 3,4,5 --policy mixed
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.cards import ARTISTS, get_deck_copy
+from app.game_logic import (
+    start_game,
+    play_card,
+    add_double_card,
+    decline_double,
+    record_auction_result,
+    end_round,
+    get_player_hand,
+)
+from app.models import Game, Player
+from app.scoring import get_scoreboard
+
+from .common import new_game, new_session
+
+# Value tiles for the top three artists of a round
+RANK_VALUES = (30, 20, 10)
+
+
+class RandomPolicy:
+    """Any legal move, chosen uniformly; bids are random amounts a bidder can afford."""
+
+    def play(self, game: Game, player: Player, hand: list[dict], rng: random.Random) -> int:
+        return rng.randrange(len(hand))
+
+    def add_double(self, game: Game, player: Player, valid: list[int], rng: random.Random) -> Optional[int]:
+        return rng.choice(valid) if rng.random() < 0.5 else None
+
+    def bid(self, game: Game, player: Player, cards: list[dict], rng: random.Random) -> int:
+        return rng.randint(0, min(player.money, 40)) if rng.random() < 0.7 else -1
+
+
+class GreedyPolicy:
+    """
+    Plays the artist that stands to be worth most this round, and bids up to
+    what the cards are expected to pay out at the round's end.
+    """
+
+    def _artist_value(self, game: Game, artist: str, extra: int = 0) -> int:
+        """Payout per painting of artist if the round ended now, with extra more of it on the table."""
+        scoreboard = get_scoreboard(game)
+        counts = dict(scoreboard.round_counts(game.current_round))
+        counts[artist] = counts.get(artist, 0) + extra
+        ranked = sorted((a for a in ARTISTS if counts.get(a)), key=lambda a: (-counts[a], ARTISTS.index(a)))
+        if artist not in ranked[:3]:
+            return 0
+        return RANK_VALUES[ranked.index(artist)] + scoreboard.cumulative.get(artist, 0)
+
+    def play(self, game: Game, player: Player, hand: list[dict], rng: random.Random) -> int:
+        return max(range(len(hand)), key=lambda i: (self._artist_value(game, hand[i]["artist"], 1), rng.random()))
+
+    def add_double(self, game: Game, player: Player, valid: list[int], rng: random.Random) -> Optional[int]:
+        return valid[0]
+
+    def bid(self, game: Game, player: Player, cards: list[dict], rng: random.Random) -> int:
+        worth = sum(self._artist_value(game, card["artist"]) for card in cards)
+        # Leave a margin so winning is still profitable
+        bid = min(player.money, worth * 3 // 4)
+        return bid if bid > 0 else -1
+
+
+POLICIES = {"random": RandomPolicy, "greedy": GreedyPolicy}
+
+
+def seat_policies(policy: str, num_players: int) -> list:
+    if policy == "mixed":
+        return [(RandomPolicy if seat % 2 else GreedyPolicy)() for seat in range(num_players)]
+    return [POLICIES[policy]() for _ in range(num_players)]
+
+
+@dataclass
+class Timings:
+    """Calls, total seconds and slowest call per game_logic function."""
+    calls: dict = field(default_factory=lambda: defaultdict(int))
+    total: dict = field(default_factory=lambda: defaultdict(float))
+    slowest: dict = field(default_factory=lambda: defaultdict(float))
+
+    def call(self, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        name = fn.__name__
+        self.calls[name] += 1
+        self.total[name] += elapsed
+        if elapsed > self.slowest[name]:
+            self.slowest[name] = elapsed
+        return result
+
+    def merge(self, other: "Timings") -> None:
+        for name, calls in other.calls.items():
+            self.calls[name] += calls
+            self.total[name] += other.total[name]
+            self.slowest[name] = max(self.slowest[name], other.slowest[name])
+
+
+@dataclass
+class Totals:
+    """What a batch of simulated games did."""
+    games: int = 0
+    finished: int = 0
+    # Games where the player to move had no cards, which the rules have no move for
+    stalled: int = 0
+    actions: int = 0
+    seconds: float = 0.0
+    errors: list = field(default_factory=list)
+    timings: Timings = field(default_factory=Timings)
+
+    def merge(self, other: "Totals") -> None:
+        self.games += other.games
+        self.finished += other.finished
+        self.stalled += other.stalled
+        self.actions += other.actions
+        self.seconds += other.seconds
+        self.errors += other.errors
+        self.timings.merge(other.timings)
+
+
+def step(db, game: Game, policies: dict, rng: random.Random, timings: Timings) -> bool:
+    """Make the next move of a game in progress. Returns False if there is no move."""
+    players = list(game.players)
+
+    if game.awaiting_auction_result:
+        cards = [c for c in game.cards_in_play if c.round == game.current_round and c.owner_id is None]
+        cards = [{"artist": c.artist, "auction_type": c.auction_type} for c in cards]
+        bids = [(policies[p.id].bid(game, p, cards, rng), rng.random(), p) for p in players]
+        bid, _, winner = max(bids, key=lambda b: b[:2])
+        if bid < 0:
+            timings.call(record_auction_result, db, game, None, 0, players)
+        else:
+            timings.call(record_auction_result, db, game, winner.id, bid, players)
+        return True
+
+    if game.double_auction_state:
+        state = json.loads(game.double_auction_state)
+        offerer = next(p for p in players if p.id == state["current_offerer_id"])
+        artist = state["first_card"]["artist"]
+        valid = [
+            i for i, c in enumerate(get_player_hand(offerer))
+            if c["artist"] == artist and c["auction_type"] != "double"
+        ]
+        index = policies[offerer.id].add_double(game, offerer, valid, rng) if valid else None
+        if index is None:
+            timings.call(decline_double, db, game, offerer, players)
+        else:
+            _, is_round_ending = timings.call(add_double_card, db, game, offerer, index)
+            if is_round_ending:
+                timings.call(end_round, db, game, offerer.id)
+        return True
+
+    player = next(p for p in players if p.id == game.current_turn_player_id)
+    hand = get_player_hand(player)
+    if not hand:
+        return False
+    _, is_round_ending, _ = timings.call(play_card, db, game, player, policies[player.id].play(game, player, hand, rng))
+    if is_round_ending:
+        timings.call(end_round, db, game, player.id)
+    return True
+
+
+def simulate_game(num_players: int, policy: str, seed: int, totals: Totals, max_actions: int = 10_000) -> None:
+    """Play one game to the end, adding what happened to totals."""
+    rng = random.Random(seed)
+    db = new_session()
+    game = new_game(num_players)
+    policies = {p.id: seat for p, seat in zip(game.players, seat_policies(policy, num_players))}
+    deck = get_deck_copy()
+    rng.shuffle(deck)
+
+    start = time.perf_counter()
+    actions = 0
+    try:
+        totals.timings.call(start_game, db, game, deck)
+        while game.status == "in_progress" and actions < max_actions:
+            if not step(db, game, policies, rng, totals.timings):
+                totals.stalled += 1
+                break
+            actions += 1
+    except ValueError as e:
+        totals.errors.append(f"{num_players} players, {policy}, seed {seed}: {e}")
+    totals.seconds += time.perf_counter() - start
+    totals.games += 1
+    totals.finished += game.status == "finished"
+    totals.actions += actions
+
+
+def simulate_batch(batch: list[tuple[int, str, int]]) -> Totals:
+    """Play a batch of (num_players, policy, seed) games in this process."""
+    totals = Totals()
+    for num_players, policy, seed in batch:
+        simulate_game(num_players, policy, seed, totals)
+    return totals
+
+
+def run(games: int, player_counts: list[int], policy: str, seed: int, workers: int) -> Totals:
+    jobs = [(player_counts[i % len(player_counts)], policy, seed + i) for i in range(games)]
+    batch_size = max(1, min(200, games // (workers * 4) or 1))
+    batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+    totals = Totals()
+    if workers == 1:
+        for batch in batches:
+            totals.merge(simulate_batch(batch))
+        return totals
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(simulate_batch, batches):
+            totals.merge(result)
+    return totals
+
+
+def print_report(totals: Totals, wall: float, workers: int) -> None:
+    print(f"games: {totals.games}  finished: {totals.finished}  stalled: {totals.stalled}  errors: {len(totals.errors)}")
+    print(f"wall: {wall:.2f} s  workers: {workers}  "
+          f"games/s: {totals.games / wall:.0f}  actions/s: {totals.actions / wall:.0f}  "
+          f"actions/game: {totals.actions / max(totals.games, 1):.1f}")
+    print(f"per worker: games/s {totals.games / totals.seconds:.0f}  actions/s {totals.actions / totals.seconds:.0f}")
+    print()
+    timings = totals.timings
+    print(f"{'function':<24}{'calls':>10}{'total s':>10}{'share':>8}{'mean us':>10}{'max us':>10}")
+    for name in sorted(timings.calls, key=lambda n: -timings.total[n]):
+        print(
+            f"{name:<24}{timings.calls[name]:>10}{timings.total[name]:>10.2f}"
+            f"{timings.total[name] / totals.seconds:>8.0%}"
+            f"{timings.total[name] / timings.calls[name] * 1e6:>10.1f}{timings.slowest[name] * 1e6:>10.0f}"
+        )
+    policy = totals.seconds - sum(timings.total.values())
+    print(f"{'(policies)':<24}{'':>10}{policy:>10.2f}{policy / totals.seconds:>8.0%}")
+    for error in totals.errors[:10]:
+        print("error:", error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=3000)
+    parser.add_argument("--players", default="3,4,5", help="comma-separated player counts, used in turn")
+    parser.add_argument("--policy", choices=[*POLICIES, "mixed"], default="random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    player_counts = [int(n) for n in args.players.split(",")]
+    if any(n not in (3, 4, 5) for n in player_counts):
+        parser.error("player counts must be 3, 4 or 5")
+
+    start = time.perf_counter()
+    totals = run(args.games, player_counts, args.policy, args.seed, args.workers)
+    print_report(totals, time.perf_counter() - start, args.workers)
+    sys.exit(1 if totals.errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Benchmark suite: repeatable numbers for the hot paths, saved as JSON.
+
+Groups (run all, or pick with --only):
+- state:     build_game_state_response, uncached, by round and cards on the table
+- end_round: end_round payouts and dealing, by round and player count
+- broadcast: ConnectionManager.broadcast_game_state to N fake sockets, as a
+             patch and as a full snapshot, until every socket has its frame
+- asgi:      the full FastAPI app through an in-process ASGI client, with
+             1, 50 and 500 games played at once
+
+Micro-benchmarks report the fastest of several timed runs, each the mean of
+many calls, which is the figure least disturbed by other load on the machine.
+Games and shuffles are seeded, so runs are comparable. Every result
+has a name, its parameters, a unit and a value; lower is better except where
+the unit is a rate (per_s).
+
+Usage (from backend/):
+    python -m benchmarks.suite --output bench.json
+    python -m benchmarks.suite --only state,broadcast --compare bench.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench_suite_')}/game.db")
+
+from app.events import restore_snapshot, snapshot_state  # noqa: E402
+from app.game_logic import end_round  # noqa: E402
+from app.models import Game  # noqa: E402
+from app.pubsub import Bus  # noqa: E402
+from app.routes.games import build_game_state_response, get_private_data  # noqa: E402
+from app.scoring import get_scoreboard  # noqa: E402
+from app.state_cache import state_cache  # noqa: E402
+from app.websocket import ConnectionManager  # noqa: E402
+
+from .common import build_mid_game, new_session, random_step  # noqa: E402
+
+GROUPS = ("state", "end_round", "broadcast", "asgi")
+
+
+def result(name: str, params: dict, unit: str, value: float, **extra) -> dict:
+    return {"name": name, "params": params, "unit": unit, "value": round(value, 3), **extra}
+
+
+def best_of_runs(fn, runs: int = 7, number: int = 100) -> float:
+    """Fastest run's mean seconds per call, with the garbage collector off, as timeit does."""
+    samples = []
+    for _ in range(runs):
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number)
+        finally:
+            gc.enable()
+    return min(samples)
+
+
+def bench_state() -> list[dict]:
+    results = []
+    for target_round in (1, 2, 3, 4):
+        for cards in (0, 5, 10):
+            db, game = build_mid_game(num_players=5, target_round=target_round, cards_this_round=cards, seed=target_round)
+
+            def build():
+                state_cache.invalidate(game.id)
+                build_game_state_response(db, game)
+
+            on_table = sum(1 for c in game.cards_in_play if c.round == game.current_round)
+            seconds = best_of_runs(build, number=200)
+            results.append(result(
+                "build_game_state_response", {"round": game.current_round, "cards_this_round": on_table}, "us", seconds * 1e6
+            ))
+    return results
+
+
+def _round_end_copy(template: Game, state: str, seq: int) -> Game:
+    game = Game(id=template.id, code=template.code, created_at=template.created_at)
+    restore_snapshot(game, state, seq)
+    get_scoreboard(game)
+    return game
+
+
+def bench_end_round() -> list[dict]:
+    results = []
+    for num_players in (3, 5):
+        for target_round in (1, 4):
+            db, game = build_mid_game(num_players=num_players, target_round=target_round, cards_this_round=8, seed=num_players)
+            state, seq = snapshot_state(game), game.event_seq
+            # end_round changes the game, so each call gets a fresh copy; only end_round is timed
+            samples = []
+            for _ in range(7):
+                copies = [_round_end_copy(game, state, seq) for _ in range(50)]
+                session = new_session()
+                gc.disable()
+                try:
+                    start = time.perf_counter()
+                    for copy in copies:
+                        end_round(session, copy, copy.current_turn_player_id)
+                    samples.append((time.perf_counter() - start) / len(copies))
+                finally:
+                    gc.enable()
+            results.append(result(
+                "end_round", {"players": num_players, "round": game.current_round}, "us", min(samples) * 1e6
+            ))
+    return results
+
+
+class FakeSocket:
+    """Accepts frames instantly and signals when it has received a given number."""
+
+    # No subprotocol offered, so the server picks JSON text frames
+    scope = {"subprotocols": []}
+
+    def __init__(self, counter: "FrameCounter"):
+        self.counter = counter
+
+    async def accept(self, subprotocol: str | None = None):
+        pass
+
+    async def send_text(self, frame: str):
+        self.counter.received()
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class FrameCounter:
+    def __init__(self):
+        self.count = 0
+        self.target = 0
+        self.done = asyncio.Event()
+
+    def expect(self, frames: int) -> None:
+        self.count, self.target = 0, frames
+        self.done.clear()
+
+    def received(self) -> None:
+        self.count += 1
+        if self.count >= self.target:
+            self.done.set()
+
+
+async def _bench_broadcast(sockets: int, mode: str) -> float:
+    db, game = build_mid_game(num_players=5, target_round=3, cards_this_round=8)
+    states = [build_game_state_response(db, game)]
+    random_step(db, game, random.Random(1))
+    states.append(build_game_state_response(db, game))
+    private = get_private_data(game)
+
+    manager = ConnectionManager(Bus())
+    await manager.start()
+    counter = FrameCounter()
+    recipients = [p.id for p in game.players] + [f"spectator-{i}" for i in range(sockets - len(game.players))]
+    for player_id in recipients[:sockets]:
+        await manager.connect(FakeSocket(counter), game.code, player_id)
+
+    samples = []
+    for run in range(11):
+        number = 50
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for i in range(number):
+                if mode == "snapshot":
+                    manager.last_states.pop(game.code, None)
+                counter.expect(sockets)
+                # Alternating between two states makes every broadcast a real change
+                await manager.broadcast_game_state(states[(run * number + i) % 2], game.code, private)
+                await counter.done.wait()
+            samples.append((time.perf_counter() - start) / number)
+        finally:
+            gc.enable()
+
+    for player_id in recipients[:sockets]:
+        manager.disconnect(game.code, player_id)
+    await manager.stop()
+    return min(samples)
+
+
+def bench_broadcast() -> list[dict]:
+    results = []
+    for sockets in (5, 50, 500):
+        for mode in ("patch", "snapshot"):
+            seconds = asyncio.run(_bench_broadcast(sockets, mode))
+            results.append(result("broadcast_game_state", {"sockets": sockets, "mode": mode}, "us", seconds * 1e6))
+    return results
+
+
+async def _bench_asgi(levels: list[int], players: int, actions: int) -> list[dict]:
+    from .bench_concurrent_games import watch_loop
+    from .driver import create_game, make_client, play_action, play_game, start_app, stop_app
+
+    await start_app()
+    results = []
+    try:
+        async with make_client() as client:
+            # Warm up imports, caches and the connection pool before timing anything
+            await play_game(client, players, seed=-1, max_actions=actions)
+            for games in levels:
+                # The server shuffles decks with the global random module
+                random.seed(games)
+                # Games are set up a few at a time and only play is timed; a burst of
+                # hundreds of lobbies at once would measure SQLite's single writer
+                setup = asyncio.Semaphore(10)
+
+                async def create() -> tuple[str, list[str]]:
+                    async with setup:
+                        return await create_game(client, players)
+
+                tables = await asyncio.gather(*(create() for _ in range(games)))
+                latencies: list[float] = []
+
+                async def play(seed: int, code: str, player_ids: list[str]) -> None:
+                    rng = random.Random(seed)
+                    for _ in range(actions):
+                        start = time.perf_counter()
+                        if not await play_action(client, code, player_ids, rng):
+                            break
+                        latencies.append(time.perf_counter() - start)
+                        # In-process requests to games in memory rarely suspend, so
+                        # yield to let the other games (and the loop watcher) take turns
+                        await asyncio.sleep(0)
+
+                stop = asyncio.Event()
+                stalls: list[float] = []
+                watcher = asyncio.create_task(watch_loop(stop, stalls))
+                start = time.perf_counter()
+                await asyncio.gather(*(play(seed, *table) for seed, table in enumerate(tables)))
+                elapsed = time.perf_counter() - start
+                stop.set()
+                await watcher
+
+                latencies.sort()
+                stalls.sort()
+                params = {"games": games, "players": players, "actions_per_game": actions}
+                results += [
+                    result("asgi_actions", params, "per_s", len(latencies) / elapsed),
+                    result("asgi_action_latency_p50", params, "ms", latencies[len(latencies) // 2] * 1e3),
+                    result("asgi_action_latency_p99", params, "ms", latencies[int(len(latencies) * 0.99)] * 1e3),
+                    # Under load, how long a ready request waits for its turn on the loop
+                    result("asgi_loop_stall_p50", params, "ms", stalls[len(stalls) // 2] * 1e3),
+                    result("asgi_loop_stall_max", params, "ms", stalls[-1] * 1e3),
+                ]
+    finally:
+        await stop_app()
+    return results
+
+
+def bench_asgi(levels: list[int], players: int, actions: int) -> list[dict]:
+    return asyncio.run(_bench_asgi(levels, players, actions))
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _key(entry: dict) -> tuple:
+    return entry["name"], json.dumps(entry["params"], sort_keys=True)
+
+
+def compare(results: list[dict], baseline: dict, threshold: float) -> int:
+    """
+    Print each result against the same result in a baseline file. Changes
+    within threshold are treated as noise. Returns the number of regressions.
+    """
+    before = {_key(entry): entry for entry in baseline["results"]}
+    print(f"\ncompared with {baseline['environment'].get('commit')} ({baseline['environment'].get('timestamp')})")
+    regressions = 0
+    for entry in results:
+        old = before.get(_key(entry))
+        if old is None or not old["value"]:
+            continue
+        change = entry["value"] / old["value"] - 1
+        if entry["unit"] == "per_s":
+            change = -change
+        verdict = "" if abs(change) <= threshold else "worse" if change > 0 else "better"
+        regressions += verdict == "worse"
+        print(f"  {entry['name']:<28} {json.dumps(entry['params']):<56} "
+              f"{old['value']:>10} -> {entry['value']:>10} {entry['unit']:<6} {verdict}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", default=",".join(GROUPS), help=f"comma-separated groups from {', '.join(GROUPS)}")
+    parser.add_argument("--output", default="bench.json", help="JSON file to write results to")
+    parser.add_argument("--compare", help="earlier results file to compare against; exits 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change treated as noise when comparing")
+    parser.add_argument("--levels", default="1,50,500", help="concurrent games for the asgi group")
+    parser.add_argument("--players", type=int, default=4, help="players per game in the asgi group")
+    parser.add_argument("--actions", type=int, default=40, help="actions per game in the asgi group")
+    args = parser.parse_args()
+
+    groups = args.only.split(",")
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+    # Loading the baseline first fails fast on a bad path
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = []
+    for group in GROUPS:
+        if group not in groups:
+            continue
+        start = time.perf_counter()
+        if group == "state":
+            found = bench_state()
+        elif group == "end_round":
+            found = bench_end_round()
+        elif group == "broadcast":
+            found = bench_broadcast()
+        else:
+            found = bench_asgi([int(n) for n in args.levels.split(",")], args.players, args.actions)
+        print(f"{group} ({time.perf_counter() - start:.0f} s)")
+        for entry in found:
+            print(f"  {entry['name']:<28} {json.dumps(entry['params']):<56} {entry['value']:>10} {entry['unit']}")
+        results += found
+
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+        f.write("\n")
+    print(f"\nwrote {len(results)} results to {args.output}")
+    if baseline is not None and compare(results, baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
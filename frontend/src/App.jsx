@@ -76,7 +76,7 @@ function GameWrapper() {
   }, []);
 
   // Connect WebSocket
-  const { isConnected } = useGameWebSocket(code, playerId, handleMessage);
+  const { isConnected, sendCommand } = useGameWebSocket(code, playerId, handleMessage);
 
   // If no player ID, redirect to home
   useEffect(() => {
@@ -131,6 +131,7 @@ function GameWrapper() {
       gameState={gameState}
       playerId={playerId}
       isConnected={isConnected}
+      sendCommand={sendCommand}
     />
   );
 }
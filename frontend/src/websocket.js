@@ -1,20 +1,83 @@
 /**
  * WebSocket hook for real-time game updates
+ *
+ * The server sends a full `game_state` snapshot on connect and versioned
+ * `game_state_patch` diffs afterwards. Patches are applied here and passed
+ * on as ordinary `game_state` messages.
+ *
+ * Everything one action causes (say `card_played` and the new state) comes
+ * in a single `batch` frame; its messages are handled in order within one
+ * event, so React renders the result once.
+ *
+ * On reconnect the client passes the version and stream of the state it
+ * holds, and the server sends only the patches it missed (or nothing, if it
+ * missed none). A full snapshot comes only when the gap is too old.
+ *
+ * Game actions are sent as commands on the same socket with sendCommand(),
+ * which resolves with the server's ack. The state changes a command causes
+ * arrive before its ack.
  */
 
 import { useEffect, useRef, useCallback, useState } from 'react';
 
+function unescapeKey(key) {
+  return key.replace(/~1/g, '/').replace(/~0/g, '~');
+}
+
+function applyOperation(node, keys, op, value) {
+  const [key, ...rest] = keys;
+  const copy = Array.isArray(node) ? [...node] : { ...node };
+
+  if (rest.length > 0) {
+    copy[key] = applyOperation(node[key], rest, op, value);
+    return copy;
+  }
+
+  if (Array.isArray(copy)) {
+    const index = key === '-' ? copy.length : Number(key);
+    if (op === 'add') {
+      copy.splice(index, 0, value);
+    } else if (op === 'remove') {
+      copy.splice(index, 1);
+    } else {
+      copy[index] = value;
+    }
+  } else if (op === 'remove') {
+    delete copy[key];
+  } else {
+    copy[key] = value;
+  }
+  return copy;
+}
+
+// Apply JSON-patch style operations without mutating the original state
+export function applyPatch(state, patch) {
+  return patch.reduce((doc, { op, path, value }) => {
+    if (path === '') return value;
+    const keys = path.slice(1).split('/').map(unescapeKey);
+    return applyOperation(doc, keys, op, value);
+  }, state);
+}
+
 export function useGameWebSocket(gameCode, playerId, onMessage) {
   const wsRef = useRef(null);
   const [isConnected, setIsConnected] = useState(false);
   const reconnectTimeoutRef = useRef(null);
+  // Last full state (including its version) that patches apply to
+  const stateRef = useRef(null);
+  // Commands waiting for their ack: id -> { resolve, reject }
+  const pendingRef = useRef(new Map());
+  const nextCommandIdRef = useRef(1);
 
   const connect = useCallback(() => {
     if (!gameCode || !playerId) return;
 
     const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
     const host = window.location.host;
-    const wsUrl = `${protocol}//${host}/ws/${gameCode}/${playerId}`;
+    // Resume from the state we hold, if any
+    const current = stateRef.current;
+    const resume = current ? `?since=${current.version}&stream=${encodeURIComponent(current.stream)}` : '';
+    const wsUrl = `${protocol}//${host}/ws/${gameCode}/${playerId}${resume}`;
 
     const ws = new WebSocket(wsUrl);
     wsRef.current = ws;
@@ -23,18 +86,79 @@ export function useGameWebSocket(gameCode, playerId, onMessage) {
       setIsConnected(true);
     };
 
+    const handleMessage = (message) => {
+      if (message.type === 'ack') {
+        const pending = pendingRef.current.get(message.id);
+        if (pending) {
+          pendingRef.current.delete(message.id);
+          if (message.ok) {
+            pending.resolve(message.result);
+          } else {
+            pending.reject(new Error(message.error || 'Action failed'));
+          }
+        }
+        return;
+      }
+
+      if (message.type === 'game_state') {
+        stateRef.current = message.data;
+        onMessage(message);
+        return;
+      }
+
+      if (message.type === 'game_state_patch') {
+        const { version, base_version: baseVersion, patch, ...privateFields } = message.data;
+        const current = stateRef.current;
+        if (!current || current.version !== baseVersion) {
+          // Missed an update - ask for a full snapshot and drop patches until it arrives
+          if (current) {
+            stateRef.current = null;
+            ws.send(JSON.stringify({ type: 'resync' }));
+          }
+          return;
+        }
+        const data = { ...applyPatch(current, patch), ...privateFields, version };
+        stateRef.current = data;
+        onMessage({ type: 'game_state', data });
+        return;
+      }
+
+      onMessage(message);
+    };
+
     ws.onmessage = (event) => {
+      // Keepalives: answer the server's heartbeat, ignore replies to ours
+      if (event.data === 'ping') {
+        ws.send('pong');
+        return;
+      }
+      if (event.data === 'pong') {
+        return;
+      }
+
+      let message;
       try {
-        const message = JSON.parse(event.data);
-        onMessage(message);
+        message = JSON.parse(event.data);
       } catch (e) {
         console.error('Failed to parse WebSocket message:', e);
+        return;
+      }
+
+      if (message.type === 'batch') {
+        message.messages.forEach(handleMessage);
+      } else {
+        handleMessage(message);
       }
     };
 
     ws.onclose = () => {
       setIsConnected(false);
 
+      // Commands in flight may or may not have run; the state sent on
+      // reconnect shows which
+      pendingRef.current.forEach(({ reject }) => reject(new Error('Connection lost')));
+      pendingRef.current.clear();
+
       // Reconnect after 2 seconds
       reconnectTimeoutRef.current = setTimeout(() => {
         connect();
@@ -67,5 +191,18 @@ export function useGameWebSocket(gameCode, playerId, onMessage) {
     };
   }, [connect]);
 
-  return { isConnected };
+  // Send a game action (play_card, add_double, decline_double, record_auction)
+  const sendCommand = useCallback((command, data = {}) => {
+    const ws = wsRef.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN) {
+      return Promise.reject(new Error('Not connected'));
+    }
+    const id = nextCommandIdRef.current++;
+    return new Promise((resolve, reject) => {
+      pendingRef.current.set(id, { resolve, reject });
+      ws.send(JSON.stringify({ type: 'command', id, command, data }));
+    });
+  }, []);
+
+  return { isConnected, sendCommand };
 }